@@ -0,0 +1,141 @@
+"""
+Exportación columnar (Parquet o Arrow IPC) de las HU de un árbol de XML.
+
+Las HU se leen en streaming con ``HURepository.iter_hu_con_origen`` y se
+escriben por grupos de ``filas_por_grupo`` filas, así que la memoria no
+depende del tamaño del corpus. El esquema es fijo (title, link, description,
+archivo, mtime) para que las exportaciones de distintas fechas se puedan
+concatenar. ``pyarrow`` es opcional: solo se importa al exportar o cargar.
+
+Example:
+    >>> repo = HURepository(IterparseXMLParserStrategy())
+    >>> exportar_hu(repo, "data/raw/jira", "data/processed/hu.parquet")
+    >>> df = cargar_hu("data/processed/hu.parquet")
+"""
+import logging
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.doc_parser.parser_hu import FiltroHU, HURepository
+
+logger = logging.getLogger(__name__)
+
+FILAS_POR_GRUPO = 10_000
+
+# Extensión -> formato de salida
+FORMATOS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("La exportación columnar requiere pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def esquema():
+    """Esquema Arrow de la exportación."""
+    pa = _pyarrow()
+    return pa.schema([
+        ("title", pa.string()),
+        ("link", pa.string()),
+        ("description", pa.string()),
+        ("archivo", pa.string()),
+        ("mtime", pa.timestamp("ns", tz="UTC")),
+    ])
+
+
+def exportar_hu(
+    repo: "HURepository",
+    path: Union[str, Path],
+    destino: Union[str, Path],
+    formato: Optional[str] = None,
+    filas_por_grupo: int = FILAS_POR_GRUPO,
+    filtro: Optional["FiltroHU"] = None,
+) -> int:
+    """
+    Escribe las HU de los XML bajo ``path`` en ``destino``.
+
+    Args:
+        repo: Repositorio cuya estrategia parsea los XML
+        path: Directorio con los XML
+        destino: Archivo de salida; se escribe en un temporal y se renombra
+            al terminar, de modo que nunca queda a medias
+        formato: ``"parquet"`` o ``"arrow"``; por defecto según la extensión
+        filas_por_grupo: Filas por row group (Parquet) o record batch (Arrow)
+        filtro: Solo se exportan las HU que lo pasen
+
+    Returns:
+        int: Número de HU exportadas
+    """
+    destino = Path(destino)
+    formato = formato or FORMATOS.get(destino.suffix.lower())
+    if formato not in ("parquet", "arrow"):
+        raise ValueError(f"Formato no válido para {destino}. Formatos disponibles: parquet, arrow")
+    if filas_por_grupo <= 0:
+        raise ValueError(f"filas_por_grupo debe ser mayor que 0, recibido: {filas_por_grupo}")
+
+    pa = _pyarrow()
+    schema = esquema()
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + ".tmp")
+
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(str(temporal), schema)
+        escribir = lambda tabla: writer.write_table(tabla, row_group_size=filas_por_grupo)
+    else:
+        import pyarrow.ipc
+        writer = pa.ipc.new_file(str(temporal), schema)
+        escribir = writer.write_table
+
+    columnas: dict = {nombre: [] for nombre in schema.names}
+    total = 0
+    archivo_actual, mtime_actual = None, None
+    try:
+        for archivo, hu in repo.iter_hu_con_origen(path, filtro):
+            if archivo != archivo_actual:
+                archivo_actual, mtime_actual = archivo, os.stat(archivo).st_mtime_ns
+            columnas["title"].append(hu["title"])
+            columnas["link"].append(hu["link"])
+            columnas["description"].append(hu["description"])
+            columnas["archivo"].append(archivo)
+            columnas["mtime"].append(mtime_actual)
+            if len(columnas["title"]) >= filas_por_grupo:
+                total += _volcar(pa, schema, columnas, escribir)
+        total += _volcar(pa, schema, columnas, escribir)
+        writer.close()
+    except BaseException:
+        writer.close()
+        temporal.unlink(missing_ok=True)
+        raise
+
+    os.replace(temporal, destino)
+    logger.info(f"{total} HU exportadas a {destino} ({formato})")
+    return total
+
+
+def _volcar(pa, schema, columnas: dict, escribir) -> int:
+    """Escribe las filas acumuladas como un grupo y vacía las columnas."""
+    filas = len(columnas["title"])
+    if filas:
+        escribir(pa.Table.from_pydict(columnas, schema=schema))
+        for valores in columnas.values():
+            valores.clear()
+    return filas
+
+
+def cargar_hu(archivo: Union[str, Path], columnas: Optional[List[str]] = None) -> "pd.DataFrame":
+    """Carga una exportación Parquet o Arrow como DataFrame (solo ``columnas`` si se indican)."""
+    _pyarrow()
+    archivo = Path(archivo)
+    if FORMATOS.get(archivo.suffix.lower()) == "arrow":
+        import pyarrow.feather as feather
+        return feather.read_table(str(archivo), columns=columnas).to_pandas()
+
+    import pyarrow.parquet as pq
+    return pq.read_table(str(archivo), columns=columnas).to_pandas()
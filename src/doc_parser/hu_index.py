@@ -0,0 +1,265 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# (tamaño en bytes, mtime en nanosegundos) de un archivo
+Firma = Tuple[int, int]
+
+_ETIQUETA = re.compile(r"<[^>]+>")
+_TERMINO = re.compile(r"\w+")
+
+
+def hash_archivo(archivo: str) -> str:
+    """SHA-256 del contenido de un archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(archivo, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _cargar_hus(guardado: str) -> List[Any]:
+    """Lista de HU de una fila; los índices anteriores guardaban una sola HU por archivo."""
+    hus = json.loads(guardado)
+    return [hus] if isinstance(hus, dict) else hus
+
+
+def _normalizar(termino: str) -> str:
+    """Término en la forma en que lo guarda el tokenizador (minúsculas y sin acentos)."""
+    descompuesto = unicodedata.normalize("NFKD", termino.casefold())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class HUIndex:
+    """
+    Índice persistente en SQLite de las HU ya parseadas, por archivo.
+
+    Guarda las HU limpias (``{title, link, description}``) de cada XML junto con su
+    tamaño, mtime y hash de contenido. En un nuevo escaneo basta con hacer
+    ``stat`` de cada archivo: si tamaño y mtime coinciden se reutiliza la HU
+    guardada; si cambiaron se compara el hash y solo se vuelve a parsear si el
+    contenido es distinto. Los archivos que ya no existen se eliminan con ``podar``.
+
+    Las rutas se guardan absolutas para que el índice no dependa del
+    directorio de trabajo.
+
+    Además mantiene un índice invertido (FTS5) sobre el título y la
+    descripción sin HTML de cada HU, que se actualiza en ``registrar`` y
+    ``podar``: ``buscar`` ordena por BM25 sin volver a leer los XML. Los
+    acentos y mayúsculas no distinguen ("sesion" encuentra "Sesión").
+
+    Example:
+        >>> index = HUIndex("data/processed/hu_index.sqlite3")
+        >>> repo = HURepository(IterparseXMLParserStrategy(), index=index)
+        >>> repo.get_all_hu("data/raw/jira")
+        >>> index.buscar("iniciar sesión", k=5)
+    """
+
+    # Pesos BM25 de (title, description): un término en el título cuenta el doble
+    PESOS_BM25 = (2.0, 1.0)
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.reutilizados = 0
+        self.parseados = 0
+        self._lock = threading.Lock()
+        # Frecuencias de documento de la búsqueda; se invalidan al escribir
+        self._frecuencias: Dict[str, int] = {}
+        self._total: int | None = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS archivos ("
+            " ruta TEXT PRIMARY KEY,"
+            " tamano INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " hu TEXT NOT NULL,"
+            " indexado REAL NOT NULL)"
+        )
+        # Una fila por HU (un archivo puede traer varias); su id es el rowid en hu_texto
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hus (id INTEGER PRIMARY KEY, ruta TEXT NOT NULL, hu TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS hus_ruta ON hus (ruta)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS hu_texto USING fts5("
+            " title, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS hu_vocab USING fts5vocab(hu_texto, 'row')")
+        self._conn.execute(
+            "INSERT INTO hu_texto (hu_texto, rank) VALUES ('rank', ?)",
+            (f"bm25({self.PESOS_BM25[0]}, {self.PESOS_BM25[1]})",),
+        )
+        self._sincronizar_busqueda()
+        self._conn.commit()
+
+    def _sincronizar_busqueda(self) -> None:
+        """Llena el índice de búsqueda desde ``archivos`` si se creó sobre un índice anterior."""
+        if self._conn.execute("SELECT 1 FROM hus LIMIT 1").fetchone() is not None:
+            return
+        filas = self._conn.execute("SELECT ruta, hu FROM archivos").fetchall()
+        for ruta, hu in filas:
+            self._indexar_texto(ruta, _cargar_hus(hu))
+        if filas:
+            logger.info(f"Índice de búsqueda reconstruido con {len(filas)} archivos")
+
+    def _indexar_texto(self, ruta: str, hus: List[Dict[str, Any]]) -> None:
+        """Sustituye las HU de ``ruta`` en el índice de búsqueda (llamar con el lock tomado)."""
+        self._frecuencias, self._total = {}, None
+        self._borrar_texto([ruta])
+        for hu in hus:
+            cursor = self._conn.execute(
+                "INSERT INTO hus (ruta, hu) VALUES (?, ?)", (ruta, json.dumps(hu, ensure_ascii=False))
+            )
+            self._conn.execute(
+                "INSERT INTO hu_texto (rowid, title, description) VALUES (?, ?, ?)",
+                (cursor.lastrowid, hu.get("title") or "", _ETIQUETA.sub(" ", hu.get("description") or "")),
+            )
+
+    def _borrar_texto(self, rutas: List[str]) -> None:
+        """Elimina las HU de ``rutas`` del índice de búsqueda (llamar con el lock tomado)."""
+        self._frecuencias, self._total = {}, None
+        for ruta in rutas:
+            self._conn.execute("DELETE FROM hu_texto WHERE rowid IN (SELECT id FROM hus WHERE ruta = ?)", (ruta,))
+            self._conn.execute("DELETE FROM hus WHERE ruta = ?", (ruta,))
+
+    def escanear(self, archivos: Iterable[str]) -> Tuple[Dict[str, Any], Dict[str, Tuple[Firma, str]]]:
+        """
+        Clasifica los archivos en vigentes y pendientes de parsear.
+
+        Returns:
+            tuple: (lista de HU reutilizables por archivo, ``(firma, hash)`` de los
+                archivos nuevos o modificados)
+        """
+        with self._lock:
+            filas = self._conn.execute("SELECT ruta, tamano, mtime_ns, hash, hu FROM archivos").fetchall()
+        guardados = {ruta: (tamano, mtime_ns, hash_, hu) for ruta, tamano, mtime_ns, hash_, hu in filas}
+
+        vigentes: Dict[str, Any] = {}
+        pendientes: Dict[str, Tuple[Firma, str]] = {}
+        retocados: List[Tuple[int, int, str]] = []
+        for archivo in archivos:
+            st = os.stat(archivo)
+            firma = (st.st_size, st.st_mtime_ns)
+            guardado = guardados.get(os.path.abspath(archivo))
+            if guardado is not None and guardado[:2] == firma:
+                vigentes[archivo] = _cargar_hus(guardado[3])
+                continue
+
+            hash_ = hash_archivo(archivo)
+            if guardado is not None and guardado[2] == hash_:
+                # Mismo contenido con otro mtime (p. ej. copiado o tocado): solo se actualiza la firma
+                vigentes[archivo] = _cargar_hus(guardado[3])
+                retocados.append((firma[0], firma[1], os.path.abspath(archivo)))
+            else:
+                pendientes[archivo] = (firma, hash_)
+
+        if retocados:
+            with self._lock:
+                self._conn.executemany("UPDATE archivos SET tamano = ?, mtime_ns = ? WHERE ruta = ?", retocados)
+                self._conn.commit()
+
+        self.reutilizados += len(vigentes)
+        return vigentes, pendientes
+
+    def registrar(self, resultados: Dict[str, Tuple[Tuple[Firma, str], Any]]) -> None:
+        """Guarda las HU recién parseadas: ``{archivo: ((firma, hash), hus)}``."""
+        ahora = time.time()
+        filas = [
+            (os.path.abspath(archivo), firma[0], firma[1], hash_, json.dumps(hus, ensure_ascii=False), ahora)
+            for archivo, ((firma, hash_), hus) in resultados.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archivos (ruta, tamano, mtime_ns, hash, hu, indexado) VALUES (?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+            for archivo, (_, hus) in resultados.items():
+                self._indexar_texto(os.path.abspath(archivo), hus)
+            self._conn.commit()
+        self.parseados += len(filas)
+
+    def podar(self, raiz: Union[str, Path], archivos: Iterable[str]) -> int:
+        """Elimina las entradas bajo ``raiz`` que no están en ``archivos``; devuelve cuántas."""
+        prefijo = os.path.join(os.path.abspath(raiz), "")
+        existentes = {os.path.abspath(a) for a in archivos}
+        with self._lock:
+            rutas = [r for (r,) in self._conn.execute("SELECT ruta FROM archivos") if r.startswith(prefijo)]
+            borradas = [(r,) for r in rutas if r not in existentes]
+            if borradas:
+                self._conn.executemany("DELETE FROM archivos WHERE ruta = ?", borradas)
+                self._borrar_texto([r for (r,) in borradas])
+                self._conn.commit()
+        if borradas:
+            logger.info(f"{len(borradas)} archivos eliminados del índice de HU")
+        return len(borradas)
+
+    def buscar(self, consulta: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Las ``k`` HU más relevantes para ``consulta`` según BM25 sobre título y descripción.
+
+        Basta con que aparezca uno de los términos; las HU que contienen más
+        términos, o términos más raros, quedan antes. Los términos presentes en
+        más de la mitad de las HU ("como", "usuario", "quiero") se descartan:
+        su IDF en BM25 es nulo y obligarían a puntuar casi todo el índice. Si
+        todos los términos son así no hay orden que aplicar y se devuelven las
+        primeras ``k`` coincidencias.
+
+        Returns:
+            list: HU ``{title, link, description}`` con ``archivo`` y ``score``
+                (mayor es más relevante), de más a menos relevante
+        """
+        terminos = list(dict.fromkeys(_normalizar(t) for t in _TERMINO.findall(consulta)))
+        if not terminos or k <= 0:
+            return []
+        with self._lock:
+            selectivos = self._terminos_selectivos(terminos)
+            orden = "ORDER BY rank" if selectivos else ""
+            expresion = " OR ".join(f'"{t}"' for t in selectivos or terminos)
+            filas = self._conn.execute(
+                f"SELECT rowid, rank FROM hu_texto WHERE hu_texto MATCH ? {orden} LIMIT ?", (expresion, k)
+            ).fetchall()
+            if not filas:
+                return []
+            guardadas = dict(
+                (id_, (ruta, hu)) for id_, ruta, hu in self._conn.execute(
+                    f"SELECT id, ruta, hu FROM hus WHERE id IN ({','.join('?' * len(filas))})",
+                    [id_ for id_, _ in filas],
+                )
+            )
+
+        resultados = []
+        for id_, rank in filas:
+            ruta, hu = guardadas[id_]
+            resultados.append({**json.loads(hu), "archivo": ruta, "score": -rank})
+        return resultados
+
+    def _terminos_selectivos(self, terminos: List[str]) -> List[str]:
+        """Términos con IDF positivo en BM25 (presentes en como mucho la mitad de las HU)."""
+        if self._total is None:
+            self._total = self._conn.execute("SELECT COUNT(*) FROM hus").fetchone()[0]
+        for termino in terminos:
+            if termino not in self._frecuencias:
+                fila = self._conn.execute("SELECT doc FROM hu_vocab WHERE term = ?", (termino,)).fetchone()
+                self._frecuencias[termino] = fila[0] if fila else 0
+        return [t for t in terminos if self._frecuencias[t] <= self._total / 2]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM archivos").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
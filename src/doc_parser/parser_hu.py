@@ -1,29 +1,34 @@
 import os
-import pandas as pd
-from bs4 import BeautifulSoup
-import xmltodict
+import re
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional
 import logging
 
+# pandas, bs4 y xmltodict se importan dentro de las funciones que los usan:
+# importar este módulo no debe costar cientos de milisegundos de arranque.
+if TYPE_CHECKING:
+    import pandas as pd
+    from bs4 import BeautifulSoup
+    from src.doc_parser.hu_index import HUIndex
+
 logger = logging.getLogger(__name__)
 
 ##################################### LOGIC #####################################
 
 def get_xml_files(path: str = '.') -> List[str]:
     """Obtiene todos los archivos XML en un directorio."""
-    xml_files = []
+    xml_files = list(iter_xml_files(path))
+    logger.info(f"Encontrados {len(xml_files)} archivos XML en {path}")
+    return xml_files
+
+def iter_xml_files(path: str = '.') -> Iterator[str]:
+    """Genera los archivos XML de un directorio a medida que se recorre, sin listarlos antes."""
     path_obj = Path(path)
-    
     if not path_obj.exists():
         logger.warning(f"El directorio {path} no existe")
-        return xml_files
-        
+        return
     for xml_file in path_obj.rglob('*.xml'):
-        xml_files.append(str(xml_file))
-    
-    logger.info(f"Encontrados {len(xml_files)} archivos XML en {path}")
-    return xml_files
+        yield str(xml_file)
 
 def get_xml_content(xml_file: str) -> str:
     """Lee el contenido de un archivo XML."""
@@ -34,31 +39,58 @@ def get_xml_content(xml_file: str) -> str:
         logger.error(f"Error leyendo archivo {xml_file}: {e}")
         raise
 
-def get_xml_soup(xml_content: str) -> BeautifulSoup:
+def get_xml_soup(xml_content: str) -> "BeautifulSoup":
     """Convierte contenido XML a BeautifulSoup."""
+    from bs4 import BeautifulSoup
     return BeautifulSoup(xml_content, 'xml')
 
-def get_xml_dict(xml_soup: BeautifulSoup) -> Dict[str, Any]:
+def get_xml_dict(xml_soup: "BeautifulSoup") -> Dict[str, Any]:
     """Convierte BeautifulSoup a diccionario."""
+    import xmltodict
     return xmltodict.parse(str(xml_soup))
 
-def get_xml_df(xml_dict: Dict[str, Any]) -> pd.DataFrame:
+def get_xml_df(xml_dict: Dict[str, Any]) -> "pd.DataFrame":
     """Convierte diccionario XML a DataFrame."""
+    import pandas as pd
     return pd.json_normalize(xml_dict)
 
 def get_hu_dict_from_xml_file(xml_file: str) -> Dict[str, Any]:
-    """Extrae diccionario de historia de usuario desde archivo XML."""
+    """
+    Extrae diccionario de historia de usuario desde archivo XML.
+
+    Si el channel trae varios items devuelve el primero; para exportaciones
+    con muchas HU usar ``get_hu_dicts_from_xml_file`` o ``HURepository.iter_hu``.
+    """
+    raw_hu_dicts = get_hu_dicts_from_xml_file(xml_file)
+    if not raw_hu_dicts:
+        logger.error(f"Estructura XML inesperada en {xml_file}: 'item'")
+        raise KeyError("item")
+    if len(raw_hu_dicts) > 1:
+        logger.warning(f"{xml_file} contiene {len(raw_hu_dicts)} items; se devuelve solo el primero")
+    return raw_hu_dicts[0]
+
+def get_hu_dicts_from_xml_file(xml_file: str) -> List[Dict[str, Any]]:
+    """Extrae todos los items (diccionarios raw de HU) de un archivo XML, haya uno o varios."""
     xml_content = get_xml_content(xml_file)
     xml_soup = get_xml_soup(xml_content)
     xml_dict = get_xml_dict(xml_soup)
-    
+
     try:
-        raw_hu_dict = xml_dict["rss"]["channel"]["item"]
-        return raw_hu_dict
-    except KeyError as e:
+        return get_items(xml_dict["rss"]["channel"])
+    except (KeyError, TypeError) as e:
         logger.error(f"Estructura XML inesperada en {xml_file}: {e}")
         raise
 
+def get_items(channel: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Normaliza los items de un channel de xmltodict a una lista.
+
+    xmltodict devuelve un dict con un solo ``<item>``, una lista con varios y
+    ninguna clave sin items.
+    """
+    items = (channel or {}).get("item") or []
+    return [items] if isinstance(items, dict) else list(items)
+
 def get_description_from_raw_hu_dict(raw_hu_dict: Dict[str, Any]) -> str:
     """Extrae descripción del diccionario raw de HU."""
     return raw_hu_dict.get("description", "")
@@ -71,6 +103,46 @@ def get_clean_hu_dict(raw_hu_dict: Dict[str, Any]) -> Dict[str, str]:
         "description": get_description_from_raw_hu_dict(raw_hu_dict),
     }
 
+def _texto(valor) -> str:
+    """Texto de un nodo de xmltodict (los nodos con atributos llegan como dict con '#text')."""
+    if isinstance(valor, dict):
+        return valor.get("#text") or ""
+    return valor or ""
+
+class FiltroHU:
+    """
+    Filtro de HU por título, link o clave de proyecto de Jira.
+
+    ``titulo`` y ``link`` se buscan como subcadena sin distinguir mayúsculas;
+    ``proyecto`` compara la clave de proyecto (``USRNM`` en ``USRNM-12``),
+    tomada del ``<key>`` del item o, si no hay, del título o del link. Las
+    estrategias lo evalúan antes de extraer la descripción.
+
+    Example:
+        >>> for hu in repo.iter_hu("data/raw", filtro=FiltroHU(proyecto="USRNM")):
+        ...     print(hu["title"])
+    """
+
+    _CLAVE = re.compile(r"\b([A-Z][A-Z0-9_]+)-\d+\b")
+
+    def __init__(self, titulo: Optional[str] = None, link: Optional[str] = None, proyecto: Optional[str] = None):
+        self.titulo = titulo.casefold() if titulo else None
+        self.link = link.casefold() if link else None
+        self.proyecto = proyecto.upper() if proyecto else None
+
+    def acepta(self, title: str, link: str, key: str = "") -> bool:
+        if self.titulo and self.titulo not in (title or "").casefold():
+            return False
+        if self.link and self.link not in (link or "").casefold():
+            return False
+        if self.proyecto:
+            for fuente in (key, title, link):
+                encontrada = self._CLAVE.search(fuente or "")
+                if encontrada:
+                    return encontrada.group(1) == self.proyecto
+            return False
+        return True
+
 ############################ INTERFAZ ########################################
 
 from abc import ABC, abstractmethod
@@ -80,6 +152,17 @@ class XMLParserStrategy(ABC):
     def parse(self, xml_file):
         pass
 
+    def iter_hu(self, xml_file, filtro: Optional[FiltroHU] = None) -> Iterator[Dict[str, str]]:
+        """
+        Genera las HU limpias de todos los items del archivo que pasan el filtro.
+
+        Implementación genérica sobre ``parse``; las estrategias en streaming
+        la sustituyen para no construir el documento completo.
+        """
+        for item in get_items(self.parse(xml_file)["rss"]["channel"]):
+            if filtro is None or filtro.acepta(_texto(item.get("title")), _texto(item.get("link")), _texto(item.get("key"))):
+                yield get_clean_hu_dict(item)
+
 class BasicXMLParserStrategy(XMLParserStrategy):
     def parse(self, xml_file):
         xml_content = get_xml_content(xml_file)
@@ -87,18 +170,256 @@ class BasicXMLParserStrategy(XMLParserStrategy):
         xml_dict = get_xml_dict(xml_soup)
         return xml_dict
 
+class IterparseXMLParserStrategy(XMLParserStrategy):
+    """
+    Parser en streaming para exportaciones RSS de Jira con ``lxml.etree.iterparse``.
+
+    Recorre los ``rss/channel/item`` según se leen del archivo, conserva solo
+    title, link y description y libera cada nodo al terminar, de modo que la
+    memoria no crece con el tamaño de la exportación. Devuelve la misma forma
+    que ``BasicXMLParserStrategy`` (un dict por item, o una lista si hay varios).
+    """
+
+    CAMPOS = ("title", "link", "description")
+
+    def parse(self, xml_file):
+        items = list(self.iter_hu(xml_file))
+        if not items:
+            # Igual que xmltodict: un channel sin items no tiene clave "item"
+            return {"rss": {"channel": {}}}
+        return {"rss": {"channel": {"item": items[0] if len(items) == 1 else items}}}
+
+    def iter_hu(self, xml_file, filtro: Optional[FiltroHU] = None) -> Iterator[Dict[str, str]]:
+        """Genera las HU del archivo según se leen; el filtro se evalúa antes de extraer la descripción."""
+        from lxml import etree
+
+        # huge_tree: las descripciones de Jira pueden superar el límite de 10 MB por nodo de libxml2
+        for _, elem in etree.iterparse(xml_file, events=("end",), tag="item", huge_tree=True):
+            padre = elem.getparent()
+            if padre is None or padre.tag != "channel":
+                continue
+
+            title, link = elem.findtext("title") or "", elem.findtext("link") or ""
+            if filtro is None or filtro.acepta(title, link, elem.findtext("key") or ""):
+                yield {"title": title, "link": link, "description": elem.findtext("description") or ""}
+
+            # Liberar el item y los hermanos ya procesados
+            elem.clear()
+            while elem.getprevious() is not None:
+                del padre[0]
+
+def dividir_exportacion(xml_file: str, destino: str, filtro: Optional[FiltroHU] = None) -> List[str]:
+    """
+    Divide una exportación de Jira con muchos items en un XML por HU.
+
+    Recorre el archivo con ``iterparse`` y escribe cada ``rss/channel/item``
+    tal cual en ``destino/<clave>.xml`` (o ``<archivo>-<n>.xml`` si el item no
+    tiene ``<key>``), envuelto en su propio ``rss/channel``. La memoria no
+    depende del tamaño de la exportación y los archivos resultantes se
+    procesan como cualquier otro XML de una sola HU, por lo que el índice y
+    el pool de procesos reparten el trabajo por HU y no por exportación.
+
+    Si dos items producen el mismo nombre (claves repetidas o que solo difieren
+    en caracteres no válidos o en mayúsculas), los siguientes reciben un sufijo
+    ``-2``, ``-3``... en lugar de sobrescribir el primero.
+
+    Returns:
+        list: Rutas de los archivos escritos, en el orden de la exportación
+    """
+    from lxml import etree
+
+    destino_path = Path(destino)
+    destino_path.mkdir(parents=True, exist_ok=True)
+    base = Path(xml_file).stem
+    escritos: List[str] = []
+    usados: set = set()
+    numero = 0
+    for _, elem in etree.iterparse(xml_file, events=("end",), tag="item", huge_tree=True):
+        padre = elem.getparent()
+        if padre is None or padre.tag != "channel":
+            continue
+
+        numero += 1
+        clave = (elem.findtext("key") or "").strip()
+        if filtro is None or filtro.acepta(elem.findtext("title") or "", elem.findtext("link") or "", clave):
+            nombre = re.sub(r"[^\w.-]", "_", clave) if clave else f"{base}-{numero}"
+            unico, repeticion = nombre, 1
+            # En minúsculas: en sistemas de archivos que no distinguen mayúsculas también colisionan
+            while unico.lower() in usados:
+                repeticion += 1
+                unico = f"{nombre}-{repeticion}"
+            if unico != nombre:
+                logger.warning(f"{xml_file}: el item {numero} repite el nombre '{nombre}'; se escribe como {unico}.xml")
+            usados.add(unico.lower())
+            archivo = destino_path / f"{unico}.xml"
+            with open(archivo, "wb") as f:
+                f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="0.92"><channel>')
+                f.write(etree.tostring(elem, encoding="utf-8", with_tail=False))
+                f.write(b"</channel></rss>\n")
+            escritos.append(str(archivo))
+
+        elem.clear()
+        while elem.getprevious() is not None:
+            del padre[0]
+
+    logger.info(f"{xml_file}: {len(escritos)} HU escritas en {destino}")
+    return escritos
+
+def _parsear_lote(parser_strategy: XMLParserStrategy, lote: List[tuple]) -> List[tuple]:
+    """
+    Parsea un lote de archivos en un proceso del pool.
+
+    Devuelve ``(indice, archivo, hus, error)`` por archivo, con todas las HU
+    del archivo; los errores se devuelven como texto en lugar de propagarse
+    para no abortar el resto.
+    """
+    resultados = []
+    for indice, archivo in lote:
+        try:
+            resultados.append((indice, archivo, list(parser_strategy.iter_hu(archivo)), None))
+        except Exception as e:
+            resultados.append((indice, archivo, None, f"{type(e).__name__}: {e}"))
+    return resultados
+
 class HURepository:
-    def __init__(self, parser_strategy: XMLParserStrategy):
+    """
+    Repositorio de historias de usuario a partir de exportaciones XML.
+
+    Attributes:
+        parser_strategy: Estrategia de parseo de cada archivo
+        index: Índice persistente de HU ya parseadas (None para parsear siempre todo)
+        errores: Archivos que fallaron en el último ``get_all_hu`` paralelo,
+            como dicts ``{"archivo", "error"}``
+    """
+
+    def __init__(self, parser_strategy: XMLParserStrategy, index: "HUIndex | None" = None):
         self.parser_strategy = parser_strategy
+        self.index = index
+        self.errores: List[Dict[str, str]] = []
 
-    def get_all_hu(self, path='.'):
+    def get_all_hu(self, path='.', workers: int = 1, chunksize: int | None = None, ordenado: bool = True):
+        """
+        Devuelve las HU de todos los XML bajo ``path`` (todos los items de
+        cada archivo, en orden).
+
+        Con ``workers`` > 1 (o 0 para usar todos los núcleos) los archivos se
+        reparten en lotes de ``chunksize`` entre un pool de procesos. En ese
+        modo un archivo que falla no aborta el recorrido: se omite y se anota
+        en ``self.errores``. Con ``ordenado=False`` las HU se devuelven según
+        terminan los lotes, sin esperar a los más lentos.
+
+        Con ``index`` solo se parsean los archivos nuevos o modificados desde
+        el último escaneo; el resto se toma del índice.
+        """
+        self.errores = []
         xml_files = get_xml_files(path)
-        hu_list = []
+        if self.index is not None:
+            return self._get_all_hu_indexado(path, xml_files, workers, chunksize)
+        return [hu for _, hus in self._parsear(xml_files, workers, chunksize, ordenado) for hu in hus]
+
+    def iter_hu(self, path='.', filtro: Optional[FiltroHU] = None) -> Iterator[Dict[str, str]]:
+        """
+        Genera las HU de los XML bajo ``path`` a medida que se parsea cada archivo.
+
+        A diferencia de ``get_all_hu`` no acumula la lista completa: la memoria
+        no depende del tamaño del árbol y la primera HU llega en cuanto se lee
+        el primer item. Devuelve todos los items de cada archivo que pasen el
+        ``filtro``. Un archivo que falla se omite y queda en ``self.errores``.
+
+        Example:
+            >>> for hu in repo.iter_hu("data/raw", FiltroHU(proyecto="USRNM")):
+            ...     print(hu["title"])
+        """
+        for _, hu in self.iter_hu_con_origen(path, filtro):
+            yield hu
+
+    def iter_hu_con_origen(self, path='.', filtro: Optional[FiltroHU] = None) -> Iterator[tuple]:
+        """Como ``iter_hu`` pero genera ``(archivo, hu)`` con el XML de origen de cada HU."""
+        self.errores = []
+        for archivo in iter_xml_files(path):
+            try:
+                for hu in self.parser_strategy.iter_hu(archivo, filtro):
+                    yield archivo, hu
+            except Exception as e:
+                logger.warning(f"Error parseando {archivo}: {type(e).__name__}: {e}")
+                self.errores.append({"archivo": archivo, "error": f"{type(e).__name__}: {e}"})
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Busca en las HU indexadas por BM25 (título y descripción).
+
+        Solo cubre lo que el índice ya contiene: llamar antes a ``get_all_hu``
+        para incorporar los archivos nuevos o modificados.
+
+        Example:
+            >>> repo.get_all_hu("data/raw/jira")
+            >>> for hu in repo.search("pago con tarjeta", k=5):
+            ...     print(hu["score"], hu["title"])
+        """
+        if self.index is None:
+            raise ValueError("La búsqueda requiere un HUIndex (HURepository(..., index=HUIndex(...)))")
+        return self.index.buscar(query, k)
+
+    def _parsear(self, xml_files: List[str], workers: int, chunksize: int | None, ordenado: bool = True):
+        """Genera ``(archivo, hus)`` parseando en este proceso o en un pool según ``workers``."""
+        if workers != 1:
+            yield from self._iterar_en_paralelo(xml_files, workers, chunksize, ordenado)
+            return
         for file in xml_files:
-            raw_hu_dict = self.parser_strategy.parse(file)
-            clean = get_clean_hu_dict(raw_hu_dict["rss"]["channel"]["item"])
-            hu_list.append(clean)
-        return hu_list
+            yield file, list(self.parser_strategy.iter_hu(file))
+
+    def _get_all_hu_indexado(self, path, xml_files: List[str], workers: int, chunksize: int | None):
+        """get_all_hu reutilizando las HU del índice para los archivos que no cambiaron."""
+        vigentes, pendientes = self.index.escanear(xml_files)
+        nuevos = dict(self._parsear(list(pendientes), workers, chunksize, ordenado=False))
+        self.index.registrar({archivo: (pendientes[archivo], hu) for archivo, hu in nuevos.items()})
+        self.index.podar(path, xml_files)
+        logger.info(f"Índice de HU: {len(vigentes)} archivos sin cambios, {len(nuevos)} parseados")
+
+        vigentes.update(nuevos)
+        return [hu for archivo in xml_files for hu in vigentes.get(archivo, [])]
+
+    def _iterar_en_paralelo(self, xml_files: List[str], workers: int, chunksize: int | None, ordenado: bool):
+        """Genera ``(archivo, hus)`` con un pool de procesos, en orden de archivo o de llegada."""
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        self.errores = []
+        if not xml_files:
+            return
+        workers = workers or os.cpu_count() or 1
+        # Varios lotes por proceso para repartir bien la carga sin pagar IPC por archivo
+        chunksize = chunksize or max(1, min(64, len(xml_files) // (workers * 4)))
+        indexados = list(enumerate(xml_files))
+        lotes = [indexados[i:i + chunksize] for i in range(0, len(indexados), chunksize)]
+
+        pendientes: Dict[int, Any] = {}
+        siguiente = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {executor.submit(_parsear_lote, self.parser_strategy, lote): lote for lote in lotes}
+            for futuro in as_completed(futuros):
+                try:
+                    resultados = futuro.result()
+                except Exception as e:
+                    # El proceso murió (p. ej. sin memoria): se anotan todos los archivos del lote
+                    resultados = [(i, archivo, None, f"{type(e).__name__}: {e}") for i, archivo in futuros[futuro]]
+
+                for indice, archivo, hus, error in resultados:
+                    if error is not None:
+                        logger.warning(f"Error parseando {archivo}: {error}")
+                        self.errores.append({"archivo": archivo, "error": error})
+                    if not ordenado:
+                        if hus is not None:
+                            yield archivo, hus
+                        continue
+                    pendientes[indice] = (archivo, hus)
+                while siguiente in pendientes:
+                    archivo, hus = pendientes.pop(siguiente)
+                    siguiente += 1
+                    if hus is not None:
+                        yield archivo, hus
+
+        if self.errores:
+            logger.warning(f"{len(self.errores)} de {len(xml_files)} archivos XML no se pudieron parsear")
 
 def main():
     parser = BasicXMLParserStrategy()
@@ -1,12 +1,107 @@
-from src.doc_parser.parser_hu import HURepository, BasicXMLParserStrategy
+import argparse
+import logging
+import sys
 
-def main():
-    parser = BasicXMLParserStrategy()
-    repo = HURepository(parser)
+from src.doc_parser.hu_export import exportar_hu
+from src.doc_parser.hu_index import HUIndex
+from src.doc_parser.parser_hu import (
+    FiltroHU, HURepository, BasicXMLParserStrategy, IterparseXMLParserStrategy, dividir_exportacion,
+)
+from src.redactionAssitant.profiling import StageProfiler
 
-    hu_list = repo.get_all_hu()
-    for hu in hu_list:
-        print(hu["title"])
+PARSERS = {
+    "iterparse": IterparseXMLParserStrategy,
+    "basic": BasicXMLParserStrategy,
+}
+
+INDEX_PATH = "data/processed/hu_index.sqlite3"
+
+def main(argv=None):
+    parser_args = argparse.ArgumentParser(description="Lista las historias de usuario de los XML.")
+    parser_args.add_argument(
+        "--parser", choices=PARSERS, default="iterparse",
+        help="Estrategia de parseo: iterparse (streaming con lxml) o basic (BeautifulSoup + xmltodict).",
+    )
+    parser_args.add_argument(
+        "--workers", type=int, default=1,
+        help="Procesos para parsear los XML en paralelo (0 = todos los núcleos).",
+    )
+    parser_args.add_argument(
+        "--index", nargs="?", const=INDEX_PATH,
+        help="Índice SQLite de HU parseadas: solo se parsean los XML nuevos o modificados.",
+    )
+    parser_args.add_argument(
+        "--buscar", metavar="CONSULTA",
+        help="Actualiza el índice y lista las HU más relevantes para la consulta (BM25 sobre título y descripción).",
+    )
+    parser_args.add_argument("-k", type=int, default=10, help="Número de resultados de --buscar.")
+    parser_args.add_argument(
+        "--exportar", metavar="DESTINO",
+        help="Exporta las HU a Parquet (.parquet) o Arrow IPC (.arrow) en streaming; requiere pyarrow.",
+    )
+    parser_args.add_argument("--titulo", help="Solo HU cuyo título contenga este texto.")
+    parser_args.add_argument("--proyecto", help="Solo HU de esta clave de proyecto de Jira (p. ej. USRNM).")
+    parser_args.add_argument(
+        "--dividir", metavar="EXPORT",
+        help="Divide una exportación de Jira con muchos items en un XML por HU (en --destino) y termina.",
+    )
+    parser_args.add_argument("--destino", default="data/raw/hu", help="Directorio de los XML generados por --dividir.")
+    parser_args.add_argument(
+        "--profile", action="store_true",
+        help="Perfila cada etapa con cProfile y guarda el desglose de tiempos en --profile-dir.",
+    )
+    parser_args.add_argument("--profile-dir", default="data/processed/profile", help="Directorio de los perfiles.")
+    args = parser_args.parse_args(argv or [])
+    if args.profile:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S")
+
+    filtro = FiltroHU(titulo=args.titulo, proyecto=args.proyecto) if args.titulo or args.proyecto else None
+    if args.dividir:
+        escritos = dividir_exportacion(args.dividir, args.destino, filtro)
+        print(f"{len(escritos)} HU escritas en {args.destino}")
+        return
+
+    profiler = StageProfiler(activo=args.profile)
+    with profiler.etapa("carga"):
+        parser = PARSERS[args.parser]()
+        if args.buscar and not args.index:
+            args.index = INDEX_PATH
+        index = HUIndex(args.index) if args.index else None
+        repo = HURepository(parser, index=index)
+
+    if args.buscar:
+        with profiler.etapa("parseo"):
+            repo.get_all_hu(workers=args.workers)
+        with profiler.etapa("busqueda"):
+            resultados = repo.search(args.buscar, args.k)
+        with profiler.etapa("salida"):
+            for hu in resultados:
+                print(f"{hu['score']:8.3f}  {hu['title']}  {hu['link']}")
+    elif args.exportar:
+        with profiler.etapa("exportacion"):
+            total = exportar_hu(repo, ".", args.exportar, filtro=filtro)
+        print(f"{total} HU exportadas a {args.exportar}")
+    elif index is None and args.workers == 1:
+        # Streaming: cada título se imprime en cuanto se parsea su item
+        with profiler.etapa("parseo"):
+            for hu in repo.iter_hu(filtro=filtro):
+                print(hu["title"])
+    else:
+        with profiler.etapa("parseo"):
+            hu_list = repo.get_all_hu(workers=args.workers)
+        with profiler.etapa("salida"):
+            for hu in hu_list:
+                if filtro is None or filtro.acepta(hu["title"], hu["link"]):
+                    print(hu["title"])
+
+    with profiler.etapa("salida"):
+        for error in repo.errores:
+            print(f"ERROR {error['archivo']}: {error['error']}", file=sys.stderr)
+    if index is not None:
+        index.close()
+
+    if args.profile:
+        profiler.guardar(args.profile_dir)
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
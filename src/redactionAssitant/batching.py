@@ -0,0 +1,138 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchPlanner:
+    """
+    Planificador de lotes basado en un presupuesto de tokens por petición.
+
+    En lugar de agrupar un número fijo de casos, estima localmente los tokens de
+    prompt y de respuesta de cada lote y añade ítems mientras quepan en el
+    presupuesto. Las estimaciones se recalibran con el uso real que devuelve la
+    API (``response.usage``) y el límite de respuesta se reduce cuando el modelo
+    trunca una salida (``finish_reason == "length"``).
+
+    Attributes:
+        token_budget: Tokens totales (prompt + respuesta) permitidos por petición
+        max_completion: Tokens de respuesta permitidos por petición (se adapta)
+        max_items: Máximo de ítems por lote, independientemente de los tokens
+        chars_por_token: Caracteres por token estimados (se calibra)
+        ratio_salida: Tokens de respuesta por token de entrada de los ítems (se calibra)
+
+    Example:
+        >>> planner = BatchPlanner(token_budget=4000, max_items=20)
+        >>> batches = planner.planificar(cps_list, base=hu)
+    """
+
+    # Tokens fijos de instrucciones de cada prompt y de formato por ítem
+    OVERHEAD_PROMPT = 250
+    OVERHEAD_ITEM = 8
+    # Suavizado exponencial de las calibraciones
+    ALPHA = 0.3
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        max_completion: int = 3500,
+        max_items: int = 20,
+        chars_por_token: float = 3.5,
+        ratio_salida: float = 1.6,
+    ):
+        if token_budget <= 0 or max_completion <= 0:
+            raise ValueError("token_budget y max_completion deben ser mayores que 0")
+
+        self.token_budget = token_budget
+        self.max_completion_objetivo = max_completion
+        self.max_completion = max_completion
+        self.max_items = max_items
+        self.chars_por_token = chars_por_token
+        self.ratio_salida = ratio_salida
+        self._lock = threading.Lock()
+
+    def estimar_tokens(self, texto: str) -> int:
+        """Estima los tokens de un texto con la relación caracteres/token calibrada."""
+        return int(len(texto) / self.chars_por_token) + 1
+
+    def estimar_lote(self, items: List[str], base: str = "") -> tuple[int, int]:
+        """Devuelve (tokens_prompt, tokens_respuesta) estimados para un lote."""
+        entrada = sum(self.estimar_tokens(item) for item in items)
+        prompt = self.OVERHEAD_PROMPT + self.estimar_tokens(base) + entrada
+        respuesta = int(entrada * self.ratio_salida) + self.OVERHEAD_ITEM * len(items)
+        return prompt, respuesta
+
+    def iterar(self, items: Iterable[str], base: str = "", max_items: Optional[int] = None) -> Iterator[List[str]]:
+        """
+        Agrupa los ítems en lotes de forma voraz respetando el presupuesto.
+
+        Acepta cualquier iterable y produce cada lote en cuanto está completo, por
+        lo que puede usarse sobre generadores. Un ítem que por sí solo supera el
+        presupuesto se envía en un lote individual.
+        """
+        max_items = max_items or self.max_items
+        with self._lock:
+            max_completion = self.max_completion
+        base_tokens = self.OVERHEAD_PROMPT + self.estimar_tokens(base)
+
+        lote: List[str] = []
+        entrada = 0
+        for item in items:
+            tokens_item = self.estimar_tokens(item)
+            nueva_entrada = entrada + tokens_item
+            respuesta = int(nueva_entrada * self.ratio_salida) + self.OVERHEAD_ITEM * (len(lote) + 1)
+            excede = (
+                base_tokens + nueva_entrada + respuesta > self.token_budget
+                or respuesta > max_completion
+                or len(lote) >= max_items
+            )
+            if lote and excede:
+                yield lote
+                lote, nueva_entrada = [], tokens_item
+            lote.append(item)
+            entrada = nueva_entrada
+
+        if lote:
+            yield lote
+
+    def planificar(self, items: Iterable[str], base: str = "", max_items: Optional[int] = None) -> List[List[str]]:
+        """Devuelve la lista completa de lotes planificados."""
+        batches = list(self.iterar(items, base=base, max_items=max_items))
+        if batches:
+            logger.debug(
+                "Planificados %d lotes (presupuesto=%d tokens, respuesta<=%d)",
+                len(batches), self.token_budget, self.max_completion,
+            )
+        return batches
+
+    def registrar_uso(self, registro: Dict[str, Any]) -> None:
+        """
+        Recalibra el planificador con el uso observado de una petición.
+
+        ``registro`` es el diccionario que Builder notifica tras cada respuesta
+        de la API (``prompt_chars``, ``entrada_chars``, ``prompt_tokens``,
+        ``completion_tokens``, ``finish_reason``).
+        """
+        prompt_tokens = registro.get("prompt_tokens")
+        completion_tokens = registro.get("completion_tokens")
+
+        with self._lock:
+            if isinstance(prompt_tokens, int) and prompt_tokens > 0:
+                observado = registro.get("prompt_chars", 0) / prompt_tokens
+                if observado > 0:
+                    self.chars_por_token += self.ALPHA * (observado - self.chars_por_token)
+
+            entrada_tokens = registro.get("entrada_chars", 0) / self.chars_por_token
+            if isinstance(completion_tokens, int) and entrada_tokens > 0:
+                observado = completion_tokens / entrada_tokens
+                self.ratio_salida += self.ALPHA * (observado - self.ratio_salida)
+
+            if registro.get("finish_reason") == "length":
+                self.max_completion = max(256, int(self.max_completion * 0.7))
+                logger.warning(
+                    "Respuesta truncada por longitud; se reduce el límite de respuesta a %d tokens",
+                    self.max_completion,
+                )
+            elif self.max_completion < self.max_completion_objetivo:
+                self.max_completion = min(self.max_completion_objetivo, int(self.max_completion * 1.1) + 1)
@@ -0,0 +1,163 @@
+"""
+Benchmark de carga del flujo de corrección contra el servidor LLM simulado.
+
+Levanta ``MockLLMServer`` en local, genera entradas sintéticas de N casos y
+ejecuta Processor contra él, midiendo rendimiento, latencia por petición y
+concurrencia real. Permite comparar cambios de concurrencia sin red ni coste.
+
+Uso:
+    python -m src.redactionAssitant.benchmark --casos 100 1000 10000 --latencia lognormal --media 0.3
+    python -m src.redactionAssitant.benchmark --casos 1000 --modo async --tasa-429 0.05 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from src.redactionAssitant.mock_server import DISTRIBUCIONES, Latencia, MockLLMServer
+from src.redactionAssitant.processor import Processor
+
+MODOS = ("etapas", "pipeline", "async")
+
+
+def generar_entrada(casos: int, code_hu: str = "USRNM") -> tuple[str, str, str]:
+    """Genera una HU y N casos de prueba con sus resultados esperados, todos distintos."""
+    hu = "Como usuario quiero iniciar sesión en el sistema para acceder a mis datos."
+    cps = "\n".join(f"{code_hu}{i:06d} Validar inicio de sesion con el usuario {i}" for i in range(1, casos + 1))
+    exp = "\n".join(f"el sistema permite el acceso al usuario {i}" for i in range(1, casos + 1))
+    return hu, cps, exp
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano (0 si no hay valores)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def ejecutar_benchmark(
+    casos: int,
+    server: MockLLMServer,
+    modo: str = "etapas",
+    stream: bool = False,
+    max_concurrency: int = 16,
+    rpm: float = 1_000_000,
+    tpm: float = 1_000_000_000,
+) -> Dict[str, Any]:
+    """Ejecuta una corrida completa (CPS + EXP) de ``casos`` casos y devuelve sus métricas."""
+    if modo not in MODOS:
+        raise ValueError(f"Modo '{modo}' no válido. Modos disponibles: {list(MODOS)}")
+
+    cfg = SimpleNamespace(
+        code_hu="USRNM",
+        base_url=server.url,
+        stream=stream,
+        max_concurrency=max_concurrency,
+        rpm=rpm,
+        tpm=tpm,
+        dedup=False,
+    )
+    hu, cps, exp = generar_entrada(casos, cfg.code_hu)
+    proc = Processor(cfg, "benchmark")
+    server.reiniciar_estadisticas()
+
+    inicio = time.perf_counter()
+    if modo == "pipeline":
+        new_cps, _, new_exp, _ = proc.procesar_pipeline(hu, cps, exp)
+    elif modo == "async":
+        new_cps, new_exp = asyncio.run(_flujo_async(proc, hu, cps, exp))
+    else:
+        new_cps, _ = proc.cps_corregidas(hu, cps)
+        new_exp, _ = proc.exp_corregidos(hu, new_cps, exp)
+    duracion = time.perf_counter() - inicio
+    conexiones = proc.exportar_metricas()["conexiones"]
+
+    stats = server.estadisticas()
+    latencias = stats["latencias"]
+    return {
+        "casos": casos,
+        "modo": modo,
+        "stream": stream,
+        "duracion_s": round(duracion, 3),
+        "casos_por_s": round(casos / duracion, 1) if duracion else 0.0,
+        "peticiones": stats["peticiones"],
+        "peticiones_por_s": round(stats["peticiones"] / duracion, 1) if duracion else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 1),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 1),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 1),
+        "max_en_vuelo": stats["max_en_vuelo"],
+        "errores_429": stats["errores_429"],
+        "errores_500": stats["errores_500"],
+        "reintentos": proc.scheduler.reintentos,
+        "reutilizacion": round(conexiones["reutilizacion"], 3),
+        "completo": len(new_cps.splitlines()) == casos and len(new_exp.splitlines()) == casos,
+    }
+
+
+async def _flujo_async(proc: Processor, hu: str, cps: str, exp: str) -> tuple[str, str]:
+    try:
+        new_cps, _ = await proc.acps_corregidas(hu, cps)
+        new_exp, _ = await proc.aexp_corregidos(hu, new_cps, exp)
+    finally:
+        await proc.aclose()
+    return new_cps, new_exp
+
+
+def formatear_tabla(resultados: List[Dict[str, Any]]) -> str:
+    """Tabla de texto con una fila por corrida."""
+    columnas = ["casos", "modo", "duracion_s", "casos_por_s", "peticiones", "peticiones_por_s",
+                "p50_ms", "p95_ms", "p99_ms", "max_en_vuelo", "errores_429", "reintentos", "reutilizacion", "completo"]
+    filas = [[str(r[c]) for c in columnas] for r in resultados]
+    anchos = [max(len(c), *(len(f[i]) for f in filas)) if filas else len(c) for i, c in enumerate(columnas)]
+    lineas = ["  ".join(c.rjust(a) for c, a in zip(columnas, anchos))]
+    lineas += ["  ".join(v.rjust(a) for v, a in zip(fila, anchos)) for fila in filas]
+    return "\n".join(lineas)
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark del flujo de corrección contra un LLM simulado.")
+    parser.add_argument("--casos", type=int, nargs="+", default=[100, 1000], help="Tamaños de entrada a medir.")
+    parser.add_argument("--modo", choices=MODOS, default="etapas", help="Flujo a medir.")
+    parser.add_argument("--stream", action="store_true", help="Consume las respuestas en streaming.")
+    parser.add_argument("--latencia", choices=DISTRIBUCIONES, default="lognormal", help="Distribución de latencia.")
+    parser.add_argument("--media", type=float, default=0.05, help="Latencia media por petición en segundos.")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Dispersión de la lognormal.")
+    parser.add_argument("--por-linea", type=float, default=0.0, help="Pausa entre líneas en streaming (s).")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Probabilidad de responder 429.")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de responder 500.")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Lotes en vuelo en modo async.")
+    parser.add_argument("--rpm", type=float, default=1_000_000, help="Límite de peticiones/minuto del scheduler.")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del servidor simulado.")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv or [])
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s", datefmt="%H:%M:%S")
+
+    latencia = Latencia(args.latencia, media=args.media, sigma=args.sigma, por_linea=args.por_linea)
+    resultados = []
+    with MockLLMServer(latencia=latencia, tasa_429=args.tasa_429, tasa_error=args.tasa_error, semilla=args.semilla) as server:
+        for casos in args.casos:
+            resultados.append(ejecutar_benchmark(
+                casos, server, modo=args.modo, stream=args.stream,
+                max_concurrency=args.max_concurrency, rpm=args.rpm,
+            ))
+
+    print(formatear_tabla(resultados))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,16 +1,141 @@
-from openai import OpenAI  
 import logging
-from typing import List, Union
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+from src.redactionAssitant.cache import ResponseCache
+from src.redactionAssitant.scheduler import RequestScheduler
+from src.redactionAssitant.telemetry import Tracer
+
+if TYPE_CHECKING:
+    # Solo para anotaciones: importar openai en tiempo de ejecución retrasa el arranque de la CLI
+    from openai import AsyncOpenAI, OpenAI
+
+# Callback opcional: recibe la operación ("ortografia", "feedback", "expect_result")
+# y un registro con el uso observado de cada respuesta real de la API.
+UsageCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class LLMRequestError(RuntimeError):
+    """
+    Una llamada al LLM no pudo completarse (reintentos o plazo del scheduler agotados).
+
+    La causa original (``DeadlineExceeded`` o el último error de la API) queda en
+    ``__cause__``. Builder la lanza en lugar de devolver un texto de error, para
+    que Processor no lo confunda con una respuesta del modelo.
+    """
+
 
 class Builder:
     """Constructor de casos de prueba, expect results y correcciones ortográficas."""
 
-    def __init__(self, client: OpenAI):
+    def __init__(self, client: "OpenAI", cache: Optional[ResponseCache] = None, on_usage: Optional[UsageCallback] = None,
+                 scheduler: Optional[RequestScheduler] = None, tracer: Optional[Tracer] = None):
         self.client = client
         self.model = "deepseek-chat"  # O el nombre que uses en DeepSeek
+        self.cache = cache
+        self.on_usage = on_usage
+        self.scheduler = scheduler
+        self.tracer = tracer
         self.logger = logging.getLogger(__name__)
 
-    def corregir_ortografia(self, hu, cps: List[str]) -> str:
+    def _crear(self, messages: List[Dict[str, str]], info: Optional[Dict[str, Any]] = None, **kwargs):
+        """Lanza la petición a la API, pasando por el scheduler si está configurado."""
+        def peticion():
+            return self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+
+        if self.scheduler is None:
+            return peticion()
+        return self.scheduler.ejecutar(peticion, tokens=_estimar_tokens(messages), info=info)
+
+    def _span(self, operacion: str):
+        """Span de una llamada al LLM (un diccionario inerte si no hay tracer)."""
+        if self.tracer is None:
+            return nullcontext({})
+        return self.tracer.span("llm", operacion=operacion, modelo=self.model)
+
+    def _completar(self, messages: List[Dict[str, str]], operacion: str = "", entrada_chars: int = 0) -> str:
+        """Envía los mensajes al modelo, consultando antes la caché si está configurada."""
+        with self._span(operacion) as span:
+            if self.cache is not None:
+                cached = self.cache.obtener(self.model, messages)
+                if cached is not None:
+                    span["cache_hit"] = True
+                    return cached
+
+            info: Dict[str, Any] = {}
+            response = self._crear(messages, info=info, stream=False)
+            content = response.choices[0].message.content.strip()
+            registro = self._notificar_uso(operacion, messages, entrada_chars, content, response)
+            span.update(_atributos_span(registro, info))
+
+            if self.cache is not None:
+                self.cache.guardar(self.model, messages, content)
+            return content
+
+    def _completar_stream(self, messages: List[Dict[str, str]], operacion: str = "", entrada_chars: int = 0) -> Iterator[str]:
+        """
+        Igual que _completar, pero produce cada línea completa en cuanto llega.
+
+        Si el consumidor cierra el generador antes de terminar (por ejemplo, porque
+        la salida no respeta el formato), se cierra también el stream HTTP y la
+        respuesta parcial no se guarda en caché.
+        """
+        with self._span(operacion) as span:
+            span["stream"] = True
+            if self.cache is not None:
+                cached = self.cache.obtener(self.model, messages)
+                if cached is not None:
+                    span["cache_hit"] = True
+                    yield from (line for line in cached.splitlines() if line.strip())
+                    return
+
+            info: Dict[str, Any] = {}
+            stream = self._crear(messages, info=info, stream=True, stream_options={"include_usage": True})
+            partes: List[str] = []
+            estado = {"usage": None, "finish_reason": None}
+            try:
+                for line in iterar_lineas(_deltas(stream, partes, estado)):
+                    yield line
+            finally:
+                span["reintentos"] = info.get("reintentos", 0)
+                close = getattr(stream, "close", None)
+                if callable(close):
+                    close()
+
+            content = "".join(partes).strip()
+            registro = self._notificar_uso(
+                operacion, messages, entrada_chars, content,
+                usage=estado["usage"], finish_reason=estado["finish_reason"],
+            )
+            span.update(_atributos_span(registro, info))
+            if self.cache is not None:
+                self.cache.guardar(self.model, messages, content)
+
+    def _notificar_uso(self, operacion: str, messages, entrada_chars: int, content: str, response=None,
+                       usage=None, finish_reason=None) -> Optional[Dict[str, Any]]:
+        """Informa a on_usage del uso de tokens de una respuesta de la API y devuelve el registro."""
+        if self.on_usage is None and self.tracer is None:
+            return None
+
+        if response is not None:
+            usage = getattr(response, "usage", None)
+            finish_reason = getattr(response.choices[0], "finish_reason", None)
+        registro = {
+            "prompt_chars": sum(len(m["content"]) for m in messages),
+            "entrada_chars": entrada_chars,
+            "salida_chars": len(content),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "cached_tokens": _tokens_cacheados(usage),
+            "finish_reason": finish_reason,
+        }
+        if self.on_usage is not None:
+            try:
+                self.on_usage(operacion, registro)
+            except Exception as e:
+                self.logger.warning("Error en el callback de uso: %s", e)
+        return registro
+
+    def _mensajes_ortografia(self, hu, cps: List[str]) -> List[Dict[str, str]]:
         if not hu or not cps:
             self.logger.warning("Historia de usuario o casos de prueba vacíos.")
 
@@ -28,61 +153,235 @@ class Builder:
             + "\n".join(cps) +
             "\n\nFin de instrucción."
         )
+        return [
+            {"role": "system", "content": "Eres un experto en pruebas de software."},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _mensajes_feedback(self, obs_for_cps: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": "Eres un experto en pruebas de software. Tu tarea es proporcionar un feedback claro y conciso sobre las correcciones realizadas."},
+            {"role": "user", "content": f"Aquí tienes las observaciones de corrección:\n{obs_for_cps}\n\nDevuelve únicamente el feedback en texto plano, sin formato adicional."}
+        ]
+
+    def _mensajes_combinar_feedback(self, resumenes: List[str]) -> List[Dict[str, str]]:
+        parciales = "\n\n".join(f"- {resumen}" for resumen in resumenes)
+        return [
+            {"role": "system", "content": "Eres un experto en pruebas de software. Tu tarea es proporcionar un feedback claro y conciso sobre las correcciones realizadas."},
+            {"role": "user", "content": f"Aquí tienes resúmenes parciales de feedback de varios lotes:\n{parciales}\n\nCombínalos en un único feedback sin repetir ideas. Devuelve únicamente el feedback en texto plano, sin formato adicional."}
+        ]
+
+    def _mensajes_expect_result(self, cps_with_expectResult: Union[str, List[str]]) -> List[Dict[str, str]]:
+        if isinstance(cps_with_expectResult, list):
+            # Sanitize each element to remove embedded newlines
+            sanitized_elements = [elem.replace('\n', ' ') if isinstance(elem, str) else str(elem) for elem in cps_with_expectResult]
+            cps_with_expectResult = "\n".join(sanitized_elements)
+        return [
+            {"role": "system", "content": "Eres un experto en pruebas de software. Tu tarea es corregir la ortografía y mejorar la redacción de los Expected Results, manteniendo el sentido original y usando tiempo presente."},
+            {"role": "user", "content": f"Aquí tienes los pares Caso de Prueba + Expected Result:\n{cps_with_expectResult}"},
+            {"role": "user", "content": (
+                "Devuelve únicamente los Expected Results corregidos en tiempo presente, mejora la redacción y corrige la ortografía, usa mayúscula inicial. "
+                "En texto plano y con este formato:\n"
+                "ExpRes1: <texto corregido 1>\n"
+                "ExpRes2: <texto corregido 2>\n"
+                "...\n\n"
+                "Al final, incluye un listado de observaciones de corrección con este formato:\n"
+                "OBS: <observación 1>\n"
+                "OBS: <observación 2>\n"
+                "No uses comillas ni ningún otro formato adicional."
+            )}
+        ]
+
+    def corregir_ortografia(self, hu, cps: List[str]) -> str:
+        messages = self._mensajes_ortografia(hu, cps)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un experto en pruebas de software."},
-                    {"role": "user", "content": prompt},
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
+            return self._completar(messages, "ortografia", _chars(cps))
         except Exception as e:
             self.logger.error("Error al llamar a la API: %s", e)
-            return f"Error al corregir ortografía: {str(e)}"
+            raise LLMRequestError(f"Error al corregir ortografía: {e}") from e
+
+    def corregir_ortografia_stream(self, hu, cps: List[str]) -> Iterator[str]:
+        """Versión en streaming de corregir_ortografia: produce cada línea OBS/CP al recibirla."""
+        messages = self._mensajes_ortografia(hu, cps)
+        try:
+            yield from self._completar_stream(messages, "ortografia", _chars(cps))
+        except Exception as e:
+            self.logger.error("Error al llamar a la API: %s", e)
+            raise LLMRequestError(f"Error al corregir ortografía: {e}") from e
 
     def obtener_feedback(self, obs_for_cps: str):
+        messages = self._mensajes_feedback(obs_for_cps)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un experto en pruebas de software. Tu tarea es proporcionar un feedback claro y conciso sobre las correcciones realizadas."},
-                    {"role": "user", "content": f"Aquí tienes las observaciones de corrección:\n{obs_for_cps}\n\nDevuelve únicamente el feedback en texto plano, sin formato adicional."}
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
+            return self._completar(messages, "feedback", _chars(obs_for_cps))
         except Exception as e:
             self.logger.error("Error al obtener feedback: %s", e)
-            return f"Error: {str(e)}"
+            raise LLMRequestError(f"Error al obtener feedback: {e}") from e
+
+    def combinar_feedback(self, resumenes: List[str]) -> str:
+        """Paso de reducción: fusiona varios feedback parciales en uno solo."""
+        messages = self._mensajes_combinar_feedback(resumenes)
+        try:
+            return self._completar(messages, "feedback", _chars(resumenes))
+        except Exception as e:
+            self.logger.error("Error al combinar feedback: %s", e)
+            raise LLMRequestError(f"Error al combinar feedback: {e}") from e
 
     def corregir_expect_result(self, cps_with_expectResult: Union[str, List[str]]):
-        if isinstance(cps_with_expectResult, list):
-            # Sanitize each element to remove embedded newlines
-            sanitized_elements = [elem.replace('\n', ' ') if isinstance(elem, str) else str(elem) for elem in cps_with_expectResult]
-            cps_with_expectResult = "\n".join(sanitized_elements)
+        messages = self._mensajes_expect_result(cps_with_expectResult)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un experto en pruebas de software. Tu tarea es corregir la ortografía y mejorar la redacción de los Expected Results, manteniendo el sentido original y usando tiempo presente."},
-                    {"role": "user", "content": f"Aquí tienes los pares Caso de Prueba + Expected Result:\n{cps_with_expectResult}"},
-                    {"role": "user", "content": (
-                        "Devuelve únicamente los Expected Results corregidos en tiempo presente, mejora la redacción y corrige la ortografía, usa mayúscula inicial. "
-                        "En texto plano y con este formato:\n"
-                        "ExpRes1: <texto corregido 1>\n"
-                        "ExpRes2: <texto corregido 2>\n"
-                        "...\n\n"
-                        "Al final, incluye un listado de observaciones de corrección con este formato:\n"
-                        "OBS: <observación 1>\n"
-                        "OBS: <observación 2>\n"
-                        "No uses comillas ni ningún otro formato adicional."
-                    )}
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
+            return self._completar(messages, "expect_result", _chars(cps_with_expectResult))
         except Exception as e:
             self.logger.error("Error al corregir expected results: %s", e)
-            return f"Error: {str(e)}"
+            raise LLMRequestError(f"Error al corregir expected results: {e}") from e
+
+    def corregir_expect_result_stream(self, cps_with_expectResult: Union[str, List[str]]) -> Iterator[str]:
+        """Versión en streaming de corregir_expect_result: produce cada línea ExpRes/OBS al recibirla."""
+        messages = self._mensajes_expect_result(cps_with_expectResult)
+        try:
+            yield from self._completar_stream(messages, "expect_result", _chars(cps_with_expectResult))
+        except Exception as e:
+            self.logger.error("Error al corregir expected results: %s", e)
+            raise LLMRequestError(f"Error al corregir expected results: {e}") from e
+
+
+class AsyncBuilder(Builder):
+    """
+    Variante asíncrona de Builder sobre AsyncOpenAI.
+
+    Reutiliza los mismos prompts y la misma caché que Builder; solo cambia el
+    transporte, de modo que un único event loop puede mantener muchas
+    peticiones en vuelo sin un hilo por petición.
+    """
+
+    def __init__(self, client: "AsyncOpenAI", cache: Optional[ResponseCache] = None, on_usage: Optional[UsageCallback] = None,
+                 scheduler: Optional[RequestScheduler] = None, tracer: Optional[Tracer] = None):
+        super().__init__(client, cache=cache, on_usage=on_usage, scheduler=scheduler, tracer=tracer)
+
+    async def _acrear(self, messages: List[Dict[str, str]], info: Optional[Dict[str, Any]] = None, **kwargs):
+        """Lanza la petición asíncrona, pasando por el scheduler si está configurado."""
+        async def peticion():
+            return await self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+
+        if self.scheduler is None:
+            return await peticion()
+        return await self.scheduler.aejecutar(peticion, tokens=_estimar_tokens(messages), info=info)
+
+    async def _completar(self, messages: List[Dict[str, str]], operacion: str = "", entrada_chars: int = 0) -> str:
+        """Envía los mensajes al modelo de forma asíncrona, consultando antes la caché."""
+        with self._span(operacion) as span:
+            if self.cache is not None:
+                cached = self.cache.obtener(self.model, messages)
+                if cached is not None:
+                    span["cache_hit"] = True
+                    return cached
+
+            info: Dict[str, Any] = {}
+            response = await self._acrear(messages, info=info, stream=False)
+            content = response.choices[0].message.content.strip()
+            registro = self._notificar_uso(operacion, messages, entrada_chars, content, response)
+            span.update(_atributos_span(registro, info))
+
+            if self.cache is not None:
+                self.cache.guardar(self.model, messages, content)
+            return content
+
+    async def corregir_ortografia(self, hu, cps: List[str]) -> str:
+        messages = self._mensajes_ortografia(hu, cps)
+        try:
+            return await self._completar(messages, "ortografia", _chars(cps))
+        except Exception as e:
+            self.logger.error("Error al llamar a la API: %s", e)
+            raise LLMRequestError(f"Error al corregir ortografía: {e}") from e
+
+    async def obtener_feedback(self, obs_for_cps: str):
+        messages = self._mensajes_feedback(obs_for_cps)
+        try:
+            return await self._completar(messages, "feedback", _chars(obs_for_cps))
+        except Exception as e:
+            self.logger.error("Error al obtener feedback: %s", e)
+            raise LLMRequestError(f"Error al obtener feedback: {e}") from e
+
+    async def combinar_feedback(self, resumenes: List[str]) -> str:
+        messages = self._mensajes_combinar_feedback(resumenes)
+        try:
+            return await self._completar(messages, "feedback", _chars(resumenes))
+        except Exception as e:
+            self.logger.error("Error al combinar feedback: %s", e)
+            raise LLMRequestError(f"Error al combinar feedback: {e}") from e
+
+    async def corregir_expect_result(self, cps_with_expectResult: Union[str, List[str]]):
+        messages = self._mensajes_expect_result(cps_with_expectResult)
+        try:
+            return await self._completar(messages, "expect_result", _chars(cps_with_expectResult))
+        except Exception as e:
+            self.logger.error("Error al corregir expected results: %s", e)
+            raise LLMRequestError(f"Error al corregir expected results: {e}") from e
+
+
+def _estimar_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimación conservadora de tokens (prompt + respuesta de tamaño similar) para el límite por minuto."""
+    return int(sum(len(m["content"]) for m in messages) / 3.5) * 2
+
+
+def _tokens_cacheados(usage) -> Optional[int]:
+    """Tokens de prompt servidos desde la caché del proveedor (DeepSeek u OpenAI), si se informan."""
+    cacheados = getattr(usage, "prompt_cache_hit_tokens", None)
+    if isinstance(cacheados, int):
+        return cacheados
+    detalles = getattr(usage, "prompt_tokens_details", None)
+    cacheados = getattr(detalles, "cached_tokens", None)
+    return cacheados if isinstance(cacheados, int) else None
+
+
+def _atributos_span(registro: Optional[Dict[str, Any]], info: Dict[str, Any]) -> Dict[str, Any]:
+    """Atributos de uso y reintentos que se añaden al span de una llamada."""
+    atributos: Dict[str, Any] = {"reintentos": info.get("reintentos", 0)}
+    if registro:
+        for clave in ("prompt_tokens", "completion_tokens", "cached_tokens", "finish_reason"):
+            atributos[clave] = registro.get(clave)
+    return atributos
+
+
+def _chars(data: Union[str, List[str]]) -> int:
+    """Cuenta los caracteres de una entrada de texto o lista de líneas."""
+    if isinstance(data, list):
+        return sum(len(str(elem)) for elem in data)
+    return len(data or "")
+
+
+def _deltas(stream, partes: List[str], estado: Dict[str, Any]) -> Iterator[str]:
+    """Extrae el texto incremental de los chunks y guarda usage/finish_reason al pasar."""
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            estado["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        if getattr(choice, "finish_reason", None):
+            estado["finish_reason"] = choice.finish_reason
+        delta = getattr(choice.delta, "content", None)
+        if delta:
+            partes.append(delta)
+            yield delta
+
+
+def iterar_lineas(fragmentos: Iterable[str]) -> Iterator[str]:
+    """
+    Reagrupa fragmentos de texto arbitrarios en líneas completas.
+
+    Cada línea se produce (sin espacios en los extremos) en cuanto aparece su
+    salto de línea; las líneas vacías se descartan.
+
+    Example:
+        >>> list(iterar_lineas(["OBS[1]: sin ca", "mbios, CP: USRNM001\nExp", "Res1: Ok"]))
+        ['OBS[1]: sin cambios, CP: USRNM001', 'ExpRes1: Ok']
+    """
+    pendiente = ""
+    for fragmento in fragmentos:
+        pendiente += fragmento
+        while "\n" in pendiente:
+            line, pendiente = pendiente.split("\n", 1)
+            if line.strip():
+                yield line.strip()
+    if pendiente.strip():
+        yield pendiente.strip()
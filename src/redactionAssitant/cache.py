@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MODOS_CACHE = ("on", "off", "refresh")
+
+
+class ResponseCache:
+    """
+    Caché persistente en SQLite para las respuestas del LLM.
+
+    Cada entrada se identifica por el hash del modelo y de la lista completa de
+    mensajes enviados, de modo que una misma petición nunca se paga dos veces.
+    La caché se poda por antigüedad (``max_age``) y por tamaño total
+    (``max_bytes``), eliminando primero las entradas usadas hace más tiempo.
+    El tamaño total se lleva en memoria (se calcula al abrir y al purgar), así
+    que guardar una respuesta no recorre la tabla: solo se borran filas, por
+    índice, cuando hay entradas expiradas o se supera el límite.
+
+    Modos:
+        - ``on``: lee y escribe (comportamiento por defecto).
+        - ``off``: se ignora por completo, todas las llamadas van a la API.
+        - ``refresh``: no lee, pero guarda las respuestas nuevas.
+
+    Example:
+        >>> cache = ResponseCache("data/processed/llm_cache.sqlite3")
+        >>> cache.guardar("deepseek-chat", mensajes, "respuesta")
+        >>> cache.obtener("deepseek-chat", mensajes)
+        'respuesta'
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+        modo: str = "on",
+    ):
+        if modo not in MODOS_CACHE:
+            raise ValueError(f"Modo de caché '{modo}' no válido. Modos disponibles: {list(MODOS_CACHE)}")
+
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.modo = modo
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY,"
+            " modelo TEXT NOT NULL,"
+            " contenido TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL,"
+            " creado REAL NOT NULL,"
+            " accedido REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accedido ON respuestas(accedido)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_creado ON respuestas(creado)")
+        self._conn.commit()
+        self._bytes = self._contar_bytes()
+
+    @staticmethod
+    def clave(modelo: str, mensajes: List[Dict[str, str]]) -> str:
+        """Calcula la clave direccionada por contenido de una petición."""
+        payload = json.dumps({"model": modelo, "messages": mensajes}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def obtener(self, modelo: str, mensajes: List[Dict[str, str]]) -> Optional[str]:
+        """Devuelve la respuesta cacheada o None si no existe, expiró o el modo no permite leer."""
+        if self.modo != "on":
+            return None
+
+        clave = self.clave(modelo, mensajes)
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT contenido, creado, bytes FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                self.misses += 1
+                return None
+
+            contenido, creado, size = fila
+            if self.max_age and ahora - creado > self.max_age:
+                self._conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._conn.commit()
+                self._bytes -= size
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE respuestas SET accedido = ? WHERE clave = ?", (ahora, clave))
+            self._conn.commit()
+            self.hits += 1
+
+        logger.debug("Respuesta obtenida de caché (%s)", clave[:12])
+        return contenido
+
+    def guardar(self, modelo: str, mensajes: List[Dict[str, str]], contenido: str) -> None:
+        """Guarda una respuesta y poda la caché si supera los límites configurados."""
+        if self.modo == "off":
+            return
+
+        clave = self.clave(modelo, mensajes)
+        ahora = time.time()
+        size = len(contenido.encode("utf-8"))
+        with self._lock:
+            previa = self._conn.execute("SELECT bytes FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, modelo, contenido, bytes, creado, accedido) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, modelo, contenido, size, ahora, ahora),
+            )
+            self._bytes += size - (previa[0] if previa else 0)
+            self._podar(ahora)
+            self._conn.commit()
+
+    def purgar(self) -> int:
+        """Aplica la política de expulsión y devuelve el número de entradas eliminadas."""
+        with self._lock:
+            # Resincroniza el total por si otro proceso escribió en el mismo archivo
+            self._bytes = self._contar_bytes()
+            eliminadas = self._podar(time.time())
+            self._conn.commit()
+        return eliminadas
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas de la caché."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respuestas")
+            self._conn.commit()
+            self._bytes = 0
+
+    def _podar(self, ahora: float) -> int:
+        """Expulsa entradas expiradas y, si hace falta, las menos usadas hasta cumplir el tamaño."""
+        eliminadas = 0
+        if self.max_age:
+            limite = ahora - self.max_age
+            expirados = self._conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM respuestas WHERE creado < ?", (limite,)
+            ).fetchone()[0]
+            if expirados:
+                cursor = self._conn.execute("DELETE FROM respuestas WHERE creado < ?", (limite,))
+                eliminadas += cursor.rowcount
+                self._bytes -= expirados
+
+        if self.max_bytes and self._bytes > self.max_bytes:
+            exceso = self._bytes - self.max_bytes
+            filas = self._conn.execute("SELECT clave, bytes FROM respuestas ORDER BY accedido ASC")
+            claves = []
+            for clave, size in filas:
+                if exceso <= 0:
+                    break
+                claves.append((clave,))
+                exceso -= size
+                self._bytes -= size
+            self._conn.executemany("DELETE FROM respuestas WHERE clave = ?", claves)
+            eliminadas += len(claves)
+
+        if eliminadas:
+            logger.debug("Caché podada: %d entradas eliminadas", eliminadas)
+        return eliminadas
+
+    def _contar_bytes(self) -> int:
+        """Tamaño total de las respuestas guardadas (recorre la tabla: solo al abrir y al purgar)."""
+        return self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos."""
+        with self._lock:
+            self._conn.close()
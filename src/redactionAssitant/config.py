@@ -1,18 +1,31 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
-load_dotenv()
+_dotenv_cargado = False
+
+
+def _cargar_dotenv() -> None:
+    """Carga ``.env`` una sola vez, al crear la primera Config y no al importar el módulo."""
+    global _dotenv_cargado
+    if not _dotenv_cargado:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_cargado = True
+
 
 class Config:
     """Configuración centralizada para el redactor automático."""
 
     def __init__(self, default_hu_code: str | None = "USRNM"):
+        _cargar_dotenv()
         self.API_KEY = os.getenv("DS_API_KEY")
 
         if not self.API_KEY:
             raise ValueError("DS_API_KEY no encontrada en las variables de entorno")
 
+        # Endpoint compatible con OpenAI (p. ej. el servidor simulado de mock_server.py)
+        self.base_url = os.getenv("DS_BASE_URL", "https://api.deepseek.com")
+
         hu_code = os.getenv("HU_CODE")
         if hu_code:
             self.code_hu = hu_code
@@ -36,6 +49,87 @@ class Config:
             "exp": "expectedResults.txt"
         }
 
+        # Máximo de lotes en vuelo en el modo asíncrono
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        if self.max_concurrency <= 0:
+            raise ValueError(f"LLM_MAX_CONCURRENCY debe ser mayor que 0, recibido: {self.max_concurrency}")
+
+        # Consumir las respuestas del LLM en streaming, línea a línea
+        self.stream = os.getenv("LLM_STREAM", "").strip().lower() in ("1", "true", "yes", "on")
+
+        # Presupuesto de tokens por petición usado para planificar los lotes
+        self.token_budget = int(os.getenv("LLM_TOKEN_BUDGET", "6000"))
+        self.max_completion_tokens = int(os.getenv("LLM_MAX_COMPLETION_TOKENS", "3500"))
+
+        # Tamaño máximo de la entrada de cada paso de reducción del feedback
+        self.feedback_max_chars = int(os.getenv("LLM_FEEDBACK_MAX_CHARS", "8000"))
+        if self.feedback_max_chars < 100:
+            raise ValueError(f"LLM_FEEDBACK_MAX_CHARS debe ser al menos 100, recibido: {self.feedback_max_chars}")
+
+        # Enviar una sola vez los casos repetidos (salvo ID, mayúsculas o espacios)
+        self.dedup = os.getenv("LLM_DEDUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+        # Peticiones extra por lote de CPS para recuperar casos ausentes en la respuesta
+        self.batch_repair_retries = int(os.getenv("LLM_BATCH_REPAIR_RETRIES", "3"))
+
+        # Qué hacer con un lote que lanza una excepción: fallar (por defecto), reintentar
+        # u omitir (solo con --stream-files: el lote conserva sus líneas originales)
+        self.batch_error_policy = os.getenv("LLM_BATCH_ERROR_POLICY", "fallar").strip().lower()
+        if self.batch_error_policy not in ("fallar", "reintentar", "omitir"):
+            raise ValueError(
+                f"LLM_BATCH_ERROR_POLICY debe ser 'fallar', 'reintentar' u 'omitir', recibido: {self.batch_error_policy}"
+            )
+        self.batch_error_retries = int(os.getenv("LLM_BATCH_ERROR_RETRIES", "1"))
+
+        # Límites de ritmo, reintentos y plazo por petición del scheduler
+        self.rpm = float(os.getenv("LLM_RPM", "300"))
+        self.tpm = float(os.getenv("LLM_TPM", "1000000"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.request_deadline = float(os.getenv("LLM_DEADLINE_S", "120"))
+
+        # Pool HTTP compartido por todos los clientes del LLM del proceso
+        self.http_pool = {
+            "max_conexiones": int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20")),
+            "max_keepalive": int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+            "keepalive_expiry": float(os.getenv("LLM_HTTP_KEEPALIVE_S", "30")),
+            "connect_timeout": float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT_S", "5")),
+            "read_timeout": float(os.getenv("LLM_HTTP_READ_TIMEOUT_S", "60")),
+            "http2": os.getenv("LLM_HTTP2", "1").strip().lower() not in ("0", "false", "no", "off"),
+        }
+        if self.http_pool["max_conexiones"] <= 0:
+            raise ValueError(
+                f"LLM_HTTP_MAX_CONNECTIONS debe ser mayor que 0, recibido: {self.http_pool['max_conexiones']}"
+            )
+
+        # Caché persistente de respuestas del LLM (on | off | refresh)
+        self.cache_path = self.output_dir / "llm_cache.sqlite3"
+        self.cache_mode = os.getenv("LLM_CACHE", "on").strip().lower()
+        if self.cache_mode not in ("on", "off", "refresh"):
+            raise ValueError(
+                f"LLM_CACHE='{self.cache_mode}' no válido. Valores permitidos: ['on', 'off', 'refresh']"
+            )
+        self.cache_max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+        self.cache_max_age_days = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+        # Manifiesto de líneas ya corregidas para el reprocesado incremental
+        self.manifest_path = self.output_dir / "manifest.json"
+
+        # Journal de lotes completados para reanudar ejecuciones interrumpidas
+        self.journal_path = self.output_dir / "journal.jsonl"
+
+        # Trazas por llamada (JSONL) y métricas agregadas (formato de texto de Prometheus)
+        self.trace_path = self.output_dir / "trace.jsonl"
+        self.metrics_path = self.output_dir / "metrics.prom"
+
+        # Perfiles por etapa de --profile (un .prof por etapa y resumen.txt)
+        self.profile_dir = self.output_dir / "profile"
+        # Precios en USD por millón de tokens para estimar el coste de cada ejecución
+        self.llm_prices = {
+            "prompt": float(os.getenv("LLM_PRICE_PROMPT_PER_M", "0")),
+            "completion": float(os.getenv("LLM_PRICE_COMPLETION_PER_M", "0")),
+            "cached": float(os.getenv("LLM_PRICE_CACHED_PER_M", os.getenv("LLM_PRICE_PROMPT_PER_M", "0"))),
+        }
+
     def input_path(self, key: str) -> Path:
         """Retorna la ruta completa del archivo de entrada."""
         if key not in self.data_paths:
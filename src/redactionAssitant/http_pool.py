@@ -0,0 +1,183 @@
+"""
+Pool de conexiones HTTP compartido por los clientes del LLM.
+
+Todos los ``Processor`` de un proceso (y sus ``Builder``) usan el mismo
+``httpx.Client`` para una misma configuración de pool, así que las conexiones
+TCP/TLS abiertas por una HU se reutilizan en la siguiente. Los clientes
+asíncronos no se comparten: un ``httpx.AsyncClient`` queda ligado al event
+loop que lo usa, así que cada ``Processor`` crea el suyo con los mismos
+límites.
+
+Cada petición se cuenta en ``ESTADISTICAS`` como nueva o reutilizada según si
+httpcore tuvo que abrir una conexión TCP para ella. httpx solo se importa al
+crear el primer cliente.
+
+Example:
+    >>> cliente = cliente_http(max_conexiones=20, read_timeout=60.0)
+    >>> OpenAI(api_key=key, base_url=url, http_client=cliente)
+"""
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Evento de httpcore que indica que la petición abrió una conexión nueva
+_EVENTO_CONEXION = "connection.connect_tcp.complete"
+
+
+class EstadisticasConexiones:
+    """Contadores de peticiones HTTP y de conexiones abiertas para atenderlas."""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.conexiones_nuevas = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, nueva: bool) -> None:
+        with self._lock:
+            self.peticiones += 1
+            self.conexiones_nuevas += int(nueva)
+
+    def instantanea(self) -> Dict[str, int]:
+        with self._lock:
+            return {"peticiones": self.peticiones, "conexiones_nuevas": self.conexiones_nuevas}
+
+
+ESTADISTICAS = EstadisticasConexiones()
+
+_clientes: Dict[tuple, Any] = {}
+_lock = threading.Lock()
+
+
+def _http2_disponible(http2: bool) -> bool:
+    if not http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.debug("Paquete h2 no instalado: el pool usa HTTP/1.1")
+        return False
+    return True
+
+
+def _opciones(max_conexiones: int, max_keepalive: int, keepalive_expiry: float,
+              connect_timeout: float, read_timeout: float, http2: bool) -> Dict[str, Any]:
+    """Límites, timeouts y protocolo comunes a los clientes síncrono y asíncrono."""
+    import httpx
+    if max_conexiones <= 0:
+        raise ValueError(f"max_conexiones debe ser mayor que 0, recibido: {max_conexiones}")
+    return {
+        "limits": httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=min(max_keepalive, max_conexiones),
+            keepalive_expiry=keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+        "http2": _http2_disponible(http2),
+    }
+
+
+def cliente_http(
+    max_conexiones: int = 20,
+    max_keepalive: int = 20,
+    keepalive_expiry: float = 30.0,
+    connect_timeout: float = 5.0,
+    read_timeout: float = 60.0,
+    http2: bool = True,
+):
+    """
+    Cliente ``httpx.Client`` compartido por el proceso para esta configuración.
+
+    Args:
+        max_conexiones: Conexiones simultáneas como máximo
+        max_keepalive: Conexiones ociosas que se mantienen abiertas
+        keepalive_expiry: Segundos que una conexión ociosa sigue abierta
+        connect_timeout: Plazo para establecer la conexión (TCP + TLS)
+        read_timeout: Plazo entre dos lecturas de la respuesta (y de escritura/espera del pool)
+        http2: Usa HTTP/2 si el paquete ``h2`` está instalado
+    """
+    clave = (max_conexiones, max_keepalive, keepalive_expiry, connect_timeout, read_timeout, http2)
+    with _lock:
+        cliente = _clientes.get(clave)
+        if cliente is None or cliente.is_closed:
+            import httpx
+            opciones = _opciones(*clave)
+            transporte = _transportes()["sync"](limits=opciones["limits"], http2=opciones["http2"])
+            cliente = httpx.Client(transport=transporte, timeout=opciones["timeout"])
+            _clientes[clave] = cliente
+            logger.info(
+                "Pool HTTP creado: %d conexiones, %d en keep-alive, HTTP/%s",
+                max_conexiones, opciones["limits"].max_keepalive_connections, "2" if opciones["http2"] else "1.1",
+            )
+        return cliente
+
+
+def cliente_http_async(
+    max_conexiones: int = 20,
+    max_keepalive: int = 20,
+    keepalive_expiry: float = 30.0,
+    connect_timeout: float = 5.0,
+    read_timeout: float = 60.0,
+    http2: bool = True,
+):
+    """Nuevo ``httpx.AsyncClient`` con la misma configuración de pool; lo cierra quien lo crea."""
+    import httpx
+    opciones = _opciones(max_conexiones, max_keepalive, keepalive_expiry, connect_timeout, read_timeout, http2)
+    transporte = _transportes()["async"](limits=opciones["limits"], http2=opciones["http2"])
+    return httpx.AsyncClient(transport=transporte, timeout=opciones["timeout"])
+
+
+def cerrar_clientes() -> None:
+    """Cierra los clientes compartidos (el siguiente ``cliente_http`` abre uno nuevo)."""
+    with _lock:
+        for cliente in _clientes.values():
+            cliente.close()
+        _clientes.clear()
+
+
+@lru_cache(maxsize=None)
+def _transportes() -> Dict[str, type]:
+    """Clases de transporte medidas; heredan de httpx, así que se definen en el primer uso."""
+    import httpx
+
+    class _TransporteMedido(httpx.HTTPTransport):
+        """Transporte que anota si cada petición abrió una conexión o reutilizó una del pool."""
+
+        def handle_request(self, request):
+            nueva = False
+            previo = request.extensions.get("trace")
+
+            def trace(evento, info):
+                nonlocal nueva
+                nueva = nueva or evento == _EVENTO_CONEXION
+                if previo is not None:
+                    previo(evento, info)
+
+            request.extensions["trace"] = trace
+            try:
+                return super().handle_request(request)
+            finally:
+                ESTADISTICAS.registrar(nueva)
+
+    class _TransporteMedidoAsync(httpx.AsyncHTTPTransport):
+        """Variante asíncrona de _TransporteMedido."""
+
+        async def handle_async_request(self, request):
+            nueva = False
+            previo = request.extensions.get("trace")
+
+            async def trace(evento, info):
+                nonlocal nueva
+                nueva = nueva or evento == _EVENTO_CONEXION
+                if previo is not None:
+                    await previo(evento, info)
+
+            request.extensions["trace"] = trace
+            try:
+                return await super().handle_async_request(request)
+            finally:
+                ESTADISTICAS.registrar(nueva)
+
+    return {"sync": _TransporteMedido, "async": _TransporteMedidoAsync}
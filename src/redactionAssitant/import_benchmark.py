@@ -0,0 +1,134 @@
+"""
+Benchmark del tiempo de arranque en frío de los puntos de entrada.
+
+Importa cada módulo en un intérprete nuevo con ``python -X importtime`` y
+reporta el tiempo de importación, el tiempo total del proceso y qué
+dependencias pesadas (openai, pandas, bs4, ...) se cargaron. Con ``--ref``
+mide además el mismo módulo en otra revisión de git para comparar antes y
+después de un cambio.
+
+Uso:
+    python -m src.redactionAssitant.import_benchmark
+    python -m src.redactionAssitant.import_benchmark --ref HEAD~1 --repeticiones 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+MODULOS = (
+    "src.redactionAssitant.main",
+    "src.main",
+    "src.doc_parser.parser_hu",
+    "src.redactionAssitant.config",
+)
+
+# Dependencias cuyo coste de importación interesa vigilar
+PESADOS = ("openai", "httpx", "pandas", "numpy", "bs4", "xmltodict", "lxml", "dotenv")
+
+
+def parsear_importtime(salida: str) -> Dict[str, int]:
+    """Microsegundos acumulados por módulo según la salida de ``-X importtime``."""
+    acumulados: Dict[str, int] = {}
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue  # cabecera
+        acumulados[partes[2].strip()] = int(partes[1])
+    return acumulados
+
+
+def medir_importacion(
+    modulo: str,
+    repeticiones: int = 5,
+    cwd: Union[str, Path, None] = None,
+    python: str = sys.executable,
+) -> Dict[str, Any]:
+    """Mide la importación en frío de ``modulo`` (mediana de ``repeticiones`` procesos nuevos)."""
+    importacion, arranque = [], []
+    pesados: Dict[str, List[int]] = {}
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [python, "-X", "importtime", "-c", f"import {modulo}"],
+            cwd=cwd, capture_output=True, text=True,
+        )
+        arranque.append(time.perf_counter() - inicio)
+        if proceso.returncode != 0:
+            error = proceso.stderr.strip().splitlines()[-1:] or ["error desconocido"]
+            raise RuntimeError(f"No se pudo importar {modulo}: {error[0]}")
+
+        acumulados = parsear_importtime(proceso.stderr)
+        importacion.append(acumulados.get(modulo, 0))
+        for nombre in PESADOS:
+            if nombre in acumulados:
+                pesados.setdefault(nombre, []).append(acumulados[nombre])
+
+    return {
+        "modulo": modulo,
+        "import_ms": round(statistics.median(importacion) / 1000, 1),
+        "arranque_ms": round(statistics.median(arranque) * 1000, 1),
+        "pesados": {nombre: round(statistics.median(v) / 1000, 1) for nombre, v in sorted(pesados.items())},
+    }
+
+
+def medir_en_ref(ref: str, modulos: List[str], repeticiones: int = 5) -> List[Dict[str, Any]]:
+    """Mide los módulos en la revisión ``ref`` usando un worktree temporal de git."""
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = Path(tmp) / "arbol"
+        subprocess.run(["git", "worktree", "add", "--detach", str(destino), ref], check=True, capture_output=True)
+        try:
+            return [medir_importacion(m, repeticiones, cwd=destino) for m in modulos]
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(destino)], capture_output=True)
+
+
+def formatear_tabla(despues: List[Dict[str, Any]], antes: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Tabla de texto con una fila por módulo (y la columna ``antes`` si se midió una revisión)."""
+    previos = {r["modulo"]: r for r in antes or []}
+    columnas = ["modulo"] + (["antes_ms"] if antes else []) + ["import_ms", "arranque_ms", "pesados"]
+    filas = []
+    for r in despues:
+        fila = [r["modulo"]]
+        if antes:
+            fila.append(str(previos[r["modulo"]]["import_ms"]) if r["modulo"] in previos else "-")
+        pesados = ", ".join(f"{n}={ms}" for n, ms in r["pesados"].items()) or "-"
+        fila += [str(r["import_ms"]), str(r["arranque_ms"]), pesados]
+        filas.append(fila)
+
+    anchos = [max(len(c), *(len(f[i]) for f in filas)) if filas else len(c) for i, c in enumerate(columnas)]
+    lineas = ["  ".join(c.ljust(a) for c, a in zip(columnas, anchos))]
+    lineas += ["  ".join(v.ljust(a) for v, a in zip(fila, anchos)) for fila in filas]
+    return "\n".join(lineas)
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío de los puntos de entrada.")
+    parser.add_argument("--modulos", nargs="+", default=list(MODULOS), help="Módulos a importar.")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos por módulo (se usa la mediana).")
+    parser.add_argument("--ref", help="Revisión de git con la que comparar (p. ej. HEAD~1).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv or [])
+    despues = [medir_importacion(m, args.repeticiones) for m in args.modulos]
+    antes = medir_en_ref(args.ref, args.modulos, args.repeticiones) if args.ref else None
+
+    print(formatear_tabla(despues, antes))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"antes": antes, "despues": despues}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
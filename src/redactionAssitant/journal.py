@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """
+    Journal de solo escritura con los lotes ya corregidos de una ejecución.
+
+    Cada lote se anota en un archivo JSONL en cuanto llega su respuesta, junto
+    con el identificador de la ejecución y la huella de la entrada completa
+    (HU + CPS + EXP). Si la ejecución se interrumpe, una ejecución posterior
+    con ``reanudar=True`` y la misma entrada recupera esos lotes sin volver a
+    pedirlos al LLM.
+
+    Los lotes se identifican por el hash de su contenido (etapa, contexto e
+    ítems), de modo que no dependen de cómo se numeraron en la ejecución anterior.
+
+    Example:
+        >>> journal = RunJournal("data/processed/journal.jsonl", RunJournal.huella(hu, cps, exp), reanudar=True)
+        >>> journal.obtener("cps", batch, base=hu)
+        'OBS[1]: ..., CP: USRNM001 ...'
+    """
+
+    def __init__(self, path: Union[str, Path], huella: str, reanudar: bool = False, run_id: Optional[str] = None):
+        self.path = Path(path)
+        self.huella = huella
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.recuperados = 0
+        self._lotes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if reanudar:
+            self._cargar()
+        else:
+            # Una ejecución nueva empieza un journal vacío para que no crezca sin límite
+            self.path.write_text("", encoding="utf-8")
+
+    @staticmethod
+    def huella(hu: str, cps: str, exp: str) -> str:
+        """Huella de la entrada completa de una ejecución."""
+        payload = "\x1f".join((hu or "", cps or "", exp or ""))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def clave(etapa: str, items: List[str], base: str = "") -> str:
+        """Identificador de un lote a partir de su contenido."""
+        payload = json.dumps([etapa, base, items], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def obtener(self, etapa: str, items: List[str], base: str = "") -> Optional[str]:
+        """Devuelve la salida registrada de un lote, o None si hay que pedirlo."""
+        with self._lock:
+            salida = self._lotes.get(self.clave(etapa, items, base))
+            if salida is not None:
+                self.recuperados += 1
+        return salida
+
+    def registrar(self, etapa: str, items: List[str], salida: str, base: str = "") -> None:
+        """Anota la salida de un lote y la escribe a disco inmediatamente."""
+        clave = self.clave(etapa, items, base)
+        entrada = {
+            "run": self.run_id,
+            "huella": self.huella,
+            "etapa": etapa,
+            "lote": clave,
+            "items": len(items),
+            "salida": salida,
+            "ts": time.time(),
+        }
+        linea = json.dumps(entrada, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._lotes[clave] = salida
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(linea)
+                f.flush()
+
+    def _cargar(self) -> None:
+        """Carga los lotes de ejecuciones anteriores con la misma huella de entrada."""
+        if not self.path.exists():
+            return
+
+        ejecuciones = set()
+        with self.path.open(encoding="utf-8") as f:
+            for numero, linea in enumerate(f, 1):
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    # La última línea puede quedar cortada si el proceso murió escribiendo
+                    logger.warning("Línea %d del journal ilegible; se ignora", numero)
+                    continue
+                if entrada.get("huella") != self.huella:
+                    continue
+                self._lotes[entrada["lote"]] = entrada["salida"]
+                ejecuciones.add(entrada.get("run"))
+
+        logger.info(
+            "Journal %s: %d lotes recuperables de %d ejecuciones anteriores",
+            self.path, len(self._lotes), len(ejecuciones),
+        )
+
+    def __len__(self) -> int:
+        return len(self._lotes)
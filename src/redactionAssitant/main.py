@@ -7,45 +7,211 @@ Flujo:
   3. Procesa correcciones y genera feedback
   4. Guarda los resultados 
 """
+import argparse
+import asyncio
 import sys
 import logging
 from src.redactionAssitant.config import Config
-from src.redactionAssitant.utils import get_data, save_data
+from src.redactionAssitant.utils import get_data, get_data_streaming, salida_por_lineas, save_data
+from src.redactionAssitant.manifest import Manifest
 from src.redactionAssitant.processor import Processor
+from src.redactionAssitant.profiling import StageProfiler
 
 
-def process_flow() -> None:
-    """Carga datos, corrige CPS/EXP y guarda todo."""
+def process_flow(
+    stream: bool = False, pipeline: bool = False, incremental: bool = False,
+    full_rebuild: bool = False, resume: bool = False, profile: bool = False,
+) -> None:
+    """
+    Carga datos, corrige CPS/EXP y guarda todo.
+
+    Con ``incremental`` solo se envían al LLM las líneas que no están en el
+    manifiesto; ``full_rebuild`` corrige todas las líneas y regenera el manifiesto.
+    Con ``resume`` se reutilizan los lotes anotados en el journal por una
+    ejecución interrumpida con la misma entrada. Con ``profile`` cada etapa se
+    perfila con cProfile y el desglose se guarda en ``cfg.profile_dir``.
+    """
     cfg = Config()
+    if stream:
+        cfg.stream = True
+    _exigir_entrada_conservable(cfg)
+    profiler = StageProfiler(activo=profile)
 
     # 1) Leer datos
-    hus, cps, exp = get_data(cfg)
+    with profiler.etapa("carga"):
+        hus, cps, exp = get_data(cfg)
 
     # 2) Instanciar procesador
     proc = Processor(cfg, cfg.API_KEY)
+    if profile:
+        proc.profiler = profiler
+    proc.iniciar_journal(hus, cps, exp, reanudar=resume)
 
     # 3) Corregir y obtener feedback
-    new_cps, cps_feedback = proc.cps_corregidas(hus, cps)
-    new_exp, exp_feedback = proc.exp_corregidos(hus, new_cps, exp)
+    if incremental or full_rebuild:
+        manifest = Manifest(cfg.manifest_path)
+        new_cps, cps_feedback, new_exp, exp_feedback = proc.procesar_incremental(
+            hus, cps, exp, manifest, forzar=full_rebuild, pipeline=pipeline
+        )
+    elif pipeline:
+        new_cps, cps_feedback, new_exp, exp_feedback = proc.procesar_pipeline(hus, cps, exp)
+    else:
+        new_cps, cps_feedback = proc.cps_corregidas(hus, cps)
+        new_exp, exp_feedback = proc.exp_corregidos(hus, new_cps, exp)
 
+    proc.exportar_metricas()
+    with profiler.etapa("guardado"):
+        _guardar(cfg, new_cps, cps_feedback, new_exp, exp_feedback)
+    if profile:
+        profiler.guardar(cfg.profile_dir)
+
+
+async def aprocess_flow(profile: bool = False) -> None:
+    """Igual que process_flow, pero corrigiendo los lotes sobre un único event loop."""
+    cfg = Config()
+    _exigir_entrada_conservable(cfg)
+    profiler = StageProfiler(activo=profile)
+
+    with profiler.etapa("carga"):
+        hus, cps, exp = get_data(cfg)
+
+    proc = Processor(cfg, cfg.API_KEY)
+    if profile:
+        proc.profiler = profiler
+    try:
+        new_cps, cps_feedback = await proc.acps_corregidas(hus, cps)
+        new_exp, exp_feedback = await proc.aexp_corregidos(hus, new_cps, exp)
+    finally:
+        await proc.aclose()
+        proc.exportar_metricas()
+
+    with profiler.etapa("guardado"):
+        _guardar(cfg, new_cps, cps_feedback, new_exp, exp_feedback)
+    if profile:
+        profiler.guardar(cfg.profile_dir)
+
+
+def process_flow_streaming(stream: bool = False, profile: bool = False) -> None:
+    """
+    Variante de process_flow con memoria acotada para suites muy grandes.
+
+    CPS y EXP se leen línea a línea y las líneas corregidas se escriben en
+    orden a medida que terminan sus lotes; solo el feedback se guarda al final.
+    """
+    cfg = Config()
+    if stream:
+        cfg.stream = True
+    profiler = StageProfiler(activo=profile)
+
+    with profiler.etapa("carga"):
+        hus, cps, exp = get_data_streaming(cfg)
+
+    proc = Processor(cfg, cfg.API_KEY)
+    if profile:
+        proc.profiler = profiler
+
+    cps_out, exp_out, fb_out = cfg.all_output_paths()
+    with salida_por_lineas(cps_out) as escribir_cps, salida_por_lineas(exp_out) as escribir_exp:
+        def escribir(new_cps: list[str], new_exp: list[str]) -> None:
+            with profiler.etapa("guardado"):
+                escribir_cps(new_cps)
+                escribir_exp(new_exp)
+
+        cps_feedback, exp_feedback = proc.procesar_streaming(hus, cps, exp, escribir)
+
+    proc.exportar_metricas()
+    with profiler.etapa("guardado"):
+        resume_fb = _resumir_feedback(cps_feedback, exp_feedback)
+        with open(fb_out, "w", encoding="utf-8") as f:
+            f.write(resume_fb)
+    if profile:
+        profiler.guardar(cfg.profile_dir)
+
+
+def _exigir_entrada_conservable(cfg) -> None:
+    """Los flujos en memoria no pueden sustituir un lote fallido por su entrada: rechazan ``omitir``."""
+    if getattr(cfg, "batch_error_policy", "fallar") == "omitir":
+        raise ValueError("LLM_BATCH_ERROR_POLICY=omitir solo está disponible con --stream-files")
+
+
+def _resumir_feedback(cps_feedback: str, exp_feedback: str) -> str:
+    """Une el feedback de ambas etapas y lo registra."""
     feedback_parts = [part for part in (cps_feedback, exp_feedback) if part]
     resume_fb = "\n\n".join(feedback_parts)
+    logging.info("Feedback resumido:\n%s", resume_fb)
+    return resume_fb
 
-    logging.info("Feedback resumido:\n%s", resume_fb)
+
+def _guardar(cfg, new_cps: str, cps_feedback: str, new_exp: str, exp_feedback: str) -> None:
+    """Resume el feedback de ambas etapas y guarda las salidas."""
+    resume_fb = _resumir_feedback(cps_feedback, exp_feedback)
+
     # 4) Guardar salidas
     cps_out, exp_out, fb_out = cfg.all_output_paths()
     save_data(new_cps, new_exp, resume_fb, cps_out, exp_out, fb_out)
 
 
-def main() -> int:
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Auto-redactor de casos de prueba y Expected Results.")
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="Usa AsyncOpenAI con concurrencia limitada por LLM_MAX_CONCURRENCY en lugar de hilos.",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Consume las respuestas en streaming (modo síncrono) y aborta lotes cuya salida pierde el formato.",
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Solapa las etapas CPS y EXP: cada lote EXP se envía en cuanto su lote CPS está corregido.",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Corrige solo las líneas nuevas o modificadas y reutiliza el resto desde el manifiesto.",
+    )
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help="Ignora el manifiesto, corrige todas las líneas y lo regenera.",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Reanuda una ejecución interrumpida: solo pide los lotes que no están en el journal.",
+    )
+    parser.add_argument(
+        "--stream-files", action="store_true",
+        help="Lee CPS/EXP línea a línea y escribe las salidas según terminan los lotes (memoria acotada).",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Perfila cada etapa con cProfile y guarda el desglose de tiempos en data/processed/profile/.",
+    )
+    args = parser.parse_args(argv)
+    if args.stream_files and (args.use_async or args.incremental or args.full_rebuild or args.resume):
+        parser.error("--stream-files no se puede combinar con --async, --incremental, --full-rebuild ni --resume")
+    if args.use_async and (args.stream or args.pipeline or args.incremental or args.full_rebuild or args.resume):
+        parser.error("--async no se puede combinar con --stream, --pipeline, --incremental, --full-rebuild ni --resume")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
     """Punto de entrada: configura logging y lanza el flujo."""
+    args = _parse_args(argv or [])
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s %(levelname)s %(message)s",
         datefmt="%H:%M:%S"
     )
     try:
-        process_flow()
+        if args.use_async:
+            asyncio.run(aprocess_flow(profile=args.profile))
+        elif args.stream_files:
+            process_flow_streaming(stream=args.stream, profile=args.profile)
+        else:
+            process_flow(
+                stream=args.stream, pipeline=args.pipeline,
+                incremental=args.incremental, full_rebuild=args.full_rebuild, resume=args.resume,
+                profile=args.profile,
+            )
         logging.info("Proceso finalizado con éxito.")
         return 0
     except Exception:
@@ -54,4 +220,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class Manifest:
+    """
+    Manifiesto de líneas ya corregidas para el reprocesado incremental.
+
+    Guarda, por cada línea de entrada, el hash de (HU + CP + EXP) junto con el
+    caso de prueba y el Expected Result corregidos. En la siguiente ejecución
+    solo las líneas cuyo hash no aparece se envían al LLM; el resto se toma del
+    manifiesto.
+
+    Example:
+        >>> manifest = Manifest("data/processed/manifest.json")
+        >>> clave = Manifest.clave(hu, "USRNM001 Validar login", "Sistema permite acceso")
+        >>> manifest.obtener(clave)
+        {'cp': 'USRNM001 Validar inicio de sesión', 'exp': 'El sistema permite el acceso.'}
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.entradas: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                if data.get("version") == self.VERSION:
+                    self.entradas = data.get("lineas", {})
+                else:
+                    logger.warning("Versión de manifiesto no soportada en %s; se reconstruirá", self.path)
+            except (json.JSONDecodeError, AttributeError) as e:
+                logger.warning("Manifiesto ilegible en %s (%s); se reconstruirá", self.path, e)
+
+    @staticmethod
+    def clave(hu: str, cp: str, exp: str) -> str:
+        """Hash de una línea de entrada junto con la HU que le da contexto."""
+        payload = "\x1f".join((hu, cp, exp))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave: str) -> Optional[Dict[str, str]]:
+        """Devuelve la salida corregida almacenada para una línea, o None."""
+        return self.entradas.get(clave)
+
+    def registrar(self, clave: str, cp: str, exp: str) -> None:
+        """Registra la salida corregida de una línea."""
+        self.entradas[clave] = {"cp": cp, "exp": exp}
+
+    def guardar(self, claves_vigentes: Optional[Iterable[str]] = None) -> None:
+        """
+        Escribe el manifiesto de forma atómica.
+
+        Si se indican ``claves_vigentes`` se descartan las entradas de líneas que
+        ya no existen en la entrada, para que el archivo no crezca sin límite.
+        """
+        if claves_vigentes is not None:
+            vigentes = set(claves_vigentes)
+            self.entradas = {k: v for k, v in self.entradas.items() if k in vigentes}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(
+            json.dumps({"version": self.VERSION, "lineas": self.entradas}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        logger.info("Manifiesto guardado en %s (%d líneas)", self.path, len(self.entradas))
+
+    def __len__(self) -> int:
+        return len(self.entradas)
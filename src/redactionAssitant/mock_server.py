@@ -0,0 +1,304 @@
+"""
+Servidor local que imita la API de chat completions de OpenAI/DeepSeek.
+
+Sirve para medir el flujo de corrección sin red ni coste: responde con el
+formato que esperan los prompts de Builder (``OBS[n]: ..., CP: ...``,
+``ExpRes<n>:`` y feedback en texto plano), admite streaming SSE y permite
+inyectar latencia, errores 5xx y respuestas 429 con ``Retry-After``.
+
+Example:
+    >>> with MockLLMServer(latencia=Latencia("lognormal", media=0.2)) as server:
+    ...     client = OpenAI(api_key="x", base_url=server.url)
+"""
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUCIONES = ("fija", "uniforme", "exponencial", "lognormal")
+
+_MARCA_CASOS = "Casos de prueba:\n"
+_FIN_CASOS = "\n\nFin de instrucción."
+_MARCA_PARES = "pares Caso de Prueba + Expected Result:\n"
+
+
+class Latencia:
+    """
+    Distribución de la latencia hasta el primer byte de cada respuesta.
+
+    Attributes:
+        tipo: ``fija``, ``uniforme`` (entre 0 y 2·media), ``exponencial`` o ``lognormal``
+        media: Latencia media en segundos
+        sigma: Dispersión de la lognormal
+        por_linea: Pausa adicional entre líneas en streaming
+    """
+
+    def __init__(self, tipo: str = "fija", media: float = 0.0, sigma: float = 0.5, por_linea: float = 0.0):
+        if tipo not in DISTRIBUCIONES:
+            raise ValueError(f"Distribución '{tipo}' no válida. Disponibles: {list(DISTRIBUCIONES)}")
+        self.tipo = tipo
+        self.media = media
+        self.sigma = sigma
+        self.por_linea = por_linea
+
+    def muestrear(self, rng: random.Random) -> float:
+        if self.media <= 0:
+            return 0.0
+        if self.tipo == "uniforme":
+            return rng.uniform(0, 2 * self.media)
+        if self.tipo == "exponencial":
+            return rng.expovariate(1 / self.media)
+        if self.tipo == "lognormal":
+            # mu elegido para que la media de la distribución sea ``media``
+            mu = math.log(self.media) - self.sigma ** 2 / 2
+            return rng.lognormvariate(mu, self.sigma)
+        return self.media
+
+
+class MockLLMServer:
+    """
+    Servidor HTTP en segundo plano compatible con ``/chat/completions``.
+
+    Attributes:
+        latencia: Distribución de latencia de cada respuesta
+        tasa_429: Probabilidad de responder 429 (con ``retry-after-ms``)
+        tasa_error: Probabilidad de responder 500
+        retry_after_ms: Espera sugerida en las respuestas 429
+        peticiones: Peticiones atendidas (incluidas las fallidas)
+        latencias: Segundos desde la llegada hasta el último byte de cada respuesta 200
+        max_en_vuelo: Máximo de peticiones atendidas a la vez
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latencia: Optional[Latencia] = None,
+        tasa_429: float = 0.0,
+        tasa_error: float = 0.0,
+        retry_after_ms: int = 50,
+        semilla: Optional[int] = None,
+    ):
+        self.latencia = latencia or Latencia()
+        self.tasa_429 = tasa_429
+        self.tasa_error = tasa_error
+        self.retry_after_ms = retry_after_ms
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self.reiniciar_estadisticas()
+
+        servidor = self
+
+        class Handler(_ChatHandler):
+            mock = servidor
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._hilo.start()
+        logger.info("Servidor LLM simulado escuchando en %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def reiniciar_estadisticas(self) -> None:
+        with self._lock:
+            self.peticiones = 0
+            self.errores_429 = 0
+            self.errores_500 = 0
+            self.en_vuelo = 0
+            self.max_en_vuelo = 0
+            self.latencias: List[float] = []
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "peticiones": self.peticiones,
+                "errores_429": self.errores_429,
+                "errores_500": self.errores_500,
+                "max_en_vuelo": self.max_en_vuelo,
+                "latencias": list(self.latencias),
+            }
+
+    def _decidir_fallo(self) -> Optional[int]:
+        with self._lock:
+            tirada = self._rng.random()
+            if tirada < self.tasa_429:
+                self.errores_429 += 1
+                return 429
+            if tirada < self.tasa_429 + self.tasa_error:
+                self.errores_500 += 1
+                return 500
+        return None
+
+    def _muestrear_latencia(self) -> float:
+        with self._lock:
+            return self.latencia.muestrear(self._rng)
+
+    def _entrar(self) -> None:
+        with self._lock:
+            self.peticiones += 1
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+
+    def _salir(self, latencia: Optional[float]) -> None:
+        with self._lock:
+            self.en_vuelo -= 1
+            if latencia is not None:
+                self.latencias.append(latencia)
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Atiende ``POST /chat/completions`` (o ``/v1/chat/completions``)."""
+
+    protocol_version = "HTTP/1.1"
+    mock: MockLLMServer
+
+    def log_message(self, format, *args):  # noqa: A002 - firma de BaseHTTPRequestHandler
+        logger.debug("mock-llm: " + format, *args)
+
+    def do_POST(self):
+        inicio = time.perf_counter()
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"Ruta no soportada: {self.path}", "type": "not_found"}})
+            return
+
+        self.mock._entrar()
+        latencia = None
+        try:
+            peticion = json.loads(cuerpo or b"{}")
+            fallo = self.mock._decidir_fallo()
+            if fallo == 429:
+                self._json(429, {"error": {"message": "Rate limit simulado", "type": "rate_limit"}},
+                           {"retry-after-ms": str(self.mock.retry_after_ms)})
+                return
+            if fallo == 500:
+                self._json(500, {"error": {"message": "Error simulado", "type": "server_error"}})
+                return
+
+            time.sleep(self.mock._muestrear_latencia())
+            contenido = generar_respuesta(peticion.get("messages", []))
+            usage = _usage(peticion.get("messages", []), contenido)
+            modelo = peticion.get("model", "mock")
+            if peticion.get("stream"):
+                self._stream(modelo, contenido, usage, (peticion.get("stream_options") or {}).get("include_usage"))
+            else:
+                self._json(200, _completion(modelo, contenido, usage))
+            latencia = time.perf_counter() - inicio
+        finally:
+            self.mock._salir(latencia)
+
+    def _json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for clave, valor in (headers or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, modelo: str, contenido: str, usage: Dict[str, int], include_usage: bool) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        id_ = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        lineas = contenido.splitlines(keepends=True)
+        for i, linea in enumerate(lineas):
+            if i and self.mock.latencia.por_linea:
+                time.sleep(self.mock.latencia.por_linea)
+            self._evento(_chunk(id_, modelo, {"content": linea}))
+        self._evento(_chunk(id_, modelo, {}, finish_reason="stop"))
+        if include_usage:
+            self._evento({**_chunk(id_, modelo, {}), "choices": [], "usage": usage})
+        self._escribir_trozo(b"data: [DONE]\n\n")
+        self._escribir_trozo(b"")
+
+    def _evento(self, data: Dict[str, Any]) -> None:
+        self._escribir_trozo(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _escribir_trozo(self, datos: bytes) -> None:
+        self.wfile.write(f"{len(datos):x}\r\n".encode("ascii") + datos + b"\r\n")
+        self.wfile.flush()
+
+
+def generar_respuesta(mensajes: List[Dict[str, str]]) -> str:
+    """Genera una respuesta con el formato que espera cada prompt de Builder."""
+    texto = "\n".join(m.get("content", "") for m in mensajes if m.get("role") == "user")
+
+    if _MARCA_CASOS in texto:
+        casos = texto.split(_MARCA_CASOS, 1)[1].split(_FIN_CASOS, 1)[0]
+        lineas = [c.strip() for c in casos.splitlines() if c.strip()]
+        return "\n".join(f"OBS[{i}]: sin cambios, CP: {cp}" for i, cp in enumerate(lineas, 1))
+
+    if _MARCA_PARES in texto:
+        pares = texto.split(_MARCA_PARES, 1)[1].splitlines()
+        salida = []
+        for par in pares:
+            if " | " not in par:
+                continue
+            resultado = par.split(" | ", 1)[1].strip()
+            salida.append(f"ExpRes{len(salida) + 1}: {resultado[:1].upper()}{resultado[1:]}")
+        salida.append("OBS: Se aplicó mayúscula inicial.")
+        return "\n".join(salida)
+
+    return "Sin observaciones relevantes en las correcciones."
+
+
+def _usage(mensajes: List[Dict[str, str]], contenido: str) -> Dict[str, int]:
+    prompt = sum(len(m.get("content", "")) for m in mensajes) // 4 + 1
+    completion = len(contenido) // 4 + 1
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _completion(modelo: str, contenido: str, usage: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": modelo,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": contenido},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+def _chunk(id_: str, modelo: str, delta: Dict[str, str], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": id_,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": modelo,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
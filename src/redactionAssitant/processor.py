@@ -1,8 +1,60 @@
+import asyncio
+import hashlib
 import logging
+import sys
+import threading
+import time
+from collections import deque
+from itertools import zip_longest
+from typing import Callable, Iterable
 from src.redactionAssitant import builder as b
-from concurrent.futures import ThreadPoolExecutor
+from src.redactionAssitant import http_pool
+from src.redactionAssitant.batching import BatchPlanner
+from src.redactionAssitant.cache import ResponseCache
+from src.redactionAssitant.journal import RunJournal
+from src.redactionAssitant.manifest import Manifest
+from src.redactionAssitant.profiling import StageProfiler
+from src.redactionAssitant.scheduler import RequestScheduler
+from src.redactionAssitant.telemetry import Tracer, en_contexto
+from src.redactionAssitant.utils import mapear_lotes
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import re 
-from openai import OpenAI  
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+
+
+def __getattr__(nombre: str):
+    # openai tarda ~0.5 s en importarse: se carga al crear el primer cliente, no al importar el módulo
+    if nombre in ("OpenAI", "AsyncOpenAI"):
+        import openai
+        return getattr(openai, nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def _sdk(nombre: str):
+    """Clase del SDK de openai, respetando las sustituciones hechas sobre este módulo."""
+    return getattr(sys.modules[__name__], nombre)
+
+
+class _ClienteDiferido:
+    """
+    Envoltorio que crea el cliente de la API en su primer uso.
+
+    Una ejecución que no llega a llamar al LLM (entrada vacía, todo en el
+    manifiesto o en el journal) no importa openai ni abre conexiones.
+    """
+
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, nombre):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = self._fabrica()
+        return getattr(self._cliente, nombre)
 
 
 class Processor:
@@ -21,32 +73,134 @@ class Processor:
     Attributes:
         cfg: Objeto de configuración con rutas y parámetros del sistema
         logger: Logger para trazabilidad del proceso
-        client: Cliente OpenAI configurado para DeepSeek API
+        client: Cliente OpenAI configurado para DeepSeek API (se crea en la primera petición
+            sobre el pool HTTP compartido por el proceso, configurable con ``cfg.http_pool``)
         builder: Constructor de prompts especializados para IA
-        batch_size: Tamaño de lote para procesamiento concurrente (default: 20)
+        cache: Caché persistente de respuestas del LLM (None si está desactivada)
+        scheduler: Planificador central de peticiones (ritmo, reintentos y plazos)
+        tracer: Registro de spans por etapa, lote y llamada al LLM (latencia, tokens, reintentos)
+        batch_size: Máximo de ítems por lote (default: 20); el tamaño real lo decide
+            el planificador según el presupuesto de tokens
+        planners: Planificadores de lotes por operación, calibrados con el uso real
+        max_concurrency: Límite de lotes en vuelo en la variante asíncrona (default: 16)
+        stream: Si es True, las respuestas se consumen línea a línea en streaming
+        al_recibir: Función opcional ``(etapa, resultado)`` que, en streaming, recibe cada
+            caso corregido (``"cps"``) o resultado esperado (``"exp"``) en cuanto llega su
+            línea, sin esperar al resto del lote; se llama desde los hilos de los lotes
+        feedback_max_chars: Tamaño máximo de la entrada de cada llamada de reducción de feedback
+        max_reparaciones: Peticiones extra permitidas por lote de CPS para recuperar casos que faltan
+        deduplicar: Si es True, los casos repetidos (salvo ID, mayúsculas o espacios) se envían una sola vez
+        journal: Journal de lotes completados para reanudar ejecuciones (None si no se inició)
+        profiler: Perfilado por etapas; inactivo salvo que el punto de entrada asigne uno (``--profile``)
     
     Example:
         >>> config = Config()
         >>> processor = Processor(config, "api_key_here")
         >>> cps_corregidos, feedback = processor.cps_corregidas(hu_text, cps_text)
+        >>> cps_corregidos, feedback = await processor.acps_corregidas(hu_text, cps_text)
     """
 
+    # Líneas fuera de formato toleradas en streaming antes de abortar un lote
+    MAX_LINEAS_FUERA_DE_FORMATO = 3
+
     def __init__(self, cfg, api_key):
         self.cfg = cfg
         self.logger = logging.getLogger(__name__)
+        self.base_url = getattr(cfg, "base_url", DEFAULT_BASE_URL)
         
         if not api_key:
             raise ValueError("API key is required")
-            
+
+        self._api_key = api_key
+        self.opciones_http = getattr(cfg, "http_pool", {})
+        self._conexiones_base = None
+        self.client = _ClienteDiferido(self._crear_cliente)
+        self.cache = self._crear_cache(cfg)
+        self.scheduler = RequestScheduler(
+            rpm=getattr(cfg, "rpm", 300),
+            tpm=getattr(cfg, "tpm", 1_000_000),
+            max_reintentos=getattr(cfg, "max_retries", 5),
+            deadline=getattr(cfg, "request_deadline", 120.0),
+        )
+        self.tracer = Tracer(
+            getattr(cfg, "trace_path", None),
+            atributos={"hu": cfg.code_hu},
+            precios=getattr(cfg, "llm_prices", None),
+        )
+        self.builder = b.Builder(
+            self.client, cache=self.cache, on_usage=self._registrar_uso, scheduler=self.scheduler, tracer=self.tracer
+        )
+        self.async_builder = None
+        self.journal = None
+        self.profiler = StageProfiler(activo=False)
+        self.batch_size = 20
+        self.max_concurrency = getattr(cfg, "max_concurrency", 16)
+        self.stream = getattr(cfg, "stream", False)
+        self.al_recibir = None
+        self.feedback_max_chars = getattr(cfg, "feedback_max_chars", 8000)
+        self.max_reparaciones = getattr(cfg, "batch_repair_retries", 3)
+        self.deduplicar = getattr(cfg, "dedup", True)
+        self.workers = 4
+        self.politica_lotes = getattr(cfg, "batch_error_policy", "fallar")
+        self.reintentos_lote = getattr(cfg, "batch_error_retries", 1)
+
+        token_budget = getattr(cfg, "token_budget", 6000)
+        max_completion = getattr(cfg, "max_completion_tokens", 3500)
+        self.planners = {
+            "ortografia": BatchPlanner(token_budget, max_completion, ratio_salida=1.6),
+            "expect_result": BatchPlanner(token_budget, max_completion, ratio_salida=0.9),
+        }
+        self.logger.info("Processor initialized successfully")
+
+    def _crear_cliente(self):
+        """Crea el cliente síncrono de la API (importa openai en ese momento) sobre el pool HTTP compartido."""
         try:
-            self.client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+            self._medir_conexiones()
+            # Los reintentos los gestiona RequestScheduler, no el cliente
+            return _sdk("OpenAI")(
+                api_key=self._api_key, base_url=self.base_url, max_retries=0,
+                http_client=http_pool.cliente_http(**self.opciones_http),
+            )
         except Exception as e:
             self.logger.error("Failed to initialize OpenAI client: %s", e)
             raise
-            
-        self.builder = b.Builder(self.client)
-        self.batch_size = 20
-        self.logger.info("Processor initialized successfully")
+
+    def _medir_conexiones(self):
+        """Toma como referencia los contadores del pool la primera vez que este Processor abre un cliente."""
+        if self._conexiones_base is None:
+            self._conexiones_base = http_pool.ESTADISTICAS.instantanea()
+
+    def _crear_cache(self, cfg):
+        """Crea la caché de respuestas si la configuración la define y no está desactivada."""
+        cache_path = getattr(cfg, "cache_path", None)
+        cache_mode = getattr(cfg, "cache_mode", "off")
+        if cache_path is None or cache_mode == "off":
+            return None
+
+        cache = ResponseCache(
+            cache_path,
+            max_bytes=int(cfg.cache_max_mb * 1024 * 1024),
+            max_age=cfg.cache_max_age_days * 24 * 3600,
+            modo=cache_mode,
+        )
+        self.logger.info("Caché de respuestas activa en %s (modo=%s)", cache_path, cache_mode)
+        return cache
+
+    def iniciar_journal(self, hu: str, cps: str, exp: str, reanudar: bool = False):
+        """
+        Activa el journal de lotes para esta entrada.
+
+        Cada lote corregido se anota en cuanto llega; con ``reanudar`` se
+        recuperan los lotes anotados por ejecuciones anteriores con la misma
+        entrada y solo se piden al LLM los que falten.
+        """
+        journal_path = getattr(self.cfg, "journal_path", None)
+        if journal_path is None:
+            return None
+
+        self.journal = RunJournal(journal_path, RunJournal.huella(hu, cps, exp), reanudar=reanudar)
+        self.logger.info("Journal de ejecución %s en %s", self.journal.run_id, journal_path)
+        return self.journal
 
     def cps_corregidas(self, hu: str, cps: str) -> tuple[str, str]:
         """
@@ -73,37 +227,427 @@ class Processor:
             >>> cps = "USRNM001 Validar login con credenciales validas"
             >>> corregidos, feedback = processor.cps_corregidas(hu, cps)
         """
-        cod_hu = self.cfg.code_hu
-        self.logger.info("Corrigiendo casos de prueba para la HU: %s", cod_hu)
-        
-        if not hu or not cps:
-            self.logger.warning("Historia de usuario o casos de prueba vacíos.")
-            return "", ""
-        
-        # Procesar en batches
-        cps_list = preprocess_exp_or_cps(cps)
-        if not cps_list:
-            return "", ""
-        
-        batches = [cps_list[i : i + self.batch_size] for i in range(0, len(cps_list), self.batch_size)]
+        with self.profiler.etapa("preproceso"):
+            cps_list = self._preparar_cps(hu, cps)
+            if not cps_list:
+                return "", ""
+
+            unicos, posiciones = self._deduplicar_items(cps_list, self._clave_caso, "casos de prueba")
+            batches = self._dividir_en_batches(unicos, "ortografia", base=hu)
 
         results = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            for batch_out in executor.map(lambda b: self.builder.corregir_ortografia(hu, b), batches):
-                results.extend(batch_out.splitlines())
+        resumenes = []
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="cps", items=len(cps_list)), \
+                ThreadPoolExecutor(max_workers=self.workers) as executor, ThreadPoolExecutor(max_workers=2) as fb_executor:
+            for lineas in self._mapear_lotes(lambda batch: self._corregir_lote_cps_reparando(hu, batch), batches, executor):
+                results.extend(lineas)
+                resumenes.append(fb_executor.submit(en_contexto(self._feedback_lote), _obs_cps(lineas)))
+            feedbacks = [futuro.result() for futuro in resumenes]
         self.logger.info("Corrección de casos de prueba completada. Procesando resultados...")
-        sep_obs = "OBS"
-        sep_cps = cod_hu
-        
-        obs   = "\n".join([l for l in results if l.startswith(sep_obs)])
+
+        with self.profiler.etapa("parseo"):
+            _, cps_r = self._extraer_cps(results)
+            cps_r = self._expandir_casos(cps_list, unicos, posiciones, self._fusionar_por_id(unicos, cps_r))
+        with self.profiler.etapa("feedback"):
+            feedback = self._reducir_feedback(feedbacks)
+        with self.profiler.etapa("parseo"):
+            return self._resultado_cps(cps, cps_list, cps_r, feedback)
+
+    async def acps_corregidas(self, hu: str, cps: str) -> tuple[str, str]:
+        """
+        Variante asíncrona de cps_corregidas basada en AsyncOpenAI.
+
+        La concurrencia se limita con un semáforo de ``max_concurrency`` lotes en
+        vuelo en lugar de un pool de hilos, y el resultado es idéntico al de la
+        versión síncrona.
+
+        Example:
+            >>> corregidos, feedback = asyncio.run(processor.acps_corregidas(hu, cps))
+        """
+        with self.profiler.etapa("preproceso"):
+            cps_list = self._preparar_cps(hu, cps)
+            if not cps_list:
+                return "", ""
+
+            builder = self._obtener_async_builder()
+            unicos, posiciones = self._deduplicar_items(cps_list, self._clave_caso, "casos de prueba")
+            batches = self._dividir_en_batches(unicos, "ortografia", base=hu)
+
+        corregir_lote = self._areintentando(self._acorregir_lote_cps_reparando)
+
+        async def corregir(batch):
+            lineas = await corregir_lote(builder, hu, batch)
+            return lineas, await self._afeedback_lote(_obs_cps(lineas))
+
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="cps", items=len(cps_list)):
+            outs = await self._gather_limitado(corregir(batch) for batch in batches)
+
+        results = [line for lineas, _ in outs for line in lineas]
+        self.logger.info("Corrección de casos de prueba completada. Procesando resultados...")
+
+        with self.profiler.etapa("parseo"):
+            _, cps_r = self._extraer_cps(results)
+            cps_r = self._expandir_casos(cps_list, unicos, posiciones, self._fusionar_por_id(unicos, cps_r))
+        with self.profiler.etapa("feedback"):
+            feedback = await self._areducir_feedback([resumen for _, resumen in outs])
+        with self.profiler.etapa("parseo"):
+            return self._resultado_cps(cps, cps_list, cps_r, feedback)
+
+    def _preparar_cps(self, hu: str, cps: str) -> list[str]:
+        """Valida las entradas de cps_corregidas y devuelve la lista de casos a corregir."""
+        self.logger.info("Corrigiendo casos de prueba para la HU: %s", self.cfg.code_hu)
+
+        if not hu or not cps:
+            self.logger.warning("Historia de usuario o casos de prueba vacíos.")
+            return []
+
+        return preprocess_exp_or_cps(cps)
+
+    def _deduplicar_items(self, items: list[str], clave, descripcion: str) -> tuple[list[str], list[int]]:
+        """
+        Agrupa los ítems equivalentes según ``clave`` para enviar cada uno una sola vez.
+
+        Returns:
+            tuple[list[str], list[int]]: (ítems únicos, índice del único de cada ítem original)
+        """
+        if not self.deduplicar:
+            return items, list(range(len(items)))
+
+        unicos: list[str] = []
+        posiciones: list[int] = []
+        vistos: dict[str, int] = {}
+        for item in items:
+            k = clave(item)
+            if k not in vistos:
+                vistos[k] = len(unicos)
+                unicos.append(item)
+            posiciones.append(vistos[k])
+
+        if len(unicos) < len(items):
+            self.logger.info(
+                "Deduplicación de %s: %d -> %d únicos (ratio %.2f, %d peticiones de ítems ahorradas)",
+                descripcion, len(items), len(unicos), len(unicos) / len(items), len(items) - len(unicos),
+            )
+        return unicos, posiciones
+
+    def _clave_caso(self, linea: str) -> str:
+        """Forma normalizada de un caso: sin ID, con espacios colapsados y sin distinguir mayúsculas."""
+        cuerpo = re.sub(rf"^\s*{re.escape(self.cfg.code_hu)}\w*[\s:.-]*", "", linea)
+        return " ".join(cuerpo.split()).casefold()
+
+    def _clave_par(self, par: str) -> str:
+        """Forma normalizada de un par 'caso | resultado'."""
+        cp, _, ex = par.partition(" | ")
+        return self._clave_caso(cp) + "\x1f" + " ".join(ex.split()).casefold()
+
+    def _expandir_casos(self, cps_list: list[str], unicos: list[str], posiciones: list[int], corregidos: list[str]) -> list[str]:
+        """Reparte cada caso único corregido entre todos sus duplicados, cambiando el ID por el original."""
+        if len(unicos) == len(cps_list) or len(corregidos) != len(unicos):
+            return corregidos
+
+        salida = []
+        for original, pos in zip(cps_list, posiciones):
+            corregido = corregidos[pos]
+            id_original, id_unico = self._id_caso(original), self._id_caso(unicos[pos])
+            if id_original and id_unico and id_original != id_unico:
+                corregido = corregido.replace(id_unico, id_original, 1)
+            salida.append(corregido)
+        return salida
+
+    def _expandir_exp(self, exp_str: str, unicos: list[str], posiciones: list[int]) -> str:
+        """Reparte los Expected Results de los pares únicos entre todos sus duplicados."""
+        exp_lines = exp_str.splitlines()
+        if len(unicos) == len(posiciones) or len(exp_lines) != len(unicos):
+            return exp_str
+        return "\n".join(exp_lines[pos] for pos in posiciones)
+
+    def _dividir_en_batches(self, items: list[str], operacion: str, base: str = "") -> list[list[str]]:
+        """Agrupa los ítems en lotes según el presupuesto de tokens de la operación."""
+        batches = self.planners[operacion].planificar(items, base=base, max_items=self.batch_size)
+        self.logger.info("%d ítems agrupados en %d lotes", len(items), len(batches))
+        return batches
+
+    def _mapear_lotes(self, procesador, lotes, executor, originales=None):
+        """
+        Corrige los lotes en ``executor`` y devuelve los resultados en orden.
+
+        Hay como mucho ``2 * workers`` lotes en vuelo y un lote que lanza una
+        excepción se trata según ``LLM_BATCH_ERROR_POLICY``. Con ``omitir`` el
+        lote fallido se sustituye por ``originales(lote)``, así que solo se
+        admite en los modos que pueden conservar la entrada (``procesar_streaming``).
+
+        Raises:
+            ValueError: Si la política es ``omitir`` y no se indica ``originales``
+        """
+        politica = self.politica_lotes
+        if politica == "omitir":
+            if originales is None:
+                raise ValueError("LLM_BATCH_ERROR_POLICY=omitir solo está disponible con --stream-files")
+            procesador = self._conservando_originales(procesador, originales)
+            politica = "fallar"
+        return mapear_lotes(
+            lotes, en_contexto(procesador), max_en_vuelo=2 * self.workers,
+            politica=politica, reintentos=self.reintentos_lote, executor=executor,
+        )
+
+    def _conservando_originales(self, procesador, originales):
+        """Envuelve ``procesador`` para que un lote que falla devuelva ``originales(lote)``."""
+        def ejecutar(lote):
+            try:
+                return procesador(lote)
+            except Exception as e:
+                self.logger.warning("Lote omitido tras un error (%s); se conservan las líneas originales", e)
+                return originales(lote)
+
+        return ejecutar
+
+    def _reintentando(self, procesador):
+        """
+        Envuelve ``procesador`` para reenviar el lote con ``LLM_BATCH_ERROR_POLICY=reintentar``.
+
+        Lo usa ``procesar_pipeline``, que planifica sus lotes sin ``mapear_lotes``;
+        con otra política devuelve ``procesador`` sin cambios.
+        """
+        if self.politica_lotes != "reintentar":
+            return procesador
+
+        def ejecutar(*args):
+            for intento in range(1, self.reintentos_lote + 1):
+                try:
+                    return procesador(*args)
+                except Exception as e:
+                    self.logger.warning("Error en el lote: %s; reintento %d de %d", e, intento, self.reintentos_lote)
+            return procesador(*args)
+
+        return ejecutar
+
+    def _areintentando(self, procesador):
+        """Variante asíncrona de _reintentando para los lotes de ``--async``."""
+        if self.politica_lotes != "reintentar":
+            return procesador
+
+        async def ejecutar(*args):
+            for intento in range(1, self.reintentos_lote + 1):
+                try:
+                    return await procesador(*args)
+                except Exception as e:
+                    self.logger.warning("Error en el lote: %s; reintento %d de %d", e, intento, self.reintentos_lote)
+            return await procesador(*args)
+
+        return ejecutar
+
+    def _corregir_lote_cps(self, hu: str, batch: list[str]) -> str:
+        """Corrige un lote de casos de prueba, en streaming si está activado."""
+        with self.tracer.span("lote", etapa="cps", lote=self._id_lote(batch), items=len(batch)) as span:
+            if self.stream:
+                lineas = self.builder.corregir_ortografia_stream(hu, batch)
+                return self._consumir_stream(lineas, self._es_linea_cps, "cps", span)
+            return self.builder.corregir_ortografia(hu, batch)
+
+    def _id_lote(self, batch: list[str]) -> str:
+        """Identificador legible de un lote: IDs del primer y último caso (o un hash si no tienen)."""
+        primero, ultimo = self._id_caso(batch[0]), self._id_caso(batch[-1])
+        if primero and ultimo:
+            return primero if primero == ultimo else f"{primero}-{ultimo}"
+        return hashlib.sha1("\n".join(batch).encode("utf-8")).hexdigest()[:10]
+
+    def _corregir_lote_cps_reparando(self, hu: str, batch: list[str]) -> list[str]:
+        """
+        Corrige un lote de CPS y vuelve a pedir solo los casos que falten en la respuesta.
+
+        Los casos ausentes se identifican por su ID; si un reintento tampoco los
+        devuelve, el grupo se parte por la mitad. Como mucho se hacen
+        ``max_reparaciones`` peticiones extra por lote. Devuelve todas las líneas
+        recibidas (también las de los reintentos); la fusión por ID se hace después.
+        """
+        if self.journal is not None:
+            guardado = self.journal.obtener("cps", batch, base=hu)
+            if guardado is not None:
+                return guardado.splitlines()
+
+        lineas = self._corregir_lote_cps(hu, batch).splitlines()
+        faltantes = self._casos_faltantes(batch, lineas)
+        pendientes = [faltantes] if faltantes else []
+        presupuesto = self.max_reparaciones
+
+        while pendientes and presupuesto > 0:
+            grupo = pendientes.pop(0)
+            presupuesto -= 1
+            self.logger.warning("Reintentando %d casos ausentes en la respuesta del lote", len(grupo))
+            nuevas = self._corregir_lote_cps(hu, grupo).splitlines()
+            lineas.extend(nuevas)
+            faltantes = self._casos_faltantes(grupo, nuevas)
+            if len(faltantes) > 1:
+                mitad = len(faltantes) // 2
+                pendientes.extend([faltantes[:mitad], faltantes[mitad:]])
+            elif faltantes:
+                pendientes.append(faltantes)
+
+        if pendientes:
+            self.logger.warning(
+                "Presupuesto de reparación agotado: %d casos sin corregir en el lote",
+                sum(len(grupo) for grupo in pendientes),
+            )
+        elif self.journal is not None:
+            self.journal.registrar("cps", batch, "\n".join(lineas), base=hu)
+        return lineas
+
+    async def _acorregir_lote_cps_reparando(self, builder, hu: str, batch: list[str]) -> list[str]:
+        """
+        Variante asíncrona de _corregir_lote_cps_reparando.
+
+        Repara los casos ausentes con el mismo presupuesto de ``max_reparaciones``
+        peticiones extra por lote. No consulta el journal: ``--async`` no admite
+        ``--resume``.
+        """
+        async def corregir(grupo):
+            with self.tracer.span("lote", etapa="cps", lote=self._id_lote(grupo), items=len(grupo)):
+                return (await builder.corregir_ortografia(hu, grupo)).splitlines()
+
+        lineas = await corregir(batch)
+        faltantes = self._casos_faltantes(batch, lineas)
+        pendientes = [faltantes] if faltantes else []
+        presupuesto = self.max_reparaciones
+
+        while pendientes and presupuesto > 0:
+            grupo = pendientes.pop(0)
+            presupuesto -= 1
+            self.logger.warning("Reintentando %d casos ausentes en la respuesta del lote", len(grupo))
+            nuevas = await corregir(grupo)
+            lineas.extend(nuevas)
+            faltantes = self._casos_faltantes(grupo, nuevas)
+            if len(faltantes) > 1:
+                mitad = len(faltantes) // 2
+                pendientes.extend([faltantes[:mitad], faltantes[mitad:]])
+            elif faltantes:
+                pendientes.append(faltantes)
+
+        if pendientes:
+            self.logger.warning(
+                "Presupuesto de reparación agotado: %d casos sin corregir en el lote",
+                sum(len(grupo) for grupo in pendientes),
+            )
+        return lineas
+
+    def _casos_faltantes(self, batch: list[str], lineas: list[str]) -> list[str]:
+        """Casos del lote cuyo ID no aparece entre los casos corregidos de la respuesta."""
+        ids = [self._id_caso(item) for item in batch]
+        if None in ids:
+            # Sin IDs no se puede saber qué caso falta: se valida solo el total al final
+            return []
+        devueltos = {self._id_caso(cp) for cp in self._casos_en(lineas)}
+        return [item for item, id_caso in zip(batch, ids) if id_caso not in devueltos]
+
+    def _fusionar_por_id(self, cps_list: list[str], cps_r: list[str]) -> list[str]:
+        """
+        Ordena los casos corregidos según los casos originales usando su ID.
+
+        Se conserva la primera respuesta para cada ID y se descartan duplicados o
+        IDs desconocidos. Si los casos originales no tienen IDs únicos se
+        devuelven tal cual, en orden de llegada.
+        """
+        ids = [self._id_caso(item) for item in cps_list]
+        if None in ids or len(set(ids)) != len(ids):
+            return cps_r
+
+        por_id: dict[str, str] = {}
+        for cp in cps_r:
+            por_id.setdefault(self._id_caso(cp), cp)
+        return [por_id[id_caso] for id_caso in ids if id_caso in por_id]
+
+    def _id_caso(self, linea: str):
+        """ID del caso de prueba (código de HU seguido de su número), o None si no tiene."""
+        match = re.search(rf"{re.escape(self.cfg.code_hu)}\w*", linea)
+        return match.group(0) if match else None
+
+    def _corregir_lote_exp(self, batch: list[str]) -> str:
+        """Corrige un lote de pares 'caso | resultado', en streaming si está activado."""
+        if self.journal is not None:
+            guardado = self.journal.obtener("exp", batch)
+            if guardado is not None:
+                return guardado
+
+        with self.tracer.span("lote", etapa="exp", lote=self._id_lote(batch), items=len(batch)) as span:
+            if self.stream:
+                lineas = self.builder.corregir_expect_result_stream("\n".join(batch))
+                salida = self._consumir_stream(lineas, self._es_linea_exp, "exp", span)
+            else:
+                salida = self.builder.corregir_expect_result("\n".join(batch))
+
+        # Solo se anotan lotes completos; uno incompleto se vuelve a pedir al reanudar
+        completos = sum(1 for l in salida.splitlines() if l.startswith("ExpRes"))
+        if self.journal is not None and completos == len(batch):
+            self.journal.registrar("exp", batch, salida)
+        return salida
+
+    def _es_linea_cps(self, line: str) -> bool:
+        return line.startswith("OBS") or self.cfg.code_hu in line
+
+    def _es_linea_exp(self, line: str) -> bool:
+        return line.startswith("OBS") or line.startswith("ExpRes")
+
+    def _consumir_stream(self, lineas, es_valida, etapa: str, span: dict) -> str:
+        """
+        Consume las líneas de un stream a medida que llegan.
+
+        Cada caso corregido o resultado esperado se entrega a ``al_recibir`` en
+        cuanto llega su línea, y el tiempo hasta el primero se anota en el span
+        del lote (``primer_resultado_s``). Si aparecen más de
+        MAX_LINEAS_FUERA_DE_FORMATO líneas que no respetan el formato esperado se
+        cierra el stream, lo que corta la petición y evita pagar el resto de la
+        respuesta. Devuelve todas las líneas recibidas para validar el lote.
+        """
+        inicio = time.perf_counter()
+        recibidas: list[str] = []
+        fuera_de_formato = 0
+        for line in lineas:
+            if not recibidas:
+                self.logger.debug("Primera línea recibida en %.3fs", time.perf_counter() - inicio)
+            recibidas.append(line)
+            if es_valida(line):
+                resultado = self._resultado_en_linea(etapa, line)
+                if resultado is not None:
+                    span.setdefault("primer_resultado_s", round(time.perf_counter() - inicio, 6))
+                    if self.al_recibir is not None:
+                        self.al_recibir(etapa, resultado)
+                continue
+            fuera_de_formato += 1
+            if fuera_de_formato > self.MAX_LINEAS_FUERA_DE_FORMATO:
+                lineas.close()
+                self.logger.warning(
+                    "Lote abortado: %d líneas fuera de formato tras %d líneas recibidas",
+                    fuera_de_formato, len(recibidas),
+                )
+                break
+        return "\n".join(recibidas)
+
+    def _resultado_en_linea(self, etapa: str, line: str) -> str | None:
+        """Caso corregido (etapa ``cps``) o resultado esperado (``exp``) de una línea, o None si no trae."""
+        if etapa == "cps":
+            casos = self._casos_en([line])
+            return casos[0] if casos else None
+        return line.split(":", 1)[-1].strip() if line.startswith("ExpRes") else None
+
+    def _registrar_uso(self, operacion: str, registro: dict) -> None:
+        """Recibe el uso observado por Builder y recalibra el planificador correspondiente."""
+        planner = self.planners.get(operacion)
+        if planner is not None:
+            planner.registrar_uso(registro)
+
+    def _extraer_cps(self, results: list[str]) -> tuple[str, list[str]]:
+        """Separa las observaciones y los casos corregidos de las líneas devueltas por el modelo."""
+        obs   = _obs_cps(results)
         # Filtrar casos de prueba corregidos
         self.logger.info("Filtrando casos de prueba corregidos...")
-        # regex extraer desde sep_cps hasta el final de la línea o hasta sep_obs
-        regex_cps = f"{sep_cps}.*?(?={sep_obs}|$)"
-        cps_r = [re.search(regex_cps, l).group(0) for l in results if re.search(regex_cps, l)]
+        return obs, self._casos_en(results)
 
-        feedback = self.builder.obtener_feedback(obs)
+    def _casos_en(self, lineas: list[str]) -> list[str]:
+        """Extrae los casos corregidos: desde el código de HU hasta el final de la línea o hasta OBS."""
+        regex_cps = f"{self.cfg.code_hu}.*?(?=OBS|$)"
+        return [re.search(regex_cps, l).group(0) for l in lineas if re.search(regex_cps, l)]
 
+    def _resultado_cps(self, cps: str, cps_list: list[str], cps_r: list[str], feedback: str) -> tuple[str, str]:
+        """Valida la cantidad de casos corregidos y compone la salida de cps_corregidas."""
         if len(cps_r) != len(cps_list):
             self.logger.warning("La cantidad de casos de prueba corregidos no coincide con la original.")
             self.logger.warning("número de casos de prueba originales: %d", len(cps_list))
@@ -144,6 +688,69 @@ class Processor:
         Example:
             >>> exp_corregidos, feedback = processor.exp_corregidos(hu, cps, exp)
         """
+        with self.profiler.etapa("preproceso"):
+            clean_pairs = self._preparar_pares(hu, cps, exp)
+            if not clean_pairs:
+                return "",""
+
+            unicos, posiciones = self._deduplicar_items(clean_pairs, self._clave_par, "pares CPS/EXP")
+            batches = self._dividir_en_batches(unicos, "expect_result")
+
+        results = []
+        resumenes = []
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="exp", items=len(clean_pairs)), \
+                ThreadPoolExecutor(max_workers=self.workers) as executor, ThreadPoolExecutor(max_workers=2) as fb_executor:
+            for batch_out in self._mapear_lotes(self._corregir_lote_exp, batches, executor):
+                lineas = batch_out.splitlines()
+                results.extend(lineas)
+                resumenes.append(fb_executor.submit(en_contexto(self._feedback_lote), _obs_exp(lineas)))
+            feedbacks = [futuro.result() for futuro in resumenes]
+
+        with self.profiler.etapa("parseo"):
+            _, exp_str = self._extraer_exp(results)
+            exp_str = self._expandir_exp(exp_str, unicos, posiciones)
+        with self.profiler.etapa("feedback"):
+            feedback = self._reducir_feedback(feedbacks)
+        return exp_str, feedback
+
+    async def aexp_corregidos(self, hu: str, cps: str, exp: str) -> tuple[str, str]:
+        """
+        Variante asíncrona de exp_corregidos basada en AsyncOpenAI.
+
+        Example:
+            >>> exp_corregidos, feedback = asyncio.run(processor.aexp_corregidos(hu, cps, exp))
+        """
+        with self.profiler.etapa("preproceso"):
+            clean_pairs = self._preparar_pares(hu, cps, exp)
+            if not clean_pairs:
+                return "",""
+
+            builder = self._obtener_async_builder()
+            unicos, posiciones = self._deduplicar_items(clean_pairs, self._clave_par, "pares CPS/EXP")
+            batches = self._dividir_en_batches(unicos, "expect_result")
+
+        async def corregir_lote(batch):
+            with self.tracer.span("lote", etapa="exp", lote=self._id_lote(batch), items=len(batch)):
+                return (await builder.corregir_expect_result("\n".join(batch))).splitlines()
+
+        corregir_lote = self._areintentando(corregir_lote)
+
+        async def corregir(batch):
+            lineas = await corregir_lote(batch)
+            return lineas, await self._afeedback_lote(_obs_exp(lineas))
+
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="exp", items=len(clean_pairs)):
+            outs = await self._gather_limitado(corregir(batch) for batch in batches)
+
+        with self.profiler.etapa("parseo"):
+            _, exp_str = self._extraer_exp([line for lineas, _ in outs for line in lineas])
+            exp_str = self._expandir_exp(exp_str, unicos, posiciones)
+        with self.profiler.etapa("feedback"):
+            feedback = await self._areducir_feedback([resumen for _, resumen in outs])
+        return exp_str, feedback
+
+    def _preparar_pares(self, hu: str, cps: str, exp: str) -> list[str]:
+        """Valida las entradas de exp_corregidos y devuelve los pares 'caso | resultado'."""
         cod_hu = self.cfg.code_hu
         self.logger.info("Corrigiendo resultados esperados para la HU: %s", cod_hu)
         
@@ -162,46 +769,481 @@ class Processor:
             safe_quit = True
 
         if safe_quit:
-            return "", ""
+            return []
 
         cps_list = preprocess_exp_or_cps(cps)
         exp_list = preprocess_exp_or_cps(exp)
 
-        # Procesar en batches
         if len(cps_list) != len(exp_list):
             self.logger.warning("Los casos de prueba y resultados esperados no tienen la misma longitud.")
             self.logger.warning("número de casos de prueba: %d", len(cps_list))
             self.logger.warning("número de resultados esperados: %d", len(exp_list))
             self.logger.warning("CPS: %s", cps)
             self.logger.warning("EXP: %s", exp)
-            return "",""
-
-        if not cps_list:
-            return "",""
+            return []
 
-        clean_pairs = [f"{cp} | {ex}" for cp, ex in zip(cps_list, exp_list)]
+        return [f"{cp} | {ex}" for cp, ex in zip(cps_list, exp_list)]
 
-        batches = [clean_pairs[i : i + self.batch_size] for i in range(0, len(clean_pairs), self.batch_size)]
-
-        results = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            for batch_out in executor.map(lambda batch: self.builder.corregir_expect_result("\n".join(batch)), batches):
-                results.extend(batch_out.splitlines())
-
-        sep_obs = "OBS"
+    def _extraer_exp(self, results: list[str]) -> tuple[str, str]:
+        """Separa observaciones y Expected Results corregidos de las líneas del modelo."""
         sep_exp = "ExpRes"
         
-        obs_str   = "\n".join([l.split(":",1)[-1].strip() for l in results if l.startswith(sep_obs)])
+        obs_str   = _obs_exp(results)
         exp_str   = "\n".join([l.split(":",1)[-1].strip() for l in results if l.startswith(sep_exp)])
 
         # Filtrar resultados esperados corregidos
         self.logger.info("Filtrando resultados esperados corregidos...")
-        # regex extraer desde sep_exp hasta el final de la línea o hasta sep_obs
-        #regex_exp = f"{sep_exp}.*?(?={sep_obs}|$)"
-        #exp_r = [re.search(regex_exp, l).group(0) for l in results if re.search(regex_exp, l)]
+        return obs_str, exp_str
 
-        feedback = self.builder.obtener_feedback(obs_str)
-        return exp_str, feedback
+    def procesar_pipeline(self, hu: str, cps: str, exp: str) -> tuple[str, str, str, str]:
+        """
+        Corrige CPS y EXP solapando ambas etapas lote a lote.
+
+        En cuanto un lote de casos de prueba vuelve corregido y con la cantidad
+        esperada de casos, se envía el lote de pares CPS+EXP correspondiente sin
+        esperar al resto de la etapa CPS. Ambos tipos de lote comparten un único
+        pool de hilos, por lo que la concurrencia total sigue acotada; los lotes
+        EXP listos tienen prioridad sobre los CPS pendientes.
+
+        Si algún lote de CPS no valida, el resultado es el mismo que el del flujo
+        por etapas: casos y resultados esperados vacíos.
+
+        Returns:
+            tuple[str, str, str, str]: (casos_corregidos, feedback_cps,
+                resultados_corregidos, feedback_exp)
+
+        Example:
+            >>> new_cps, cps_fb, new_exp, exp_fb = processor.procesar_pipeline(hu, cps, exp)
+        """
+        with self.profiler.etapa("preproceso"):
+            cps_list = self._preparar_cps(hu, cps)
+            if not cps_list:
+                return "", "", "", ""
+
+            exp_list = preprocess_exp_or_cps(exp)
+            if len(exp_list) != len(cps_list):
+                self.logger.warning("Los casos de prueba y resultados esperados no tienen la misma longitud.")
+                self.logger.warning("número de casos de prueba: %d", len(cps_list))
+                self.logger.warning("número de resultados esperados: %d", len(exp_list))
+                new_cps, cps_feedback = self.cps_corregidas(hu, cps)
+                return new_cps, cps_feedback, "", ""
+
+            batches = self._dividir_en_batches(cps_list, "ortografia", base=hu)
+            inicios = [0]
+            for batch in batches:
+                inicios.append(inicios[-1] + len(batch))
+
+        cps_out: list[list[str]] = [[] for _ in batches]
+        exp_out: list[list[str]] = [[] for _ in batches]
+        pendientes_cps = list(range(len(batches)))
+        listos_exp: list[int] = []
+        resumenes_cps, resumenes_exp = [], []
+        fallo = False
+
+        # La reducción del feedback corre en el pool y cuenta como parte del envío
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="pipeline", items=len(cps_list)), \
+                ThreadPoolExecutor(max_workers=self.workers) as executor, ThreadPoolExecutor(max_workers=2) as fb_executor:
+            en_vuelo = {}
+            corregir_exp = self._reintentando(self._corregir_lote_exp)
+            corregir_cps = self._reintentando(self._corregir_lote_cps_reparando)
+
+            def rellenar():
+                while not fallo and len(en_vuelo) < self.workers and (listos_exp or pendientes_cps):
+                    if listos_exp:
+                        k = listos_exp.pop(0)
+                        exp_batch = exp_list[inicios[k]:inicios[k + 1]]
+                        pares = [f"{cp} | {ex}" for cp, ex in zip(cps_out[k], exp_batch)]
+                        en_vuelo[executor.submit(en_contexto(corregir_exp), pares)] = ("exp", k)
+                    else:
+                        k = pendientes_cps.pop(0)
+                        en_vuelo[executor.submit(en_contexto(corregir_cps), hu, batches[k])] = ("cps", k)
+
+            rellenar()
+            while en_vuelo:
+                hechos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    etapa, k = en_vuelo.pop(futuro)
+                    if fallo:
+                        # El resultado se descarta: no se piden su EXP ni su feedback
+                        continue
+                    lineas = futuro.result()
+                    if etapa == "exp":
+                        lineas = lineas.splitlines()
+                        exp_out[k] = lineas
+                        resumenes_exp.append(fb_executor.submit(en_contexto(self._feedback_lote), _obs_exp(lineas)))
+                        continue
+
+                    obs, cps_r = self._extraer_cps(lineas)
+                    cps_out[k] = self._fusionar_por_id(batches[k], cps_r)
+                    if len(cps_out[k]) == len(batches[k]):
+                        listos_exp.append(k)
+                        resumenes_cps.append(fb_executor.submit(en_contexto(self._feedback_lote), obs))
+                    else:
+                        self.logger.warning(
+                            "Lote %d de CPS no válido (%d de %d casos); se cancela el pipeline",
+                            k, len(cps_out[k]), len(batches[k]),
+                        )
+                        fallo = True
+                        listos_exp.clear()
+                        for pendiente in [f for f in en_vuelo if f.cancel()]:
+                            del en_vuelo[pendiente]
+                rellenar()
+
+            if fallo:
+                return "", "", "", ""
+
+            # Reducción de ambos feedback en paralelo
+            futuro_cps = fb_executor.submit(en_contexto(self._reducir_feedback), [f.result() for f in resumenes_cps])
+            futuro_exp = fb_executor.submit(en_contexto(self._reducir_feedback), [f.result() for f in resumenes_exp])
+            cps_feedback, exp_feedback = futuro_cps.result(), futuro_exp.result()
+
+        with self.profiler.etapa("parseo"):
+            _, exp_str = self._extraer_exp([line for lineas in exp_out for line in lineas])
+
+            cps_results = [line for lineas in cps_out for line in lineas]
+            new_cps, cps_feedback = self._resultado_cps(cps, cps_list, cps_results, cps_feedback)
+        return new_cps, cps_feedback, exp_str, exp_feedback
+
+    def procesar_streaming(
+        self, hu: str, cps_lineas: Iterable[str], exp_lineas: Iterable[str],
+        escribir: Callable[[list[str], list[str]], None],
+    ) -> tuple[str, str]:
+        """
+        Corrige CPS y EXP leyendo y escribiendo línea a línea, con memoria acotada.
+
+        Los casos y resultados esperados se emparejan según se leen, se agrupan
+        en lotes con el planificador y cada lote se corrige como en el pipeline
+        (CPS y, a continuación, su EXP). ``escribir(cps, exp)`` recibe las líneas
+        corregidas de cada lote en el orden de la entrada en cuanto ese lote y
+        los anteriores han terminado. Como mucho hay ``2 * workers`` lotes en
+        vuelo y el feedback se reduce a medida que crece, así que la memoria no
+        depende del tamaño de los archivos.
+
+        A diferencia de los flujos en memoria, un lote cuya respuesta no valida
+        no anula toda la salida: se escriben sus líneas originales y se avisa.
+        No se deduplica ni se usa el journal (ambos necesitan la entrada completa).
+
+        Args:
+            hu: Historia de usuario (contexto de todos los lotes)
+            cps_lineas: Casos de prueba ya limpios, uno por elemento
+            exp_lineas: Resultados esperados ya limpios, en el mismo orden
+            escribir: Recibe (casos corregidos, resultados corregidos) de cada lote
+
+        Returns:
+            tuple[str, str]: (feedback_cps, feedback_exp)
+
+        Raises:
+            ValueError: Si CPS y EXP no tienen la misma cantidad de líneas
+
+        Example:
+            >>> with open("cps.txt") as cps, open("exp.txt") as exp:
+            ...     processor.procesar_streaming(hu, map(str.strip, cps), map(str.strip, exp), escribir)
+        """
+        self.logger.info("Corrigiendo en streaming CPS y EXP para la HU: %s", self.cfg.code_hu)
+        if not hu:
+            self.logger.warning("Historia de usuario vacía.")
+            return "", ""
+
+        exp_pendientes: deque[str] = deque()
+
+        def casos():
+            for numero, (cp, ex) in enumerate(zip_longest(cps_lineas, exp_lineas), start=1):
+                if cp is None or ex is None:
+                    raise ValueError(
+                        f"Los casos de prueba y resultados esperados no tienen la misma longitud (línea {numero})"
+                    )
+                exp_pendientes.append(ex)
+                yield cp
+
+        resumenes = {"cps": [], "exp": []}
+        feedback = {"cps": [], "exp": []}
+        lineas = lotes = 0
+
+        def pares():
+            nonlocal lotes
+            for batch in self.planners["ortografia"].iterar(casos(), base=hu, max_items=self.batch_size):
+                lotes += 1
+                yield batch, [exp_pendientes.popleft() for _ in batch]
+
+        with self.profiler.etapa("envio_lotes"), self.tracer.span("etapa", etapa="streaming") as span_etapa, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor, ThreadPoolExecutor(max_workers=2) as fb_executor:
+            corregidos = self._mapear_lotes(
+                lambda par: self._corregir_lote_streaming(hu, *par), pares(), executor,
+                originales=lambda par: (list(par[0]), list(par[1]), "", []),
+            )
+            for cps_r, exp_r, obs_cps, obs_exp in corregidos:
+                escribir(cps_r, exp_r)
+                lineas += len(cps_r)
+                resumenes["cps"].append(fb_executor.submit(en_contexto(self._feedback_lote), obs_cps))
+                resumenes["exp"].append(fb_executor.submit(en_contexto(self._feedback_lote), _obs_exp(obs_exp)))
+                if len(resumenes["cps"]) >= 2 * self.workers:
+                    for etapa in resumenes:
+                        feedback[etapa] = self._compactar_feedback(feedback[etapa], resumenes[etapa])
+
+            with self.profiler.etapa("feedback"):
+                for etapa in resumenes:
+                    feedback[etapa] = self._compactar_feedback(feedback[etapa], resumenes[etapa])
+                cps_feedback = self._reducir_feedback(feedback["cps"])
+                exp_feedback = self._reducir_feedback(feedback["exp"])
+            span_etapa["items"] = lineas
+
+        self.logger.info("Streaming completado: %d líneas corregidas en %d lotes", lineas, lotes)
+        return cps_feedback, exp_feedback
+
+    def _corregir_lote_streaming(self, hu: str, batch: list[str], exp_batch: list[str]) -> tuple[list[str], list[str], str, list[str]]:
+        """
+        Corrige un lote de CPS y después sus EXP para ``procesar_streaming``.
+
+        Returns:
+            tuple: (casos, resultados, observaciones CPS, líneas OBS de EXP); si
+                una etapa no devuelve todas las líneas se usan las originales
+        """
+        obs_cps, cps_r = self._extraer_cps(self._corregir_lote_cps_reparando(hu, batch))
+        cps_r = self._fusionar_por_id(batch, cps_r)
+        if len(cps_r) != len(batch):
+            self.logger.warning(
+                "Lote %s de CPS no válido (%d de %d casos); se conservan las líneas originales",
+                self._id_lote(batch), len(cps_r), len(batch),
+            )
+            cps_r, obs_cps = list(batch), ""
+
+        salida = self._corregir_lote_exp([f"{cp} | {ex}" for cp, ex in zip(cps_r, exp_batch)]).splitlines()
+        exp_r = [l.split(":", 1)[-1].strip() for l in salida if l.startswith("ExpRes")]
+        obs_exp = [l for l in salida if l.startswith("OBS")]
+        if len(exp_r) != len(batch):
+            self.logger.warning(
+                "Lote %s de EXP no válido (%d de %d resultados); se conservan las líneas originales",
+                self._id_lote(batch), len(exp_r), len(batch),
+            )
+            exp_r, obs_exp = list(exp_batch), []
+        return cps_r, exp_r, obs_cps, obs_exp
+
+    def _compactar_feedback(self, acumulado: list[str], pendientes: list) -> list[str]:
+        """Añade los resúmenes por lote terminados y los reduce a uno si superan ``feedback_max_chars``."""
+        # Los fallidos (None) se conservan para que _reducir_feedback los cuente
+        acumulado = acumulado + [f for f in (futuro.result() for futuro in pendientes) if f != ""]
+        pendientes.clear()
+        if sum(len(f or "") for f in acumulado) > self.feedback_max_chars:
+            acumulado = [self._reducir_feedback(acumulado)]
+        return acumulado
+
+    def procesar_incremental(
+        self, hu: str, cps: str, exp: str, manifest: Manifest,
+        forzar: bool = False, pipeline: bool = False,
+    ) -> tuple[str, str, str, str]:
+        """
+        Corrige solo las líneas nuevas o modificadas desde la última ejecución.
+
+        Cada línea se identifica por el hash de (HU + CP + EXP). Las que ya están
+        en el manifiesto se toman de él sin llamar al LLM; el resto se corrige con
+        el flujo por etapas (o el pipeline) y se intercala en su posición
+        original. El feedback solo cubre las líneas corregidas en esta ejecución.
+
+        Args:
+            manifest: Manifiesto con las salidas de ejecuciones anteriores
+            forzar: Si es True se ignora el manifiesto y se corrige todo (reconstrucción completa)
+            pipeline: Usa procesar_pipeline para las líneas pendientes
+
+        Returns:
+            tuple[str, str, str, str]: (casos_corregidos, feedback_cps,
+                resultados_corregidos, feedback_exp)
+
+        Example:
+            >>> manifest = Manifest(cfg.manifest_path)
+            >>> new_cps, cps_fb, new_exp, exp_fb = processor.procesar_incremental(hu, cps, exp, manifest)
+        """
+        cps_list = self._preparar_cps(hu, cps)
+        exp_list = preprocess_exp_or_cps(exp)
+        if not cps_list or len(cps_list) != len(exp_list):
+            # Sin correspondencia 1:1 no hay líneas que identificar: flujo completo
+            self.logger.warning("Entradas sin correspondencia CPS/EXP; se omite el manifiesto.")
+            if pipeline:
+                return self.procesar_pipeline(hu, cps, exp)
+            new_cps, cps_feedback = self.cps_corregidas(hu, cps)
+            new_exp, exp_feedback = self.exp_corregidos(hu, new_cps, exp)
+            return new_cps, cps_feedback, new_exp, exp_feedback
+
+        claves = [Manifest.clave(hu, cp, ex) for cp, ex in zip(cps_list, exp_list)]
+        pendientes = [i for i, clave in enumerate(claves) if forzar or manifest.obtener(clave) is None]
+        self.logger.info(
+            "Reprocesado incremental: %d de %d líneas pendientes (%d reutilizadas)",
+            len(pendientes), len(claves), len(claves) - len(pendientes),
+        )
+
+        cps_feedback = exp_feedback = ""
+        if pendientes:
+            sub_cps = "\n".join(cps_list[i] for i in pendientes)
+            sub_exp = "\n".join(exp_list[i] for i in pendientes)
+            if pipeline:
+                new_cps, cps_feedback, new_exp, exp_feedback = self.procesar_pipeline(hu, sub_cps, sub_exp)
+            else:
+                new_cps, cps_feedback = self.cps_corregidas(hu, sub_cps)
+                new_exp, exp_feedback = self.exp_corregidos(hu, new_cps, sub_exp)
+
+            new_cps_list = new_cps.splitlines() if new_cps else []
+            new_exp_list = new_exp.splitlines() if new_exp else []
+            if len(new_cps_list) != len(pendientes):
+                # Mismo resultado que el flujo completo ante un fallo de CPS
+                return "", "", "", ""
+            if len(new_exp_list) != len(pendientes):
+                self.logger.warning(
+                    "Expected Results corregidos incompletos (%d de %d); no se actualiza el manifiesto.",
+                    len(new_exp_list), len(pendientes),
+                )
+                cps_completos = self._intercalar(claves, manifest, pendientes, new_cps_list, "cp")
+                return cps_completos, cps_feedback, "", exp_feedback
+
+            for i, cp, ex in zip(pendientes, new_cps_list, new_exp_list):
+                manifest.registrar(claves[i], cp, ex)
+
+        # Todas las líneas están ya en el manifiesto: se recomponen en el orden original
+        salidas = [manifest.obtener(clave) for clave in claves]
+        manifest.guardar(claves)
+        return (
+            "\n".join(s["cp"] for s in salidas), cps_feedback,
+            "\n".join(s["exp"] for s in salidas), exp_feedback,
+        )
+
+    def _intercalar(self, claves: list[str], manifest: Manifest, pendientes: list[int], nuevos: list[str], campo: str) -> str:
+        """Intercala las salidas nuevas con las almacenadas en el manifiesto respetando el orden original."""
+        nuevos_por_indice = dict(zip(pendientes, nuevos))
+        return "\n".join(
+            nuevos_por_indice[i] if i in nuevos_por_indice else manifest.obtener(clave)[campo]
+            for i, clave in enumerate(claves)
+        )
+
+    def _feedback_lote(self, obs: str) -> str | None:
+        """
+        Paso map: resume las observaciones de un único lote (sin llamada si no hay).
+
+        Devuelve None si la llamada falla: el feedback es informativo, así que un
+        resumen fallido no invalida las correcciones ni se mezcla con el resto.
+        """
+        if not obs:
+            return ""
+        with self.tracer.span("lote", etapa="feedback", items=len(obs.splitlines())):
+            try:
+                return self.builder.obtener_feedback(obs)
+            except b.LLMRequestError as e:
+                self.logger.warning("Resumen de feedback del lote descartado: %s", e)
+                return None
+
+    async def _afeedback_lote(self, obs: str) -> str | None:
+        if not obs:
+            return ""
+        try:
+            return await self._obtener_async_builder().obtener_feedback(obs)
+        except b.LLMRequestError as e:
+            self.logger.warning("Resumen de feedback del lote descartado: %s", e)
+            return None
+
+    def _combinar_feedback(self, grupo: list[str]) -> str:
+        """Combina un grupo de resúmenes; si la llamada falla se conservan concatenados."""
+        if len(grupo) == 1:
+            return grupo[0]
+        try:
+            return self.builder.combinar_feedback(grupo)
+        except b.LLMRequestError as e:
+            self.logger.warning("%s; se conservan %d resúmenes sin combinar", e, len(grupo))
+            return "\n\n".join(grupo)
+
+    async def _acombinar_feedback(self, grupo: list[str]) -> str:
+        if len(grupo) == 1:
+            return grupo[0]
+        try:
+            return await self._obtener_async_builder().combinar_feedback(grupo)
+        except b.LLMRequestError as e:
+            self.logger.warning("%s; se conservan %d resúmenes sin combinar", e, len(grupo))
+            return "\n\n".join(grupo)
+
+    def _reducir_feedback(self, feedbacks: list[str]) -> str:
+        """
+        Paso reduce: fusiona los feedback por lote en uno solo.
+
+        Cada llamada de reducción recibe como máximo ``feedback_max_chars``
+        caracteres; si los resúmenes no caben, se reducen por grupos en paralelo
+        y se repite sobre los resultados, de modo que el prompt nunca crece sin
+        límite. Con un único resumen no se hace ninguna llamada.
+        """
+        resumenes = self._resumenes_validos(feedbacks)
+        with self.tracer.span("etapa", etapa="feedback", items=len(resumenes)), ThreadPoolExecutor(max_workers=4) as executor:
+            while len(resumenes) > 1:
+                grupos = _agrupar_resumenes(resumenes, self.feedback_max_chars)
+                resumenes = list(executor.map(en_contexto(self._combinar_feedback), grupos))
+        return resumenes[0] if resumenes else ""
+
+    async def _areducir_feedback(self, feedbacks: list[str]) -> str:
+        resumenes = self._resumenes_validos(feedbacks)
+
+        with self.tracer.span("etapa", etapa="feedback", items=len(resumenes)):
+            while len(resumenes) > 1:
+                grupos = _agrupar_resumenes(resumenes, self.feedback_max_chars)
+                resumenes = list(await self._gather_limitado(self._acombinar_feedback(grupo) for grupo in grupos))
+        return resumenes[0] if resumenes else ""
+
+    def _resumenes_validos(self, feedbacks: list[str | None]) -> list[str]:
+        """Descarta resúmenes vacíos y los fallidos (None); el texto de un error nunca llega al feedback."""
+        validos = [f for f in feedbacks if f]
+        fallidos = sum(1 for f in feedbacks if f is None)
+        if fallidos:
+            self.logger.warning("%d resúmenes de feedback por lote fallaron", fallidos)
+        return validos
+
+    def _obtener_async_builder(self) -> b.AsyncBuilder:
+        """Crea bajo demanda el AsyncBuilder (y su cliente AsyncOpenAI) compartiendo la caché."""
+        if self.async_builder is None:
+            self._medir_conexiones()
+            async_client = _sdk("AsyncOpenAI")(
+                api_key=self._api_key, base_url=self.base_url, max_retries=0,
+                http_client=http_pool.cliente_http_async(**self.opciones_http),
+            )
+            self.async_builder = b.AsyncBuilder(
+                async_client, cache=self.cache, on_usage=self._registrar_uso, scheduler=self.scheduler,
+                tracer=self.tracer,
+            )
+        return self.async_builder
+
+    async def _gather_limitado(self, coros):
+        """Ejecuta las corrutinas con como máximo max_concurrency en vuelo, preservando el orden."""
+        semaforo = asyncio.Semaphore(self.max_concurrency)
+
+        async def limitado(coro):
+            async with semaforo:
+                return await coro
+
+        return await asyncio.gather(*(limitado(coro) for coro in coros))
+
+    def exportar_metricas(self) -> dict:
+        """Registra el resumen de la ejecución y exporta las métricas en formato Prometheus si hay ruta."""
+        if self._conexiones_base is not None:
+            actual = http_pool.ESTADISTICAS.instantanea()
+            self.tracer.registrar_conexiones(
+                actual["peticiones"] - self._conexiones_base["peticiones"],
+                actual["conexiones_nuevas"] - self._conexiones_base["conexiones_nuevas"],
+            )
+        resumen = self.tracer.resumen()
+        self.logger.info(
+            "Peticiones: %d (caché: %d, errores: %d, reintentos: %d); tokens prompt/respuesta/caché: %d/%d/%d; coste estimado: %.4f USD",
+            resumen["peticiones"], resumen["cache_hits"], resumen["errores"], resumen["reintentos"],
+            resumen["tokens"]["prompt"], resumen["tokens"]["completion"], resumen["tokens"]["cached"],
+            resumen["coste_usd"],
+        )
+        if resumen["conexiones"]["peticiones"]:
+            self.logger.info(
+                "Conexiones HTTP: %d peticiones, %d conexiones nuevas (reutilización: %.0f%%)",
+                resumen["conexiones"]["peticiones"], resumen["conexiones"]["nuevas"],
+                resumen["conexiones"]["reutilizacion"] * 100,
+            )
+        metrics_path = getattr(self.cfg, "metrics_path", None)
+        if metrics_path is not None:
+            self.tracer.exportar_prometheus(metrics_path)
+        return resumen
+
+    async def aclose(self) -> None:
+        """Cierra el cliente asíncrono si llegó a crearse."""
+        if self.async_builder is not None:
+            await self.async_builder.client.close()
+            self.async_builder = None
 
 
 def cps_with_exp(cps: str, exp: str) -> list[str]:
@@ -236,6 +1278,38 @@ def cps_with_exp(cps: str, exp: str) -> list[str]:
     return [f"{cp} | {ex}" for cp, ex in zip(cps_lines, exp_lines)]
 
 
+def _obs_cps(lineas: list[str]) -> str:
+    """Observaciones de una respuesta de corregir_ortografia (líneas OBS completas)."""
+    return "\n".join([l for l in lineas if l.startswith("OBS")])
+
+
+def _obs_exp(lineas: list[str]) -> str:
+    """Observaciones de una respuesta de corregir_expect_result (texto tras 'OBS:')."""
+    return "\n".join([l.split(":",1)[-1].strip() for l in lineas if l.startswith("OBS")])
+
+
+def _agrupar_resumenes(resumenes: list[str], max_chars: int) -> list[list[str]]:
+    """
+    Agrupa resúmenes para la reducción sin superar max_chars por grupo.
+
+    Cada resumen se recorta a la mitad del límite, así que siempre caben al menos
+    dos por grupo. Un grupo no se cierra con un solo resumen aunque max_chars sea
+    menor que 2, de modo que cada ronda de reducción reduce el número de resúmenes
+    y el bucle de reducción siempre termina.
+    """
+    limite = max(1, max_chars // 2)
+    grupos: list[list[str]] = [[]]
+    tamano = 0
+    for resumen in resumenes:
+        resumen = resumen[:limite]
+        if len(grupos[-1]) > 1 and tamano + len(resumen) > max_chars:
+            grupos.append([])
+            tamano = 0
+        grupos[-1].append(resumen)
+        tamano += len(resumen)
+    return grupos
+
+
 def preprocess_exp_or_cps(cps: str) -> list[str]:
     """
     Preprocesa casos de prueba o resultados esperados para corrección por IA.
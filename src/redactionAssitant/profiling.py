@@ -0,0 +1,125 @@
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class StageProfiler:
+    """
+    Perfilado por etapas de los puntos de entrada (``--profile``).
+
+    Cada etapa (carga, preproceso, envío de lotes, parseo, feedback, guardado)
+    se mide con su propio ``cProfile`` y con dos relojes: tiempo de pared y
+    tiempo de CPU del proceso (todos los hilos). La diferencia entre ambos es
+    espera, casi siempre de la API, así que la tabla separa el coste local
+    (regex, XML, pandas, hilos) del tiempo esperando al LLM.
+
+    Las etapas anidadas pausan a la etapa exterior, de modo que los tiempos son
+    exclusivos y la tabla suma el total. Solo se perfila el hilo que creó el
+    perfilador: las etapas abiertas desde otros hilos no se miden.
+
+    Example:
+        >>> profiler = StageProfiler()
+        >>> with profiler.etapa("carga"):
+        ...     hus, cps, exp = get_data(cfg)
+        >>> profiler.guardar("data/processed/profile")
+    """
+
+    def __init__(self, activo: bool = True):
+        self.activo = activo
+        self._hilo = threading.get_ident()
+        self._perfiles: Dict[str, cProfile.Profile] = {}
+        self._tiempos: Dict[str, Dict[str, float]] = {}
+        self._pila: List[str] = []
+        self._inicio = (0.0, 0.0)
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[None]:
+        """Mide el bloque como parte de la etapa ``nombre`` (acumulando si se repite)."""
+        if not self.activo or threading.get_ident() != self._hilo:
+            yield
+            return
+
+        self._pausar()
+        self._pila.append(nombre)
+        self._tiempos.setdefault(nombre, {"llamadas": 0, "pared": 0.0, "cpu": 0.0})["llamadas"] += 1
+        self._reanudar()
+        try:
+            yield
+        finally:
+            self._pausar()
+            self._pila.pop()
+            if self._pila:
+                self._reanudar()
+
+    def _reanudar(self) -> None:
+        perfil = self._perfiles.setdefault(self._pila[-1], cProfile.Profile())
+        try:
+            perfil.enable()
+        except ValueError as e:
+            # Otro perfilador activo (p. ej. un depurador): se mide solo el tiempo
+            logger.debug("No se pudo activar cProfile para %s: %s", self._pila[-1], e)
+        self._inicio = (time.perf_counter(), time.process_time())
+
+    def _pausar(self) -> None:
+        if not self._pila:
+            return
+        nombre = self._pila[-1]
+        pared, cpu = time.perf_counter() - self._inicio[0], time.process_time() - self._inicio[1]
+        self._perfiles[nombre].disable()
+        self._tiempos[nombre]["pared"] += pared
+        self._tiempos[nombre]["cpu"] += cpu
+
+    def tabla(self) -> str:
+        """Desglose de tiempo de pared, CPU y espera por etapa."""
+        total = sum(t["pared"] for t in self._tiempos.values()) or 1.0
+        columnas = ["etapa", "llamadas", "pared_s", "cpu_s", "espera_s", "%pared"]
+        filas = [
+            [nombre, str(t["llamadas"]), f"{t['pared']:.3f}", f"{t['cpu']:.3f}",
+             f"{max(0.0, t['pared'] - t['cpu']):.3f}", f"{100 * t['pared'] / total:.1f}"]
+            for nombre, t in self._tiempos.items()
+        ]
+        pared = sum(t["pared"] for t in self._tiempos.values())
+        cpu = sum(t["cpu"] for t in self._tiempos.values())
+        filas.append(["total", "", f"{pared:.3f}", f"{cpu:.3f}", f"{max(0.0, pared - cpu):.3f}", "100.0" if pared else "0.0"])
+
+        anchos = [max(len(c), *(len(f[i]) for f in filas)) for i, c in enumerate(columnas)]
+        lineas = ["  ".join(c.ljust(a) if i == 0 else c.rjust(a) for i, (c, a) in enumerate(zip(columnas, anchos)))]
+        lineas += [
+            "  ".join(v.ljust(a) if i == 0 else v.rjust(a) for i, (v, a) in enumerate(zip(fila, anchos)))
+            for fila in filas
+        ]
+        return "\n".join(lineas)
+
+    def guardar(self, directorio: Union[str, Path], top: int = 25) -> Optional[Path]:
+        """
+        Escribe un ``<etapa>.prof`` por etapa (legible con pstats o snakeviz) y
+        ``resumen.txt`` con la tabla y las funciones más costosas de cada etapa.
+        """
+        if not self.activo:
+            return None
+
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        partes = [self.tabla()]
+        for nombre, perfil in self._perfiles.items():
+            perfil.dump_stats(str(directorio / f"{nombre}.prof"))
+            buffer = io.StringIO()
+            try:
+                pstats.Stats(perfil, stream=buffer).sort_stats("cumulative").print_stats(top)
+            except TypeError:
+                # Etapa sin datos de cProfile (no se pudo activar el perfilador)
+                continue
+            partes.append(f"=== {nombre} ===\n{buffer.getvalue().strip()}")
+
+        resumen = directorio / "resumen.txt"
+        resumen.write_text("\n\n".join(partes) + "\n", encoding="utf-8")
+        logger.info("Perfil por etapas (detalle en %s):\n%s", directorio, self.tabla())
+        return resumen
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Códigos HTTP que merecen reintento además de cualquier 5xx
+_ESTADOS_REINTENTABLES = {408, 409, 429}
+
+
+class DeadlineExceeded(TimeoutError):
+    """La petición no pudo completarse antes de su plazo máximo."""
+
+
+class TokenBucket:
+    """
+    Cubo de tokens con reserva anticipada.
+
+    ``reservar`` nunca bloquea: descuenta la cantidad pedida (aunque el saldo
+    quede negativo) y devuelve cuántos segundos debe esperar el llamador antes
+    de usarla. Así las ráfagas se reparten en el tiempo en orden de llegada,
+    tanto desde hilos como desde corrutinas.
+    """
+
+    def __init__(self, capacidad_por_minuto: float, reloj: Callable[[], float] = time.monotonic):
+        if capacidad_por_minuto <= 0:
+            raise ValueError("La capacidad por minuto debe ser mayor que 0")
+        self.capacidad = float(capacidad_por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self._saldo = self.capacidad
+        self._reloj = reloj
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+    def reservar(self, cantidad: float = 1) -> float:
+        """Reserva ``cantidad`` tokens y devuelve los segundos de espera necesarios."""
+        cantidad = min(float(cantidad), self.capacidad)
+        with self._lock:
+            ahora = self._reloj()
+            self._saldo = min(self.capacidad, self._saldo + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._saldo -= cantidad
+            if self._saldo >= 0:
+                return 0.0
+            return -self._saldo / self.tasa
+
+
+class RequestScheduler:
+    """
+    Planificador central de peticiones al LLM.
+
+    Todas las llamadas de Builder pasan por aquí: se limitan con un cubo de
+    peticiones/minuto y otro de tokens/minuto, y ante errores transitorios
+    (429, 408, 409, 5xx, errores de conexión o timeouts) se reintentan con
+    backoff exponencial con jitter, respetando ``Retry-After`` cuando el
+    servidor lo envía. Cada petición tiene un plazo máximo (``deadline``) que
+    incluye esperas y reintentos.
+
+    Attributes:
+        rpm: Cubo de peticiones por minuto
+        tpm: Cubo de tokens por minuto
+        max_reintentos: Reintentos permitidos por petición
+        deadline: Segundos máximos por petición, reintentos incluidos
+        reintentos: Total de reintentos realizados (para métricas)
+
+    Example:
+        >>> scheduler = RequestScheduler(rpm=60, tpm=100_000)
+        >>> response = scheduler.ejecutar(lambda: client.chat.completions.create(...), tokens=1200)
+    """
+
+    def __init__(
+        self,
+        rpm: float = 300,
+        tpm: float = 1_000_000,
+        max_reintentos: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        deadline: float = 120.0,
+        reloj: Callable[[], float] = time.monotonic,
+        dormir: Callable[[float], None] = time.sleep,
+    ):
+        self.rpm = TokenBucket(rpm, reloj)
+        self.tpm = TokenBucket(tpm, reloj)
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.reintentos = 0
+        self._reloj = reloj
+        self._dormir = dormir
+        self._lock = threading.Lock()
+
+    def ejecutar(self, fn: Callable[[], T], tokens: int = 0, info: Optional[Dict[str, Any]] = None) -> T:
+        """
+        Ejecuta ``fn`` respetando los límites de ritmo y reintentando errores transitorios.
+
+        Args:
+            fn: Función sin argumentos que realiza la petición
+            tokens: Tokens estimados de la petición (para el límite por minuto)
+            info: Diccionario opcional donde se anota ``reintentos`` de esta llamada
+
+        Raises:
+            DeadlineExceeded: Si la petición no puede completarse dentro del plazo
+            Exception: El último error si no es reintentable o se agotan los reintentos
+        """
+        limite = self._reloj() + self.deadline
+        intento = 0
+        while True:
+            self._esperar(self._espera_ritmo(tokens), limite)
+            try:
+                return fn()
+            except Exception as e:
+                espera = self._espera_reintento(e, intento, limite)
+                intento += 1
+                self._anotar_reintento(info, intento)
+                self._dormir(espera)
+
+    async def aejecutar(self, fn: Callable[[], Awaitable[T]], tokens: int = 0, info: Optional[Dict[str, Any]] = None) -> T:
+        """Variante asíncrona de ejecutar para corrutinas (AsyncBuilder)."""
+        limite = self._reloj() + self.deadline
+        intento = 0
+        while True:
+            espera = self._espera_ritmo(tokens)
+            self._comprobar_plazo(espera, limite)
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                return await fn()
+            except Exception as e:
+                espera = self._espera_reintento(e, intento, limite)
+                intento += 1
+                self._anotar_reintento(info, intento)
+                await asyncio.sleep(espera)
+
+    def _espera_ritmo(self, tokens: int) -> float:
+        return max(self.rpm.reservar(1), self.tpm.reservar(tokens) if tokens else 0.0)
+
+    def _esperar(self, espera: float, limite: float) -> None:
+        self._comprobar_plazo(espera, limite)
+        if espera > 0:
+            logger.debug("Límite de ritmo alcanzado, esperando %.2fs", espera)
+            self._dormir(espera)
+
+    def _comprobar_plazo(self, espera: float, limite: float) -> None:
+        if self._reloj() + espera > limite:
+            raise DeadlineExceeded(f"Plazo de {self.deadline:.0f}s agotado para la petición")
+
+    def _espera_reintento(self, error: Exception, intento: int, limite: float) -> float:
+        """Decide si un error se reintenta y cuánto esperar; si no, lo relanza."""
+        if not es_reintentable(error) or intento >= self.max_reintentos:
+            raise error
+
+        espera = retry_after(error)
+        if espera is None:
+            espera = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+        if self._reloj() + espera > limite:
+            raise DeadlineExceeded(f"Plazo de {self.deadline:.0f}s agotado tras {intento + 1} intentos") from error
+
+        logger.warning("Error transitorio (%s); reintento %d en %.2fs", error, intento + 1, espera)
+        return espera
+
+    def _anotar_reintento(self, info: Optional[Dict[str, Any]], intento: int) -> None:
+        with self._lock:
+            self.reintentos += 1
+        if info is not None:
+            info["reintentos"] = intento
+
+
+def es_reintentable(error: Exception) -> bool:
+    """Indica si un error de la API es transitorio y merece reintento."""
+    # Si openai no se ha importado, el error no puede venir del SDK
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in _ESTADOS_REINTENTABLES or status >= 500
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Extrae la espera sugerida por las cabeceras Retry-After / retry-after-ms, si existen."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    valor_ms = headers.get("retry-after-ms")
+    if valor_ms:
+        try:
+            return max(0.0, float(valor_ms) / 1000)
+        except ValueError:
+            pass
+
+    valor = headers.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, fecha.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
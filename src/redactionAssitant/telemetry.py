@@ -0,0 +1,277 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Span activo en el hilo/tarea actual: sus atributos se heredan en los spans hijos
+_span_actual: ContextVar[Optional[Dict[str, Any]]] = ContextVar("span_actual", default=None)
+
+# Límites (en segundos) del histograma de latencia por petición
+BUCKETS_LATENCIA = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def en_contexto(fn: Callable) -> Callable:
+    """
+    Envuelve ``fn`` para que se ejecute con el contexto actual aunque corra en otro hilo.
+
+    Los pools de hilos no heredan las ContextVar, así que sin esto los spans de
+    los lotes perderían a su span padre (la etapa).
+    """
+    contexto = copy_context()
+
+    def ejecutar(*args, **kwargs):
+        # Una copia por llamada: un mismo contexto no puede entrarse en dos hilos a la vez
+        return contexto.copy().run(fn, *args, **kwargs)
+
+    return ejecutar
+
+
+class Tracer:
+    """
+    Registro de spans estructurados para Builder y Processor.
+
+    Cada span mide la duración de una operación (una etapa, un lote o una
+    llamada al LLM) y guarda sus atributos: código de HU, lote, tamaño, tokens
+    de prompt/respuesta/caché, reintentos y resultado. Los spans hijos heredan
+    los atributos de su padre, por lo que una llamada al LLM queda asociada al
+    lote que la originó aunque Builder no lo conozca.
+
+    Los spans se añaden como JSONL a medida que terminan (el archivo no se
+    vacía: varias ejecuciones o HU se distinguen por ``run``) y pueden resumirse
+    en formato de texto de Prometheus con ``exportar_prometheus``. Los totales
+    se agregan al registrar cada span y en memoria solo se conservan los
+    últimos ``MAX_SPANS`` spans, así que una ejecución larga no acumula memoria;
+    el JSONL es el registro completo.
+
+    Attributes:
+        path: Archivo JSONL de trazas (None para no escribirlas)
+        spans: Últimos spans registrados, del más antiguo al más reciente
+        atributos: Atributos comunes a todos los spans (p. ej. ``hu`` y ``run``)
+        precios: USD por millón de tokens ``prompt``, ``completion`` y ``cached``
+
+    Example:
+        >>> tracer = Tracer("data/processed/trace.jsonl", atributos={"hu": "USRNM"})
+        >>> with tracer.span("lote", etapa="cps", lote="USRNM001-USRNM020", items=20):
+        ...     with tracer.span("llm", operacion="ortografia") as span:
+        ...         span["prompt_tokens"] = 1200
+    """
+
+    MAX_SPANS = 10_000
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        atributos: Optional[Dict[str, Any]] = None,
+        precios: Optional[Dict[str, float]] = None,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.run_id = uuid.uuid4().hex[:12]
+        self.atributos = {"run": self.run_id, **(atributos or {})}
+        self.precios = precios or {}
+        self.spans: deque[Dict[str, Any]] = deque(maxlen=self.MAX_SPANS)
+        self._lock = threading.Lock()
+
+        # Agregados de las llamadas al LLM y de las etapas
+        self._peticiones: Dict[tuple, int] = defaultdict(int)
+        self._tokens: Dict[tuple, int] = defaultdict(int)
+        self._reintentos: Dict[str, int] = defaultdict(int)
+        self._latencias: Dict[str, Dict[str, Any]] = {}
+        self._etapas: Dict[str, Dict[str, float]] = {}
+        # Peticiones HTTP y conexiones abiertas para ellas (las informa Processor)
+        self._conexiones = {"peticiones": 0, "nuevas": 0}
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def span(self, nombre: str, **atributos) -> Iterator[Dict[str, Any]]:
+        """
+        Abre un span; el diccionario devuelto admite atributos adicionales.
+
+        El resultado es ``ok``, ``error`` (con el tipo de excepción) o
+        ``cancelado`` si el código se interrumpe (p. ej. un stream cerrado).
+        """
+        padre = _span_actual.get()
+        heredados = dict(padre["heredados"]) if padre else {}
+        datos: Dict[str, Any] = {**self.atributos, **heredados, **atributos}
+        span_id = uuid.uuid4().hex[:16]
+        token = _span_actual.set({"id": span_id, "heredados": {**heredados, **atributos}})
+
+        inicio = time.time()
+        t0 = time.perf_counter()
+        resultado = "ok"
+        try:
+            yield datos
+        except Exception as e:
+            resultado = "error"
+            datos["error"] = type(e).__name__
+            raise
+        except BaseException:
+            resultado = "cancelado"
+            raise
+        finally:
+            try:
+                _span_actual.reset(token)
+            except ValueError:
+                # El span se cerró desde otro contexto (p. ej. un generador cerrado en otro hilo)
+                pass
+            self._registrar({
+                "nombre": nombre,
+                "span_id": span_id,
+                "padre_id": padre["id"] if padre else None,
+                "inicio": inicio,
+                "duracion_s": time.perf_counter() - t0,
+                "resultado": datos.pop("resultado", resultado),
+                **datos,
+            })
+
+    def _registrar(self, span: Dict[str, Any]) -> None:
+        linea = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.spans.append(span)
+            self._agregar(span)
+            if self.path is not None:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(linea)
+
+    def _agregar(self, span: Dict[str, Any]) -> None:
+        """Suma el span a los totales (llamar con el lock tomado)."""
+        if span["nombre"] == "etapa":
+            etapa = self._etapas.setdefault(span.get("etapa", ""), {"suma": 0.0, "n": 0, "items": 0})
+            etapa["suma"] += span["duracion_s"]
+            etapa["n"] += 1
+            etapa["items"] += span.get("items") or 0
+            return
+        if span["nombre"] != "llm":
+            return
+
+        op = span.get("operacion", "")
+        origen = "cache" if span.get("cache_hit") else "api"
+        self._peticiones[(op, span["resultado"], origen)] += 1
+        self._reintentos[op] += span.get("reintentos") or 0
+        for tipo in ("prompt", "completion", "cached"):
+            self._tokens[(op, tipo)] += span.get(f"{tipo}_tokens") or 0
+        if origen == "api":
+            latencia = self._latencias.setdefault(op, {"buckets": [0] * len(BUCKETS_LATENCIA), "suma": 0.0, "n": 0})
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+                if span["duracion_s"] <= limite:
+                    latencia["buckets"][i] += 1
+            latencia["suma"] += span["duracion_s"]
+            latencia["n"] += 1
+
+    def registrar_conexiones(self, peticiones: int, nuevas: int) -> None:
+        """Fija las peticiones HTTP de la ejecución y cuántas abrieron una conexión nueva."""
+        with self._lock:
+            self._conexiones = {"peticiones": peticiones, "nuevas": nuevas}
+
+    def resumen(self) -> Dict[str, Any]:
+        """Totales de la ejecución: peticiones, tokens, reintentos y coste estimado."""
+        with self._lock:
+            peticiones = dict(self._peticiones)
+            tokens = {
+                tipo: sum(n for (_, t), n in self._tokens.items() if t == tipo) for tipo in ("prompt", "completion", "cached")
+            }
+            reintentos = sum(self._reintentos.values())
+            conexiones = dict(self._conexiones)
+        conexiones["reutilizacion"] = (
+            1 - conexiones["nuevas"] / conexiones["peticiones"] if conexiones["peticiones"] else 0.0
+        )
+        return {
+            "peticiones": sum(n for (_, _, origen), n in peticiones.items() if origen == "api"),
+            "cache_hits": sum(n for (_, _, origen), n in peticiones.items() if origen == "cache"),
+            "errores": sum(n for (_, resultado, _), n in peticiones.items() if resultado == "error"),
+            "reintentos": reintentos,
+            "tokens": tokens,
+            "coste_usd": self._coste(tokens),
+            "conexiones": conexiones,
+        }
+
+    def _coste(self, tokens: Dict[str, int]) -> float:
+        # Los tokens cacheados se cobran a su propio precio y no al de prompt
+        no_cacheados = max(0, tokens["prompt"] - tokens["cached"])
+        return (
+            no_cacheados * self.precios.get("prompt", 0.0)
+            + tokens["cached"] * self.precios.get("cached", self.precios.get("prompt", 0.0))
+            + tokens["completion"] * self.precios.get("completion", 0.0)
+        ) / 1_000_000
+
+    def exportar_prometheus(self, path: Union[str, Path]) -> None:
+        """Escribe las métricas agregadas de la ejecución en formato de texto de Prometheus."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.prometheus(), encoding="utf-8")
+        logger.info("Métricas exportadas a %s", path)
+
+    def prometheus(self) -> str:
+        """Métricas agregadas en formato de texto de Prometheus."""
+        with self._lock:
+            peticiones = dict(self._peticiones)
+            tokens = dict(self._tokens)
+            reintentos = dict(self._reintentos)
+            latencias = {op: {**l, "buckets": list(l["buckets"])} for op, l in self._latencias.items()}
+            etapas = {etapa: dict(totales) for etapa, totales in self._etapas.items()}
+            conexiones = dict(self._conexiones)
+        hu = self.atributos.get("hu", "")
+
+        lineas = [
+            "# HELP redactor_llm_requests_total Llamadas al LLM por operación, resultado y origen.",
+            "# TYPE redactor_llm_requests_total counter",
+        ]
+        for (op, resultado, origen), n in sorted(peticiones.items()):
+            lineas.append(f'redactor_llm_requests_total{{hu="{hu}",operacion="{op}",resultado="{resultado}",origen="{origen}"}} {n}')
+
+        lineas += ["# HELP redactor_llm_tokens_total Tokens de prompt, respuesta y caché.", "# TYPE redactor_llm_tokens_total counter"]
+        for (op, tipo), n in sorted(tokens.items()):
+            lineas.append(f'redactor_llm_tokens_total{{hu="{hu}",operacion="{op}",tipo="{tipo}"}} {n}')
+
+        lineas += ["# HELP redactor_llm_retries_total Reintentos del scheduler.", "# TYPE redactor_llm_retries_total counter"]
+        for op, n in sorted(reintentos.items()):
+            lineas.append(f'redactor_llm_retries_total{{hu="{hu}",operacion="{op}"}} {n}')
+
+        lineas += [
+            "# HELP redactor_llm_request_duration_seconds Latencia de las llamadas al LLM (reintentos incluidos).",
+            "# TYPE redactor_llm_request_duration_seconds histogram",
+        ]
+        for op, latencia in sorted(latencias.items()):
+            etiquetas = f'hu="{hu}",operacion="{op}"'
+            for limite, n in zip(BUCKETS_LATENCIA, latencia["buckets"]):
+                lineas.append(f'redactor_llm_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {n}')
+            lineas.append(f'redactor_llm_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {latencia["n"]}')
+            lineas.append(f"redactor_llm_request_duration_seconds_sum{{{etiquetas}}} {latencia['suma']:.6f}")
+            lineas.append(f"redactor_llm_request_duration_seconds_count{{{etiquetas}}} {latencia['n']}")
+
+        lineas += [
+            "# HELP redactor_stage_duration_seconds Duración de las etapas de Processor (una etapa puede repetirse).",
+            "# TYPE redactor_stage_duration_seconds summary",
+        ]
+        for etapa, totales in sorted(etapas.items()):
+            lineas.append(f'redactor_stage_duration_seconds_sum{{hu="{hu}",etapa="{etapa}"}} {totales["suma"]:.6f}')
+            lineas.append(f'redactor_stage_duration_seconds_count{{hu="{hu}",etapa="{etapa}"}} {totales["n"]}')
+        lineas += ["# HELP redactor_test_cases_total Casos procesados por etapa.", "# TYPE redactor_test_cases_total counter"]
+        for etapa, totales in sorted(etapas.items()):
+            if etapa != "feedback":
+                lineas.append(f'redactor_test_cases_total{{hu="{hu}",etapa="{etapa}"}} {totales["items"]}')
+
+        lineas += [
+            "# HELP redactor_http_requests_total Peticiones HTTP al LLM.",
+            "# TYPE redactor_http_requests_total counter",
+            f'redactor_http_requests_total{{hu="{hu}"}} {conexiones["peticiones"]}',
+            "# HELP redactor_http_connections_opened_total Peticiones HTTP que abrieron una conexión nueva (el resto reutilizó una del pool).",
+            "# TYPE redactor_http_connections_opened_total counter",
+            f'redactor_http_connections_opened_total{{hu="{hu}"}} {conexiones["nuevas"]}',
+        ]
+
+        lineas += [
+            "# HELP redactor_llm_cost_usd_total Coste estimado de la ejecución según LLM_PRICE_*.",
+            "# TYPE redactor_llm_cost_usd_total counter",
+            f'redactor_llm_cost_usd_total{{hu="{hu}"}} {self.resumen()["coste_usd"]:.6f}',
+        ]
+        return "\n".join(lineas) + "\n"
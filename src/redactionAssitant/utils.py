@@ -1,6 +1,10 @@
 import logging
+import os
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from itertools import islice
-from typing import Callable, Iterable, List, TypeVar
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -40,6 +44,66 @@ def get_data(cfg):
 
     return hus, cps, exp
 
+def iter_lineas(path: Path) -> Iterator[str]:
+    """Genera las líneas no vacías de un archivo UTF-8, sin espacios, leyéndolo a medida que se consume."""
+    with open(path, "r", encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                yield linea
+
+
+def get_data_streaming(cfg) -> tuple[str, Iterator[str], Iterator[str]]:
+    """
+    Como get_data, pero CPS y EXP se devuelven como iteradores de líneas.
+
+    La HU se lee completa (es el contexto de todos los lotes); los casos y
+    resultados esperados se leen según se consumen, con la misma limpieza que
+    ``preprocess_exp_or_cps``.
+    """
+    paths = {
+        "HUS": Path(cfg.input_path("hus")),
+        "CPS": Path(cfg.input_path("cps")),
+        "EXP": Path(cfg.input_path("exp")),
+    }
+    for label, p in paths.items():
+        if not p.exists():
+            raise FileNotFoundError(f"Archivo {label} no encontrado: {p}")
+
+    hus = _read_text(paths["HUS"])
+    if not hus:
+        logger.warning("El archivo de HUS está vacío.")
+    return hus, iter_lineas(paths["CPS"]), iter_lineas(paths["EXP"])
+
+
+@contextmanager
+def salida_por_lineas(path) -> Iterator[Callable[[Iterable[str]], None]]:
+    """
+    Abre ``path`` para escribir líneas a medida que llegan.
+
+    Devuelve una función que recibe líneas y las escribe separadas por saltos
+    de línea (sin salto final, como ``save_data``). Se escribe en un temporal
+    que solo sustituye a ``path`` si el bloque termina sin errores.
+    """
+    path = Path(path)
+    temporal = path.with_name(path.name + ".tmp")
+    separador = ""
+    try:
+        with open(temporal, "w", encoding="utf-8") as f:
+            def escribir(lineas: Iterable[str]) -> None:
+                nonlocal separador
+                for linea in lineas:
+                    f.write(separador + linea)
+                    separador = "\n"
+
+            yield escribir
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+    os.replace(temporal, path)
+    logger.info("Salida escrita en %s", path)
+
+
 """Guarda los datos corregidos y el feedback en archivos."""
 def save_data(new_cps: str, new_exp: str, feedback: str, cps_out: str, exp_out: str, fb_out: str) -> None:
     """
@@ -75,36 +139,119 @@ def save_data(new_cps: str, new_exp: str, feedback: str, cps_out: str, exp_out:
         
 
 T = TypeVar("T")
+R = TypeVar("R")
+
+# Qué hacer con un lote cuyo procesador lanza una excepción
+POLITICAS_ERROR = ("fallar", "omitir", "reintentar")
+
+
+def mapear_lotes(
+    lotes: Iterable[T],
+    procesador: Callable[[T], R],
+    max_en_vuelo: int = 4,
+    politica: str = "fallar",
+    reintentos: int = 1,
+    executor: Optional[Executor] = None,
+) -> Iterator[R]:
+    """
+    Aplica 'procesador' a cada lote en un pool de hilos y devuelve los resultados en orden.
+
+    Como mucho hay 'max_en_vuelo' lotes enviados y sin consumir: el siguiente
+    lote no se pide a 'lotes' hasta que se recoge el más antiguo, así que
+    'lotes' puede ser un generador perezoso y un consumidor lento frena el envío.
+
+    Si un lote lanza una excepción, según 'politica':
+      - "fallar": se cancelan los lotes pendientes y se relanza.
+      - "omitir": se registra el error y el lote no aparece en la salida.
+      - "reintentar": se reenvía hasta 'reintentos' veces y, si sigue
+        fallando, se relanza.
+
+    Args:
+        lotes: Lotes a procesar, en el orden de la salida
+        procesador: Función aplicada a cada lote (se ejecuta en otro hilo)
+        max_en_vuelo: Máximo de lotes enviados a la vez
+        politica: Política de error por lote
+        reintentos: Reenvíos por lote con la política "reintentar"
+        executor: Pool en el que enviar los lotes; si no se indica se crea
+            uno de 'max_en_vuelo' hilos y se cierra al terminar
+    """
+    if politica not in POLITICAS_ERROR:
+        raise ValueError(f"Política de error no válida: {politica}. Disponibles: {', '.join(POLITICAS_ERROR)}")
+    if max_en_vuelo <= 0:
+        raise ValueError(f"max_en_vuelo debe ser mayor que 0, recibido: {max_en_vuelo}")
+
+    propio = executor is None
+    if propio:
+        executor = ThreadPoolExecutor(max_workers=max_en_vuelo)
+    en_vuelo: deque = deque()
+
+    def resolver(indice: int, lote: T, futuro) -> List[R]:
+        intento = 0
+        while True:
+            try:
+                return [futuro.result()]
+            except Exception as e:
+                if politica == "reintentar" and intento < reintentos:
+                    intento += 1
+                    logger.warning("Error en el lote %d: %s; reintento %d de %d", indice, e, intento, reintentos)
+                    futuro = executor.submit(procesador, lote)
+                elif politica == "omitir":
+                    logger.error("Error en el lote %d: %s; se omite", indice, e)
+                    return []
+                else:
+                    logger.error("Error procesando el lote %d: %s", indice, e)
+                    logger.debug("Detalles del error: %s", e, exc_info=True)
+                    raise
+
+    try:
+        for indice, lote in enumerate(lotes):
+            en_vuelo.append((indice, lote, executor.submit(procesador, lote)))
+            if len(en_vuelo) >= max_en_vuelo:
+                yield from resolver(*en_vuelo.popleft())
+        while en_vuelo:
+            yield from resolver(*en_vuelo.popleft())
+    finally:
+        for _, _, futuro in en_vuelo:
+            futuro.cancel()
+        if propio:
+            executor.shutdown(wait=True, cancel_futures=True)
+
 
 def procesar_en_batches(
     items: Iterable[T],
     procesador: Callable[[List[T]], str],
-    batch_size: int = 10
+    batch_size: int = 10,
+    max_en_vuelo: int = 4,
+    politica: str = "fallar",
+    reintentos: int = 1,
 ) -> List[str]:
     """
     Aplica 'procesador' sobre los items en trozos de tamaño batch_size.
     'procesador' recibe la lista de items del batch y debe devolver
     un str con líneas separadas por '\n'. Devuelve la lista concatenada
-    de todas esas líneas.
+    de todas esas líneas, en el orden de los items.
+
+    'items' puede ser cualquier iterable (también un generador): los batches
+    se forman a medida que hay hueco, con hasta 'max_en_vuelo' en paralelo.
+    'politica' y 'reintentos' se aplican a cada batch como en mapear_lotes.
     """
-    resultados: List[str] = []
-    it = iter(items)
-    logger.debug("Procesando %d ítems en batches de tamaño %d", len(items), batch_size)
     if batch_size <= 0:
         logger.error("batch_size debe ser mayor que 0, recibido: %d", batch_size)
         raise ValueError("batch_size debe ser mayor que 0")
-    while True:
-        batch = list(islice(it, batch_size))
-        if not batch:
-            break
-        logger.info("Procesando batch de %d ítems", len(batch))
-        try:
-            salida = procesador(batch)
-            resultados.extend(salida.splitlines())
-        except Exception as e:
-            logger.error("Error procesando batch %s: %s", batch, e)
-            logger.debug("Detalles del error: %s", e, exc_info=True)
-            raise
+    logger.debug("Procesando ítems en batches de tamaño %d (%d en vuelo)", batch_size, max_en_vuelo)
+
+    def batches() -> Iterator[List[T]]:
+        it = iter(items)
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                return
+            logger.info("Procesando batch de %d ítems", len(batch))
+            yield batch
+
+    resultados: List[str] = []
+    for salida in mapear_lotes(batches(), procesador, max_en_vuelo, politica, reintentos):
+        resultados.extend(salida.splitlines())
     logger.info("Procesados %d ítems en total", len(resultados))
 
     return resultados
\ No newline at end of file
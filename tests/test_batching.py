@@ -0,0 +1,100 @@
+import pytest
+from src.redactionAssitant.batching import BatchPlanner
+
+
+class TestBatchPlanner:
+    """Test suite for BatchPlanner class"""
+
+    def test_short_items_fill_up_to_max_items(self):
+        """Test that cheap items are grouped up to max_items"""
+        planner = BatchPlanner(token_budget=6000, max_items=20)
+        items = [f"USRNM{i:03d} Caso" for i in range(45)]
+
+        batches = planner.planificar(items)
+
+        assert [len(b) for b in batches] == [20, 20, 5]
+        assert [item for b in batches for item in b] == items
+
+    def test_long_items_produce_smaller_batches(self):
+        """Test that long items are packed by token budget, not by count"""
+        planner = BatchPlanner(token_budget=2000, max_completion=1500, max_items=20)
+        long_items = [f"USRNM{i:03d} " + "x" * 400 for i in range(20)]
+        short_items = [f"USRNM{i:03d} Caso" for i in range(20)]
+
+        long_batches = planner.planificar(long_items)
+        short_batches = planner.planificar(short_items)
+
+        assert len(long_batches) > len(short_batches) == 1
+        for batch in long_batches:
+            prompt, completion = planner.estimar_lote(batch)
+            assert prompt + completion <= planner.token_budget or len(batch) == 1
+
+    def test_base_text_counts_against_budget(self):
+        """Test that the shared HU text reduces room for items"""
+        planner = BatchPlanner(token_budget=1500, max_items=100)
+        items = ["USRNM001 " + "y" * 100] * 30
+
+        without_base = planner.planificar(items)
+        with_base = planner.planificar(items, base="h" * 2000)
+
+        assert len(with_base) > len(without_base)
+
+    def test_oversized_item_gets_its_own_batch(self):
+        """Test an item bigger than the budget is still sent"""
+        planner = BatchPlanner(token_budget=500, max_completion=300)
+        items = ["a", "z" * 5000, "b"]
+
+        batches = planner.planificar(items)
+
+        assert ["z" * 5000] in batches
+        assert [item for b in batches for item in b] == items
+
+    def test_iterar_accepts_generators(self):
+        """Test that batches are produced lazily from any iterable"""
+        planner = BatchPlanner(max_items=2)
+
+        batches = planner.iterar(f"USRNM{i:03d}" for i in range(5))
+
+        assert next(batches) == ["USRNM000", "USRNM001"]
+        assert list(batches) == [["USRNM002", "USRNM003"], ["USRNM004"]]
+
+    def test_registrar_uso_calibrates_ratios(self):
+        """Test that observed usage updates chars-per-token and output ratio"""
+        planner = BatchPlanner(chars_por_token=3.5, ratio_salida=1.6)
+
+        for _ in range(20):
+            planner.registrar_uso({
+                "prompt_chars": 2000,
+                "entrada_chars": 1000,
+                "prompt_tokens": 1000,
+                "completion_tokens": 250,
+                "finish_reason": "stop",
+            })
+
+        assert planner.chars_por_token == pytest.approx(2.0, rel=0.01)
+        assert planner.ratio_salida == pytest.approx(0.5, rel=0.02)
+
+    def test_truncation_shrinks_completion_budget_and_recovers(self):
+        """Test that length truncation reduces the completion limit, which then recovers"""
+        planner = BatchPlanner(max_completion=1000)
+
+        planner.registrar_uso({"finish_reason": "length"})
+        assert planner.max_completion == 700
+
+        for _ in range(10):
+            planner.registrar_uso({"finish_reason": "stop"})
+        assert planner.max_completion == 1000
+
+    def test_registrar_uso_ignores_missing_usage(self):
+        """Test that non-numeric usage values are ignored"""
+        planner = BatchPlanner()
+        before = (planner.chars_por_token, planner.ratio_salida)
+
+        planner.registrar_uso({"prompt_tokens": None, "completion_tokens": object()})
+
+        assert (planner.chars_por_token, planner.ratio_salida) == before
+
+    def test_invalid_budget(self):
+        """Test invalid budgets raise ValueError"""
+        with pytest.raises(ValueError, match="deben ser mayores que 0"):
+            BatchPlanner(token_budget=0)
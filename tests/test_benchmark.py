@@ -0,0 +1,41 @@
+import json
+from src.redactionAssitant.benchmark import ejecutar_benchmark, generar_entrada, main, percentil
+from src.redactionAssitant.mock_server import MockLLMServer
+
+
+class TestBenchmark:
+    """Test suite for the load benchmark harness"""
+
+    def test_generar_entrada(self):
+        """Test that synthetic input has one EXP per test case"""
+        hu, cps, exp = generar_entrada(5)
+
+        assert hu
+        assert len(cps.splitlines()) == len(exp.splitlines()) == 5
+        assert cps.splitlines()[0].startswith("USRNM000001")
+
+    def test_percentil(self):
+        """Test nearest-rank percentiles"""
+        valores = list(range(1, 101))
+        assert percentil(valores, 50) == 50
+        assert percentil(valores, 99) == 99
+        assert percentil([], 95) == 0.0
+
+    def test_ejecutar_benchmark_against_mock(self):
+        """Test a full staged run against the mock server"""
+        with MockLLMServer() as server:
+            resultado = ejecutar_benchmark(30, server)
+
+        assert resultado["completo"] is True
+        assert resultado["peticiones"] >= 4
+        assert resultado["max_en_vuelo"] >= 1
+        assert resultado["p50_ms"] <= resultado["p99_ms"]
+
+    def test_main_writes_json(self, tmp_path, capsys):
+        """Test the CLI prints a table and writes JSON results"""
+        destino = tmp_path / "bench.json"
+
+        assert main(["--casos", "10", "--modo", "pipeline", "--media", "0", "--json", str(destino)]) == 0
+
+        assert "casos_por_s" in capsys.readouterr().out
+        assert json.loads(destino.read_text(encoding="utf-8"))[0]["casos"] == 10
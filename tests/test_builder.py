@@ -1,6 +1,20 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from src.redactionAssitant.builder import Builder
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
+from src.redactionAssitant.builder import Builder, AsyncBuilder, LLMRequestError, iterar_lineas
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    """Build a streaming chunk like the ones returned by the OpenAI SDK"""
+    chunk = Mock()
+    chunk.usage = usage
+    if content is None and finish_reason is None:
+        chunk.choices = []
+    else:
+        chunk.choices = [Mock()]
+        chunk.choices[0].delta.content = content
+        chunk.choices[0].finish_reason = finish_reason
+    return chunk
 
 
 class TestBuilder:
@@ -54,12 +68,14 @@ class TestBuilder:
         mock_client.chat.completions.create.assert_called_once()
 
     def test_corregir_ortografia_api_error(self, builder, mock_client):
-        """Test orthography correction with API error"""
-        mock_client.chat.completions.create.side_effect = Exception("API Error")
+        """Test that an API error is raised as LLMRequestError instead of returned as text"""
+        error = Exception("API Error")
+        mock_client.chat.completions.create.side_effect = error
 
-        result = builder.corregir_ortografia("HU", ["Test case"])
+        with pytest.raises(LLMRequestError, match="Error al corregir ortografía: API Error") as exc:
+            builder.corregir_ortografia("HU", ["Test case"])
 
-        assert "Error al corregir ortografía: API Error" in result
+        assert exc.value.__cause__ is error
 
     def test_obtener_feedback_success(self, builder, mock_client):
         """Test successful feedback generation"""
@@ -79,9 +95,24 @@ class TestBuilder:
         """Test feedback generation with API error"""
         mock_client.chat.completions.create.side_effect = Exception("API Error")
 
-        result = builder.obtener_feedback("Some observations")
+        with pytest.raises(LLMRequestError, match="Error al obtener feedback: API Error"):
+            builder.obtener_feedback("Some observations")
 
-        assert "Error: API Error" in result
+    def test_combinar_feedback(self, builder, mock_client):
+        """Test the feedback reduce prompt contains every partial summary"""
+        result = builder.combinar_feedback(["Resumen lote 1", "Resumen lote 2"])
+
+        assert result == "Mocked response content"
+        prompt = mock_client.chat.completions.create.call_args[1]["messages"][1]["content"]
+        assert "- Resumen lote 1" in prompt
+        assert "- Resumen lote 2" in prompt
+
+    def test_combinar_feedback_api_error(self, builder, mock_client):
+        """Test feedback reduce with API error"""
+        mock_client.chat.completions.create.side_effect = Exception("API Error")
+
+        with pytest.raises(LLMRequestError, match="Error al combinar feedback: API Error"):
+            builder.combinar_feedback(["a", "b"])
 
     def test_corregir_expect_result_success(self, builder, mock_client):
         """Test successful expected result correction"""
@@ -102,9 +133,8 @@ class TestBuilder:
         """Test expected result correction with API error"""
         mock_client.chat.completions.create.side_effect = Exception("API Error")
 
-        result = builder.corregir_expect_result("Test data")
-
-        assert "Error: API Error" in result
+        with pytest.raises(LLMRequestError, match="Error al corregir expected results: API Error"):
+            builder.corregir_expect_result("Test data")
 
     def test_prompt_construction_ortografia(self, builder, mock_client):
         """Test that orthography correction prompt is constructed correctly"""
@@ -180,7 +210,7 @@ class TestBuilder:
         """Test that errors are properly logged"""
         mock_client.chat.completions.create.side_effect = Exception("Test error")
 
-        with caplog.at_level("ERROR"):
+        with caplog.at_level("ERROR"), pytest.raises(LLMRequestError):
             if method_name == "corregir_ortografia":
                 builder.corregir_ortografia("HU", ["Test"])
             elif method_name == "obtener_feedback":
@@ -189,4 +219,209 @@ class TestBuilder:
                 builder.corregir_expect_result("Test")
 
         assert expected_log_message in caplog.text
-        assert "Test error" in caplog.text
\ No newline at end of file
+        assert "Test error" in caplog.text
+
+    def test_cache_hit_skips_api_call(self, mock_client, tmp_path):
+        """Test that a cached response avoids calling the API again"""
+        from src.redactionAssitant.cache import ResponseCache
+
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        builder = Builder(mock_client, cache=cache)
+
+        first = builder.corregir_ortografia("HU", ["USRNM001 Test"])
+        second = builder.corregir_ortografia("HU", ["USRNM001 Test"])
+
+        assert first == second == "Mocked response content"
+        mock_client.chat.completions.create.assert_called_once()
+        cache.close()
+
+    def test_tracer_records_llm_span(self, mock_client, tmp_path):
+        """Test that each call produces an llm span with tokens, and cache hits are marked"""
+        from src.redactionAssitant.cache import ResponseCache
+        from src.redactionAssitant.telemetry import Tracer
+
+        response = mock_client.chat.completions.create.return_value
+        response.usage = Mock(prompt_tokens=120, completion_tokens=40, prompt_cache_hit_tokens=100)
+        response.choices[0].finish_reason = "stop"
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        tracer = Tracer()
+        builder = Builder(mock_client, cache=cache, tracer=tracer)
+
+        builder.corregir_ortografia("HU", ["USRNM001 Test"])
+        builder.corregir_ortografia("HU", ["USRNM001 Test"])
+
+        api, hit = tracer.spans
+        assert (api["operacion"], api["prompt_tokens"], api["cached_tokens"]) == ("ortografia", 120, 100)
+        assert not api.get("cache_hit")
+        assert hit["cache_hit"] is True
+        cache.close()
+
+    def test_api_errors_are_not_cached(self, mock_client, tmp_path):
+        """Test that failed calls are never stored in the cache"""
+        from src.redactionAssitant.cache import ResponseCache
+
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        builder = Builder(mock_client, cache=cache)
+        mock_client.chat.completions.create.side_effect = Exception("API Error")
+
+        with pytest.raises(LLMRequestError):
+            builder.obtener_feedback("OBS")
+
+        assert len(cache) == 0
+        cache.close()
+
+    def test_on_usage_receives_observed_usage(self, mock_client):
+        """Test that the usage callback gets token usage for real API calls"""
+        response = mock_client.chat.completions.create.return_value
+        response.usage.prompt_tokens = 120
+        response.usage.completion_tokens = 40
+        response.choices[0].finish_reason = "stop"
+        on_usage = Mock()
+        builder = Builder(mock_client, on_usage=on_usage)
+
+        builder.corregir_ortografia("HU", ["USRNM001 Test"])
+
+        operacion, registro = on_usage.call_args[0]
+        assert operacion == "ortografia"
+        assert registro["prompt_tokens"] == 120
+        assert registro["completion_tokens"] == 40
+        assert registro["entrada_chars"] == len("USRNM001 Test")
+        assert registro["finish_reason"] == "stop"
+
+    def test_on_usage_errors_do_not_break_calls(self, mock_client):
+        """Test that a failing usage callback does not affect the result"""
+        builder = Builder(mock_client, on_usage=Mock(side_effect=RuntimeError("boom")))
+
+        assert builder.obtener_feedback("OBS") == "Mocked response content"
+
+    def test_corregir_ortografia_stream_yields_complete_lines(self, mock_client):
+        """Test that streamed deltas are regrouped into complete OBS/CP lines"""
+        usage = Mock(prompt_tokens=50, completion_tokens=20)
+        mock_client.chat.completions.create.return_value = iter([
+            _chunk("OBS[1]: sin cam"),
+            _chunk("bios, CP: USRNM001 Login\nOBS[2]"),
+            _chunk(": tilde, CP: USRNM002 Sesión", finish_reason="stop"),
+            _chunk(usage=usage),
+        ])
+        on_usage = Mock()
+        builder = Builder(mock_client, on_usage=on_usage)
+
+        lines = list(builder.corregir_ortografia_stream("HU", ["USRNM001 Login", "USRNM002 Sesion"]))
+
+        assert lines == [
+            "OBS[1]: sin cambios, CP: USRNM001 Login",
+            "OBS[2]: tilde, CP: USRNM002 Sesión",
+        ]
+        call_args = mock_client.chat.completions.create.call_args
+        assert call_args[1]["stream"] is True
+        registro = on_usage.call_args[0][1]
+        assert registro["completion_tokens"] == 20
+        assert registro["finish_reason"] == "stop"
+
+    def test_stream_is_cached_only_when_complete(self, mock_client, tmp_path):
+        """Test that aborted streams are closed and never cached, complete ones are"""
+        from src.redactionAssitant.cache import ResponseCache
+
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        builder = Builder(mock_client, cache=cache)
+        stream = MagicMock()
+        stream.__iter__.return_value = iter([_chunk("ExpRes1: Ok\n"), _chunk("basura\n")])
+        mock_client.chat.completions.create.return_value = stream
+
+        lines = builder.corregir_expect_result_stream("CP | Exp")
+        assert next(lines) == "ExpRes1: Ok"
+        lines.close()
+
+        stream.close.assert_called_once()
+        assert len(cache) == 0
+
+        mock_client.chat.completions.create.return_value = iter([_chunk("ExpRes1: Ok\nOBS: nada")])
+        assert list(builder.corregir_expect_result_stream("CP | Exp")) == ["ExpRes1: Ok", "OBS: nada"]
+        assert list(builder.corregir_expect_result_stream("CP | Exp")) == ["ExpRes1: Ok", "OBS: nada"]
+        assert mock_client.chat.completions.create.call_count == 2
+        cache.close()
+
+    def test_stream_api_error(self, builder, mock_client):
+        """Test that streaming raises LLMRequestError instead of yielding an error line"""
+        mock_client.chat.completions.create.side_effect = Exception("API Error")
+
+        with pytest.raises(LLMRequestError, match="Error al corregir ortografía: API Error"):
+            list(builder.corregir_ortografia_stream("HU", ["Test"]))
+
+    def test_iterar_lineas(self):
+        """Test regrouping of arbitrary fragments into lines"""
+        fragments = ["ExpRes1: A", "\n\nExpRes2", ": B\nOBS: ", "C"]
+        assert list(iterar_lineas(fragments)) == ["ExpRes1: A", "ExpRes2: B", "OBS: C"]
+
+    def test_calls_go_through_scheduler(self, mock_client):
+        """Test that API calls are executed by the request scheduler"""
+        scheduler = Mock()
+        scheduler.ejecutar.side_effect = lambda fn, tokens, info=None: fn()
+        builder = Builder(mock_client, scheduler=scheduler)
+
+        result = builder.corregir_ortografia("HU", ["USRNM001 Test"])
+
+        assert result == "Mocked response content"
+        scheduler.ejecutar.assert_called_once()
+        assert scheduler.ejecutar.call_args[1]["tokens"] > 0
+
+    def test_transient_error_is_retried_not_returned(self, mock_client):
+        """Test that a 429 followed by success yields model output, not an error string"""
+        import httpx
+        import openai
+        from src.redactionAssitant.scheduler import RequestScheduler
+
+        request = httpx.Request("POST", "https://api.deepseek.com")
+        rate_limited = openai.RateLimitError(
+            "rate limited", response=httpx.Response(429, request=request, headers={"retry-after": "0"}), body=None
+        )
+        mock_client.chat.completions.create.side_effect = [rate_limited, mock_client.chat.completions.create.return_value]
+        builder = Builder(mock_client, scheduler=RequestScheduler())
+
+        assert builder.obtener_feedback("OBS") == "Mocked response content"
+        assert mock_client.chat.completions.create.call_count == 2
+
+
+class TestAsyncBuilder:
+    """Test suite for AsyncBuilder class"""
+
+    @pytest.fixture
+    def mock_async_client(self):
+        """Fixture for mock AsyncOpenAI client"""
+        client = Mock()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "  Async response  "
+        client.chat.completions.create = AsyncMock(return_value=mock_response)
+        return client
+
+    def test_corregir_ortografia_uses_same_prompt(self, mock_async_client):
+        """Test that the async variant sends the same messages as Builder"""
+        builder = AsyncBuilder(mock_async_client)
+
+        result = asyncio.run(builder.corregir_ortografia("HU", ["USRNM001 Test"]))
+
+        assert result == "Async response"
+        call_args = mock_async_client.chat.completions.create.call_args
+        assert call_args[1]["messages"] == builder._mensajes_ortografia("HU", ["USRNM001 Test"])
+
+    def test_obtener_feedback_and_expect_result(self, mock_async_client):
+        """Test remaining async methods"""
+        builder = AsyncBuilder(mock_async_client)
+
+        assert asyncio.run(builder.obtener_feedback("OBS")) == "Async response"
+        assert asyncio.run(builder.corregir_expect_result(["CP1 | Exp1"])) == "Async response"
+        assert mock_async_client.chat.completions.create.await_count == 2
+
+    @pytest.mark.parametrize("method_name,args,expected", [
+        ("corregir_ortografia", ("HU", ["Test"]), "Error al corregir ortografía: boom"),
+        ("obtener_feedback", ("OBS",), "Error al obtener feedback: boom"),
+        ("corregir_expect_result", ("Test",), "Error al corregir expected results: boom"),
+    ])
+    def test_api_errors(self, mock_async_client, method_name, args, expected):
+        """Test that async API errors are raised as LLMRequestError like in Builder"""
+        mock_async_client.chat.completions.create.side_effect = Exception("boom")
+        builder = AsyncBuilder(mock_async_client)
+
+        with pytest.raises(LLMRequestError, match=expected):
+            asyncio.run(getattr(builder, method_name)(*args))
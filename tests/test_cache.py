@@ -0,0 +1,130 @@
+import time
+import pytest
+from src.redactionAssitant.cache import ResponseCache
+
+
+MESSAGES = [
+    {"role": "system", "content": "Eres un experto en pruebas de software."},
+    {"role": "user", "content": "USRNM001 Validar login"},
+]
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache class"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Fixture for a cache stored in a temporary directory"""
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        yield cache
+        cache.close()
+
+    def test_miss_then_hit(self, cache):
+        """Test that a stored response is returned for the same model and messages"""
+        assert cache.obtener("deepseek-chat", MESSAGES) is None
+
+        cache.guardar("deepseek-chat", MESSAGES, "respuesta")
+
+        assert cache.obtener("deepseek-chat", MESSAGES) == "respuesta"
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_key_depends_on_model_and_messages(self, cache):
+        """Test that model and full message list are part of the key"""
+        cache.guardar("deepseek-chat", MESSAGES, "respuesta")
+
+        other_messages = MESSAGES + [{"role": "user", "content": "extra"}]
+        assert cache.obtener("otro-modelo", MESSAGES) is None
+        assert cache.obtener("deepseek-chat", other_messages) is None
+
+    def test_persists_between_instances(self, tmp_path):
+        """Test that responses survive reopening the database"""
+        path = tmp_path / "cache.sqlite3"
+        first = ResponseCache(path)
+        first.guardar("deepseek-chat", MESSAGES, "respuesta")
+        first.close()
+
+        second = ResponseCache(path)
+        assert second.obtener("deepseek-chat", MESSAGES) == "respuesta"
+        second.close()
+
+    def test_expired_entries_are_ignored(self, tmp_path):
+        """Test age-based eviction"""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", max_age=0.01)
+        cache.guardar("deepseek-chat", MESSAGES, "respuesta")
+        time.sleep(0.05)
+
+        assert cache.obtener("deepseek-chat", MESSAGES) is None
+        assert len(cache) == 0
+        cache.close()
+
+    def test_size_eviction_removes_least_recently_used(self, tmp_path):
+        """Test size-based eviction keeps the most recently used entries"""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", max_bytes=25)
+        first = [{"role": "user", "content": "1"}]
+        second = [{"role": "user", "content": "2"}]
+        third = [{"role": "user", "content": "3"}]
+
+        cache.guardar("m", first, "a" * 10)
+        cache.guardar("m", second, "b" * 10)
+        cache.obtener("m", first)
+        cache.guardar("m", third, "c" * 10)
+
+        assert cache.obtener("m", second) is None
+        assert cache.obtener("m", first) == "a" * 10
+        assert cache.obtener("m", third) == "c" * 10
+        cache.close()
+
+    def test_guardar_does_not_scan_the_table(self, tmp_path):
+        """Test that inserts keep a running size instead of summing every row"""
+        path = tmp_path / "cache.sqlite3"
+        cache = ResponseCache(path, max_bytes=25)
+        for i in range(3):
+            cache.guardar("m", [{"role": "user", "content": str(i)}], "x" * 10)
+        cache.close()
+
+        cache = ResponseCache(path, max_bytes=25)
+        sentencias = []
+        cache._conn.set_trace_callback(sentencias.append)
+        cache.guardar("m", [{"role": "user", "content": "0"}], "y" * 5)
+        cache.guardar("m", [{"role": "user", "content": "nuevo"}], "z" * 10)
+
+        assert not any("SUM(bytes) FROM respuestas" in s and "WHERE" not in s for s in sentencias)
+        assert cache._bytes == cache._contar_bytes() <= 25
+        cache.close()
+
+    def test_refresh_mode_writes_but_does_not_read(self, tmp_path):
+        """Test refresh mode bypasses reads and overwrites entries"""
+        path = tmp_path / "cache.sqlite3"
+        cache = ResponseCache(path)
+        cache.guardar("m", MESSAGES, "vieja")
+        cache.close()
+
+        refresh = ResponseCache(path, modo="refresh")
+        assert refresh.obtener("m", MESSAGES) is None
+        refresh.guardar("m", MESSAGES, "nueva")
+        refresh.close()
+
+        cache = ResponseCache(path)
+        assert cache.obtener("m", MESSAGES) == "nueva"
+        cache.close()
+
+    def test_off_mode_never_stores(self, tmp_path):
+        """Test off mode ignores the cache completely"""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", modo="off")
+        cache.guardar("m", MESSAGES, "respuesta")
+
+        assert len(cache) == 0
+        assert cache.obtener("m", MESSAGES) is None
+        cache.close()
+
+    def test_invalid_mode(self, tmp_path):
+        """Test invalid mode raises ValueError"""
+        with pytest.raises(ValueError, match="Modo de caché 'x' no válido"):
+            ResponseCache(tmp_path / "cache.sqlite3", modo="x")
+
+    def test_limpiar(self, cache):
+        """Test clearing every entry"""
+        cache.guardar("m", MESSAGES, "respuesta")
+        cache.limpiar()
+        assert len(cache) == 0
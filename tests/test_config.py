@@ -80,4 +80,77 @@ class TestConfig:
 
         assert str(cps_path).endswith('data/processed/TestCases.txt')
         assert str(exp_path).endswith('data/processed/expectedResults.txt')
-        assert str(fb_path).endswith('data/processed/feedback.txt')
\ No newline at end of file
+        assert str(fb_path).endswith('data/processed/feedback.txt')
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_CACHE': 'refresh'})
+    def test_cache_settings(self):
+        """Test LLM cache settings are read from the environment"""
+        config = Config()
+        assert config.cache_mode == 'refresh'
+        assert str(config.cache_path).endswith('data/processed/llm_cache.sqlite3')
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_BATCH_REPAIR_RETRIES': '5'})
+    def test_batch_repair_retries(self):
+        """Test the batch repair budget is read from the environment"""
+        assert Config().batch_repair_retries == 5
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_BATCH_ERROR_POLICY': 'Reintentar', 'LLM_BATCH_ERROR_RETRIES': '2'})
+    def test_batch_error_policy(self):
+        """Test the per-batch error policy and its retry budget are read from the environment"""
+        config = Config()
+        assert config.batch_error_policy == 'reintentar'
+        assert config.batch_error_retries == 2
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_BATCH_ERROR_POLICY': 'ignorar'})
+    def test_batch_error_policy_invalid(self):
+        """Test that unknown batch error policies are rejected"""
+        with pytest.raises(ValueError, match="LLM_BATCH_ERROR_POLICY"):
+            Config()
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_FEEDBACK_MAX_CHARS': '1'})
+    def test_feedback_max_chars_invalid(self):
+        """Test that a feedback reduce cap too small to hold a summary is rejected"""
+        with pytest.raises(ValueError, match="LLM_FEEDBACK_MAX_CHARS"):
+            Config()
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_HTTP_MAX_CONNECTIONS': '8', 'LLM_HTTP_READ_TIMEOUT_S': '30', 'LLM_HTTP2': 'off'})
+    def test_http_pool_settings(self):
+        """Test the shared HTTP pool limits, timeouts and protocol are read from the environment"""
+        assert Config().http_pool == {
+            'max_conexiones': 8, 'max_keepalive': 20, 'keepalive_expiry': 30.0,
+            'connect_timeout': 5.0, 'read_timeout': 30.0, 'http2': False,
+        }
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'DS_BASE_URL': 'http://127.0.0.1:8000'})
+    def test_base_url(self):
+        """Test the API endpoint can be overridden"""
+        assert Config().base_url == 'http://127.0.0.1:8000'
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_DEDUP': 'off'})
+    def test_dedup_can_be_disabled(self):
+        """Test LLM_DEDUP=off disables deduplication"""
+        assert Config().dedup is False
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_PRICE_PROMPT_PER_M': '0.27', 'LLM_PRICE_COMPLETION_PER_M': '1.1'})
+    def test_telemetry_settings(self):
+        """Test trace/metrics paths and LLM prices"""
+        config = Config()
+        assert str(config.trace_path).endswith('data/processed/trace.jsonl')
+        assert str(config.metrics_path).endswith('data/processed/metrics.prom')
+        assert str(config.profile_dir).endswith('data/processed/profile')
+        assert config.llm_prices == {'prompt': 0.27, 'completion': 1.1, 'cached': 0.27}
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key'})
+    def test_dotenv_is_loaded_once_on_first_config(self):
+        """Test .env is loaded when the first Config is created, not at import time"""
+        import src.redactionAssitant.config as config_module
+        with patch.object(config_module, '_dotenv_cargado', False), patch('dotenv.load_dotenv') as mock_load:
+            Config()
+            Config()
+        mock_load.assert_called_once()
+
+    @patch.dict('os.environ', {'DS_API_KEY': 'test_api_key', 'LLM_CACHE': 'maybe'})
+    def test_cache_invalid_mode(self):
+        """Test invalid LLM_CACHE value"""
+        with pytest.raises(ValueError, match="LLM_CACHE='maybe' no válido"):
+            Config()
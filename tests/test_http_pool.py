@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+from src.redactionAssitant import http_pool
+from src.redactionAssitant.http_pool import cerrar_clientes, cliente_http, cliente_http_async
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+@pytest.fixture
+def url():
+    """Local keep-alive HTTP server"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def pool_limpio():
+    """Close the shared clients after each test"""
+    yield
+    cerrar_clientes()
+
+
+def _delta(antes):
+    despues = http_pool.ESTADISTICAS.instantanea()
+    return {clave: despues[clave] - antes[clave] for clave in antes}
+
+
+class TestClienteHttp:
+    """Test suite for the shared HTTP connection pool"""
+
+    def test_same_config_shares_client(self):
+        """Test that the client is shared per pool configuration and recreated after closing"""
+        cliente = cliente_http()
+
+        assert cliente_http() is cliente
+        assert cliente_http(max_conexiones=5) is not cliente
+        cerrar_clientes()
+        assert cliente.is_closed
+        assert cliente_http() is not cliente
+
+    def test_timeouts_and_limits(self):
+        """Test that connect/read timeouts and pool limits come from the arguments"""
+        cliente = cliente_http(max_conexiones=4, max_keepalive=8, connect_timeout=2.0, read_timeout=30.0)
+
+        assert cliente.timeout.connect == 2.0
+        assert cliente.timeout.read == 30.0
+        pool = cliente._transport._pool
+        assert pool._max_connections == 4
+        assert pool._max_keepalive_connections == 4
+
+    def test_http2_falls_back_without_h2(self):
+        """Test that HTTP/2 is only enabled when the h2 package is available"""
+        with patch.dict("sys.modules", {"h2": None}):
+            assert http_pool._opciones(20, 20, 30.0, 5.0, 60.0, http2=True)["http2"] is False
+        assert http_pool._opciones(20, 20, 30.0, 5.0, 60.0, http2=False)["http2"] is False
+
+    def test_invalid_pool_size(self):
+        """Test that a non-positive connection limit raises ValueError"""
+        with pytest.raises(ValueError, match="max_conexiones"):
+            cliente_http(max_conexiones=0)
+
+    def test_counts_reused_connections(self, url):
+        """Test that only the first request opens a connection and the rest reuse it"""
+        antes = http_pool.ESTADISTICAS.instantanea()
+
+        for _ in range(5):
+            assert cliente_http().get(url).text == "ok"
+
+        assert _delta(antes) == {"peticiones": 5, "conexiones_nuevas": 1}
+
+    def test_async_client_counts_connections(self, url):
+        """Test that the async client uses the same pool settings and reuse accounting"""
+        antes = http_pool.ESTADISTICAS.instantanea()
+
+        async def pedir():
+            async with cliente_http_async(read_timeout=30.0) as cliente:
+                assert cliente.timeout.read == 30.0
+                for _ in range(3):
+                    await cliente.get(url)
+
+        asyncio.run(pedir())
+
+        assert _delta(antes) == {"peticiones": 3, "conexiones_nuevas": 1}
@@ -0,0 +1,97 @@
+import os
+from datetime import datetime, timezone
+from unittest.mock import patch
+import pytest
+from src.doc_parser.hu_export import cargar_hu, exportar_hu
+from src.doc_parser.parser_hu import FiltroHU, HURepository, IterparseXMLParserStrategy
+
+
+def _rss(*titulos):
+    items = "".join(
+        f"<item><title>{t}</title><link>https://jira/browse/{t}</link><description>Descripción {t}</description></item>"
+        for t in titulos
+    )
+    return f"<rss><channel>{items}</channel></rss>"
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    """Folder with a multi-item export and a single-item export"""
+    raiz = tmp_path / "xml"
+    raiz.mkdir()
+    (raiz / "a.xml").write_text(_rss("USRNM-1", "USRNM-2", "PAGOS-1"), encoding="utf-8")
+    (raiz / "b.xml").write_text(_rss("USRNM-3"), encoding="utf-8")
+    os.utime(raiz / "b.xml", ns=(0, 1_700_000_000_000_000_000))
+    return raiz
+
+
+class TestExportarHU:
+    """Test suite for the columnar HU export"""
+
+    @pytest.fixture(autouse=True)
+    def pyarrow(self):
+        return pytest.importorskip("pyarrow")
+
+    @pytest.mark.parametrize("nombre", ["hu.parquet", "hu.arrow"])
+    def test_round_trip_with_schema(self, tmp_path, carpeta, nombre):
+        """Test that every HU is exported with its source file and mtime and loads back"""
+        destino = tmp_path / "out" / nombre
+
+        total = exportar_hu(HURepository(IterparseXMLParserStrategy()), carpeta, destino, filas_por_grupo=2)
+        df = cargar_hu(destino).sort_values("title", ignore_index=True)
+
+        assert total == 4
+        assert list(df.columns) == ["title", "link", "description", "archivo", "mtime"]
+        assert list(df["title"]) == ["PAGOS-1", "USRNM-1", "USRNM-2", "USRNM-3"]
+        assert df.loc[3, "archivo"] == str(carpeta / "b.xml")
+        assert df.loc[3, "mtime"] == datetime.fromtimestamp(1_700_000_000, tz=timezone.utc)
+        assert not (tmp_path / "out" / f"{nombre}.tmp").exists()
+
+    def test_row_groups_and_filter(self, tmp_path, carpeta):
+        """Test that rows are written in groups of filas_por_grupo and the filter is applied"""
+        import pyarrow.parquet as pq
+        destino = tmp_path / "hu.parquet"
+
+        total = exportar_hu(
+            HURepository(IterparseXMLParserStrategy()), carpeta, destino,
+            filas_por_grupo=2, filtro=FiltroHU(proyecto="USRNM"),
+        )
+
+        assert total == 3
+        assert pq.ParquetFile(destino).metadata.num_row_groups == 2
+        assert sorted(cargar_hu(destino, columnas=["title"])["title"]) == ["USRNM-1", "USRNM-2", "USRNM-3"]
+
+    def test_empty_tree_writes_empty_file(self, tmp_path):
+        """Test that an empty folder still produces a readable file with the schema"""
+        destino = tmp_path / "hu.parquet"
+
+        assert exportar_hu(HURepository(IterparseXMLParserStrategy()), tmp_path / "nada", destino) == 0
+        assert list(cargar_hu(destino).columns) == ["title", "link", "description", "archivo", "mtime"]
+
+    def test_failure_leaves_no_partial_file(self, tmp_path, carpeta):
+        """Test that an error while exporting removes the temporary file and keeps the old export"""
+        destino = tmp_path / "hu.parquet"
+        repo = HURepository(IterparseXMLParserStrategy())
+        exportar_hu(repo, carpeta, destino)
+
+        with patch.object(repo, "iter_hu_con_origen", side_effect=RuntimeError("fallo")):
+            with pytest.raises(RuntimeError):
+                exportar_hu(repo, carpeta, destino)
+
+        assert not (tmp_path / "hu.parquet.tmp").exists()
+        assert len(cargar_hu(destino)) == 4
+
+
+class TestExportarHUValidacion:
+    """Test suite for argument validation and the optional pyarrow dependency"""
+
+    def test_unknown_format(self, tmp_path):
+        """Test that an unknown extension raises ValueError"""
+        with pytest.raises(ValueError):
+            exportar_hu(HURepository(IterparseXMLParserStrategy()), tmp_path, tmp_path / "hu.csv")
+
+    def test_missing_pyarrow(self, tmp_path):
+        """Test that a clear ImportError is raised when pyarrow is not installed"""
+        with patch.dict("sys.modules", {"pyarrow": None}):
+            with pytest.raises(ImportError, match="pip install pyarrow"):
+                exportar_hu(HURepository(IterparseXMLParserStrategy()), tmp_path, tmp_path / "hu.parquet")
@@ -0,0 +1,197 @@
+import os
+from unittest.mock import patch
+import pytest
+from src.doc_parser.hu_index import HUIndex
+from src.doc_parser.parser_hu import HURepository, IterparseXMLParserStrategy
+
+
+def _rss(titulo):
+    return (
+        f"<rss><channel><item><title>{titulo}</title><link>https://jira/{titulo}</link>"
+        f"<description>Descripción de {titulo}</description></item></channel></rss>"
+    )
+
+
+class TestHUIndex:
+    """Test suite for HUIndex class"""
+
+    @pytest.fixture
+    def carpeta(self, tmp_path):
+        """Folder with three exports"""
+        raiz = tmp_path / "xml"
+        raiz.mkdir()
+        for nombre in ("a", "b", "c"):
+            (raiz / f"{nombre}.xml").write_text(_rss(nombre), encoding="utf-8")
+        return raiz
+
+    @pytest.fixture
+    def repo(self, tmp_path):
+        """Repository backed by an on-disk index"""
+        index = HUIndex(tmp_path / "index.sqlite3")
+        yield HURepository(IterparseXMLParserStrategy(), index=index)
+        index.close()
+
+    def test_unchanged_files_are_not_reparsed(self, repo, carpeta):
+        """Test that a rescan of an unchanged tree reuses every entry"""
+        primero = repo.get_all_hu(str(carpeta))
+
+        with patch.object(repo.parser_strategy, "iter_hu", side_effect=AssertionError("no debería parsear")):
+            segundo = repo.get_all_hu(str(carpeta))
+
+        assert segundo == primero
+        assert sorted(hu["title"] for hu in segundo) == ["a", "b", "c"]
+        assert repo.index.parseados == 3
+
+    def test_changed_new_and_deleted_files(self, repo, carpeta):
+        """Test that only modified/new files are parsed and deleted files leave the index"""
+        repo.get_all_hu(str(carpeta))
+        (carpeta / "a.xml").write_text(_rss("a2"), encoding="utf-8")
+        (carpeta / "d.xml").write_text(_rss("d"), encoding="utf-8")
+        (carpeta / "c.xml").unlink()
+
+        hu_list = repo.get_all_hu(str(carpeta))
+
+        assert sorted(hu["title"] for hu in hu_list) == ["a2", "b", "d"]
+        assert repo.index.parseados == 5
+        assert len(repo.index) == 3
+
+    def test_touched_file_with_same_content_is_not_reparsed(self, repo, carpeta):
+        """Test that an mtime change alone only refreshes the stored signature"""
+        repo.get_all_hu(str(carpeta))
+        st = os.stat(carpeta / "b.xml")
+        os.utime(carpeta / "b.xml", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        repo.get_all_hu(str(carpeta))
+        vigentes, pendientes = repo.index.escanear([str(carpeta / "b.xml")])
+
+        assert repo.index.parseados == 3
+        assert pendientes == {}
+        assert [hu["title"] for hu in vigentes[str(carpeta / "b.xml")]] == ["b"]
+
+    def test_index_persists_and_prunes_only_scanned_root(self, tmp_path, carpeta):
+        """Test that the index survives reopening and pruning is limited to the scanned folder"""
+        otra = tmp_path / "otra"
+        otra.mkdir()
+        (otra / "z.xml").write_text(_rss("z"), encoding="utf-8")
+
+        index = HUIndex(tmp_path / "index.sqlite3")
+        repo = HURepository(IterparseXMLParserStrategy(), index=index)
+        repo.get_all_hu(str(carpeta))
+        repo.get_all_hu(str(otra))
+        index.close()
+
+        index = HUIndex(tmp_path / "index.sqlite3")
+        assert len(index) == 4
+        assert index.podar(otra, []) == 1
+        assert len(index) == 3
+        index.close()
+
+    def test_parallel_mode_with_index(self, repo, carpeta):
+        """Test that pending files can be parsed by the process pool"""
+        hu_list = repo.get_all_hu(str(carpeta), workers=2)
+
+        assert sorted(hu["title"] for hu in hu_list) == ["a", "b", "c"]
+        assert len(repo.index) == 3
+
+    def test_multi_item_files_and_legacy_rows(self, repo, carpeta):
+        """Test that every item of a file is cached and single-HU rows from older indexes still load"""
+        (carpeta / "varias.xml").write_text(
+            "<rss><channel>"
+            + "".join(f"<item><title>v{i}</title><link>l</link><description>d</description></item>" for i in range(3))
+            + "</channel></rss>",
+            encoding="utf-8",
+        )
+        primero = repo.get_all_hu(str(carpeta))
+        repo.index._conn.execute(
+            "UPDATE archivos SET hu = ? WHERE ruta = ?",
+            ('{"title": "a", "link": "https://jira/a", "description": "Descripción de a"}', os.path.abspath(carpeta / "a.xml")),
+        )
+
+        segundo = repo.get_all_hu(str(carpeta))
+
+        assert sorted(hu["title"] for hu in primero) == ["a", "b", "c", "v0", "v1", "v2"]
+        assert segundo == primero
+        assert repo.index.parseados == 4
+
+
+class TestHUSearch:
+    """Test suite for BM25 search over the HU index"""
+
+    @pytest.fixture
+    def carpeta(self, tmp_path):
+        """Folder with a few stories about login and payments"""
+        raiz = tmp_path / "xml"
+        raiz.mkdir()
+        historias = {
+            "login": ("Iniciar sesión", "<p>Como usuario quiero iniciar sesión con mi contraseña</p>"),
+            "pago": ("Pagar con tarjeta", "<p>Como cliente quiero pagar el pedido</p>"),
+            "factura": ("Descargar factura", "<p>Tras el pago con tarjeta se genera la factura</p>"),
+        }
+        # Relleno para que los términos buscados sean poco frecuentes, como en un índice real
+        for i in range(5):
+            historias[f"otra{i}"] = (f"Historia {i}", f"<p>Como administrador quiero gestionar el catálogo {i}</p>")
+        for nombre, (titulo, descripcion) in historias.items():
+            (raiz / f"{nombre}.xml").write_text(
+                f"<rss><channel><item><title>{titulo}</title><link>https://jira/{nombre}</link>"
+                f"<description>{descripcion.replace('<', '&lt;').replace('>', '&gt;')}</description></item></channel></rss>",
+                encoding="utf-8",
+            )
+        return raiz
+
+    @pytest.fixture
+    def repo(self, tmp_path, carpeta):
+        """Repository with the folder already indexed"""
+        index = HUIndex(tmp_path / "index.sqlite3")
+        repo = HURepository(IterparseXMLParserStrategy(), index=index)
+        repo.get_all_hu(str(carpeta))
+        yield repo
+        index.close()
+
+    def test_ranking_prefers_title_matches(self, repo):
+        """Test that BM25 ranks a title match above a description-only match"""
+        resultados = repo.search("tarjeta", k=10)
+
+        assert [hu["title"] for hu in resultados] == ["Pagar con tarjeta", "Descargar factura"]
+        assert resultados[0]["score"] > resultados[1]["score"] > 0
+        assert resultados[0]["link"] == "https://jira/pago"
+        assert resultados[0]["archivo"].endswith("pago.xml")
+
+    def test_accents_case_markup_and_limit(self, repo):
+        """Test accent/case folding, that HTML tags are not indexed and that k limits results"""
+        assert [hu["title"] for hu in repo.search("INICIAR SESION")] == ["Iniciar sesión"]
+        assert repo.search("p") == []
+        assert len(repo.search("quiero", k=1)) == 1
+        # "como" está en todas las HU: sin IDF no hay orden, pero sí coincidencias
+        assert len(repo.search("Como", k=3)) == 3
+        assert repo.search("  ¿?  ") == []
+
+    def test_index_follows_file_changes(self, repo, carpeta):
+        """Test that modified and deleted files are reflected in search results"""
+        (carpeta / "login.xml").write_text(
+            "<rss><channel><item><title>Cerrar sesión</title><link>l</link><description>Salir</description></item></channel></rss>",
+            encoding="utf-8",
+        )
+        (carpeta / "pago.xml").unlink()
+
+        repo.get_all_hu(str(carpeta))
+
+        assert [hu["title"] for hu in repo.search("sesión")] == ["Cerrar sesión"]
+        assert [hu["title"] for hu in repo.search("tarjeta")] == ["Descargar factura"]
+
+    def test_search_index_is_rebuilt_for_older_databases(self, tmp_path, repo):
+        """Test that an index created before search existed is backfilled on open"""
+        repo.index._conn.execute("DROP TABLE hu_texto")
+        repo.index._conn.execute("DROP TABLE hus")
+        repo.index._conn.commit()
+        repo.index.close()
+
+        index = HUIndex(tmp_path / "index.sqlite3")
+        try:
+            assert [hu["title"] for hu in index.buscar("factura")] == ["Descargar factura"]
+        finally:
+            index.close()
+
+    def test_search_requires_index(self):
+        """Test that searching a repository without index raises ValueError"""
+        with pytest.raises(ValueError):
+            HURepository(IterparseXMLParserStrategy()).search("pago")
@@ -0,0 +1,36 @@
+from pathlib import Path
+from src.redactionAssitant.import_benchmark import formatear_tabla, medir_importacion, parsear_importtime
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+
+class TestImportBenchmark:
+    """Test suite for the cold-start import benchmark"""
+
+    def test_parsear_importtime(self):
+        """Test parsing cumulative times from -X importtime output"""
+        salida = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   xmltodict\n"
+            "import time:       300 |        420 | src.doc_parser.parser_hu\n"
+        )
+
+        assert parsear_importtime(salida) == {"xmltodict": 120, "src.doc_parser.parser_hu": 420}
+
+    def test_entry_points_do_not_import_heavy_dependencies(self):
+        """Test that importing the CLI modules loads neither openai, pandas, bs4 nor xmltodict"""
+        for modulo in ("src.redactionAssitant.main", "src.main", "src.doc_parser.parser_hu"):
+            resultado = medir_importacion(modulo, repeticiones=1, cwd=RAIZ)
+            assert resultado["pesados"] == {}, modulo
+            assert resultado["import_ms"] > 0
+
+    def test_formatear_tabla_with_before_column(self):
+        """Test the comparison table includes the previous revision when measured"""
+        despues = [{"modulo": "src.main", "import_ms": 20.0, "arranque_ms": 70.0, "pesados": {}}]
+        antes = [{"modulo": "src.main", "import_ms": 350.0, "arranque_ms": 400.0, "pesados": {"pandas": 300.0}}]
+
+        tabla = formatear_tabla(despues, antes)
+
+        cabecera, fila = tabla.splitlines()
+        assert cabecera.split() == ["modulo", "antes_ms", "import_ms", "arranque_ms", "pesados"]
+        assert fila.split() == ["src.main", "350.0", "20.0", "70.0", "-"]
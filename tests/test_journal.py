@@ -0,0 +1,53 @@
+import json
+from src.redactionAssitant.journal import RunJournal
+
+
+class TestRunJournal:
+    """Test suite for RunJournal class"""
+
+    def test_records_are_appended_immediately(self, tmp_path):
+        """Test that each batch is written to disk as soon as it is recorded"""
+        path = tmp_path / "journal.jsonl"
+        journal = RunJournal(path, "huella")
+
+        journal.registrar("cps", ["USRNM001 Caso"], "USRNM001 Corregido", base="HU")
+
+        entradas = [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+        assert len(entradas) == 1
+        assert entradas[0]["run"] == journal.run_id
+        assert entradas[0]["huella"] == "huella"
+        assert entradas[0]["salida"] == "USRNM001 Corregido"
+
+    def test_resume_recovers_batches_with_same_fingerprint(self, tmp_path):
+        """Test that a resumed run only sees batches recorded for the same input"""
+        path = tmp_path / "journal.jsonl"
+        RunJournal(path, "huella").registrar("cps", ["USRNM001 Caso"], "salida", base="HU")
+        RunJournal(path, "otra", reanudar=True).registrar("cps", ["USRNM002 Caso"], "otra salida")
+
+        journal = RunJournal(path, "huella", reanudar=True)
+
+        assert journal.obtener("cps", ["USRNM001 Caso"], base="HU") == "salida"
+        assert journal.obtener("cps", ["USRNM001 Caso"], base="Otra HU") is None
+        assert journal.obtener("cps", ["USRNM002 Caso"]) is None
+        assert journal.recuperados == 1
+
+    def test_new_run_starts_empty(self, tmp_path):
+        """Test that a run without resume discards the previous journal"""
+        path = tmp_path / "journal.jsonl"
+        RunJournal(path, "huella").registrar("exp", ["par"], "salida")
+
+        journal = RunJournal(path, "huella")
+
+        assert len(journal) == 0
+        assert path.read_text(encoding="utf-8") == ""
+
+    def test_truncated_last_line_is_ignored(self, tmp_path):
+        """Test that a partially written line from a crash does not break resume"""
+        path = tmp_path / "journal.jsonl"
+        RunJournal(path, "huella").registrar("exp", ["par"], "salida")
+        with path.open("a", encoding="utf-8") as f:
+            f.write('{"run": "x", "huel')
+
+        journal = RunJournal(path, "huella", reanudar=True)
+
+        assert journal.obtener("exp", ["par"]) == "salida"
@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
-from src.redactionAssitant.main import main, process_flow
+from unittest.mock import AsyncMock
+from src.redactionAssitant.main import main, process_flow, aprocess_flow, process_flow_streaming
 
 
 class TestMain:
@@ -47,6 +48,19 @@ class TestMain:
         )
         mock_logging.info.assert_called_with("Feedback resumido:\n%s", "CPS feedback\n\nEXP feedback")
 
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.get_data')
+    def test_skip_policy_requires_stream_files(self, mock_get_data, mock_config_class):
+        """Test that the in-memory flows reject LLM_BATCH_ERROR_POLICY=omitir before reading any input"""
+        mock_config_class.return_value.batch_error_policy = "omitir"
+
+        with pytest.raises(ValueError, match="--stream-files"):
+            process_flow()
+        with pytest.raises(ValueError, match="--stream-files"):
+            import asyncio
+            asyncio.run(aprocess_flow())
+        mock_get_data.assert_not_called()
+
     @patch('src.redactionAssitant.main.Config')
     @patch('src.redactionAssitant.main.get_data')
     @patch('src.redactionAssitant.main.Processor')
@@ -83,4 +97,182 @@ class TestMain:
         result = main()
 
         assert result == 1
-        mock_logging.exception.assert_called_with("Se produjo un error en el flujo principal.")
\ No newline at end of file
+        mock_logging.exception.assert_called_with("Se produjo un error en el flujo principal.")
+
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.get_data')
+    @patch('src.redactionAssitant.main.Processor')
+    @patch('src.redactionAssitant.main.save_data')
+    def test_aprocess_flow_success(self, mock_save_data, mock_processor_class,
+                                   mock_get_data, mock_config_class):
+        """Test the async process flow uses the async Processor API"""
+        import asyncio
+
+        mock_config = MagicMock()
+        mock_config_class.return_value = mock_config
+        mock_config.all_output_paths.return_value = (Path("c"), Path("e"), Path("f"))
+        mock_get_data.return_value = ("HU text", "CPS text", "EXP text")
+
+        mock_processor = MagicMock()
+        mock_processor.acps_corregidas = AsyncMock(return_value=("corrected CPS", "CPS feedback"))
+        mock_processor.aexp_corregidos = AsyncMock(return_value=("corrected EXP", ""))
+        mock_processor.aclose = AsyncMock()
+        mock_processor_class.return_value = mock_processor
+
+        asyncio.run(aprocess_flow())
+
+        mock_processor.aexp_corregidos.assert_awaited_once_with("HU text", "corrected CPS", "EXP text")
+        mock_processor.aclose.assert_awaited_once()
+        mock_save_data.assert_called_once_with(
+            "corrected CPS", "corrected EXP", "CPS feedback", Path("c"), Path("e"), Path("f")
+        )
+
+    @patch('src.redactionAssitant.main.aprocess_flow', new_callable=AsyncMock)
+    @patch('src.redactionAssitant.main.process_flow')
+    @patch('src.redactionAssitant.main.logging')
+    def test_main_async_flag(self, mock_logging, mock_process_flow, mock_aprocess_flow):
+        """Test --async selects the async flow"""
+        assert main(["--async"]) == 0
+        mock_aprocess_flow.assert_awaited_once()
+        mock_process_flow.assert_not_called()
+
+
+    @patch('src.redactionAssitant.main.process_flow')
+    @patch('src.redactionAssitant.main.logging')
+    def test_main_stream_flag(self, mock_logging, mock_process_flow):
+        """Test --stream is forwarded to the flow"""
+        assert main(["--stream"]) == 0
+        mock_process_flow.assert_called_once_with(stream=True, pipeline=False, incremental=False, full_rebuild=False, resume=False, profile=False)
+
+    @patch('src.redactionAssitant.main.process_flow_streaming')
+    @patch('src.redactionAssitant.main.process_flow')
+    @patch('src.redactionAssitant.main.logging')
+    def test_main_stream_files_flag(self, mock_logging, mock_process_flow, mock_streaming):
+        """Test --stream-files selects the bounded-memory flow"""
+        assert main(["--stream-files", "--stream"]) == 0
+        mock_streaming.assert_called_once_with(stream=True, profile=False)
+        mock_process_flow.assert_not_called()
+
+    @pytest.mark.parametrize("flag", ["--async", "--incremental", "--full-rebuild", "--resume"])
+    def test_main_stream_files_incompatible_flags(self, flag):
+        """Test --stream-files rejects flags that need the whole input in memory"""
+        with pytest.raises(SystemExit):
+            main(["--stream-files", flag])
+
+    @pytest.mark.parametrize("flag", ["--stream", "--pipeline", "--incremental", "--full-rebuild", "--resume"])
+    @patch('src.redactionAssitant.main.aprocess_flow')
+    def test_main_async_incompatible_flags(self, mock_aprocess_flow, flag):
+        """Test --async rejects flags that only the synchronous flow implements"""
+        with pytest.raises(SystemExit):
+            main(["--async", flag])
+        mock_aprocess_flow.assert_not_called()
+
+    @patch('src.redactionAssitant.main.process_flow')
+    @patch('src.redactionAssitant.main.logging')
+    def test_main_resume_flag(self, mock_logging, mock_process_flow):
+        """Test --resume is forwarded to the flow"""
+        assert main(["--resume"]) == 0
+        mock_process_flow.assert_called_once_with(stream=False, pipeline=False, incremental=False, full_rebuild=False, resume=True, profile=False)
+
+    @patch('src.redactionAssitant.main.process_flow')
+    @patch('src.redactionAssitant.main.logging')
+    def test_main_full_rebuild_flag(self, mock_logging, mock_process_flow):
+        """Test --full-rebuild is forwarded to the flow"""
+        assert main(["--full-rebuild"]) == 0
+        mock_process_flow.assert_called_once_with(stream=False, pipeline=False, incremental=False, full_rebuild=True, resume=False, profile=False)
+
+
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.get_data')
+    @patch('src.redactionAssitant.main.Processor')
+    @patch('src.redactionAssitant.main.save_data')
+    def test_process_flow_pipeline(self, mock_save_data, mock_processor_class, mock_get_data, mock_config_class):
+        """Test that pipeline mode uses Processor.procesar_pipeline"""
+        mock_config = MagicMock()
+        mock_config_class.return_value = mock_config
+        mock_config.all_output_paths.return_value = (Path("c"), Path("e"), Path("f"))
+        mock_get_data.return_value = ("HU", "CPS", "EXP")
+        mock_processor = mock_processor_class.return_value
+        mock_processor.procesar_pipeline.return_value = ("new CPS", "fb1", "new EXP", "fb2")
+
+        process_flow(pipeline=True)
+
+        mock_processor.procesar_pipeline.assert_called_once_with("HU", "CPS", "EXP")
+        mock_processor.cps_corregidas.assert_not_called()
+        mock_save_data.assert_called_once_with("new CPS", "new EXP", "fb1\n\nfb2", Path("c"), Path("e"), Path("f"))
+
+
+    @patch('src.redactionAssitant.main.Manifest')
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.get_data')
+    @patch('src.redactionAssitant.main.Processor')
+    @patch('src.redactionAssitant.main.save_data')
+    def test_process_flow_incremental(self, mock_save_data, mock_processor_class, mock_get_data,
+                                      mock_config_class, mock_manifest_class):
+        """Test that incremental mode loads the manifest and uses Processor.procesar_incremental"""
+        mock_config = MagicMock()
+        mock_config_class.return_value = mock_config
+        mock_config.all_output_paths.return_value = (Path("c"), Path("e"), Path("f"))
+        mock_get_data.return_value = ("HU", "CPS", "EXP")
+        mock_processor = mock_processor_class.return_value
+        mock_processor.procesar_incremental.return_value = ("new CPS", "fb1", "new EXP", "")
+
+        process_flow(incremental=True)
+
+        mock_manifest_class.assert_called_once_with(mock_config.manifest_path)
+        mock_processor.iniciar_journal.assert_called_once_with("HU", "CPS", "EXP", reanudar=False)
+        mock_processor.procesar_incremental.assert_called_once_with(
+            "HU", "CPS", "EXP", mock_manifest_class.return_value, forzar=False, pipeline=False
+        )
+        mock_processor.cps_corregidas.assert_not_called()
+        mock_save_data.assert_called_once_with("new CPS", "new EXP", "fb1", Path("c"), Path("e"), Path("f"))
+
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.get_data')
+    @patch('src.redactionAssitant.main.Processor')
+    @patch('src.redactionAssitant.main.save_data')
+    def test_process_flow_profile(self, mock_save_data, mock_processor_class, mock_get_data,
+                                  mock_config_class, tmp_path):
+        """Test that --profile attaches the profiler and writes per-stage profiles"""
+        mock_config = MagicMock()
+        mock_config_class.return_value = mock_config
+        mock_config.all_output_paths.return_value = (Path("c"), Path("e"), Path("f"))
+        mock_config.profile_dir = tmp_path
+        mock_get_data.return_value = ("HU", "CPS", "EXP")
+        mock_processor = mock_processor_class.return_value
+        mock_processor.cps_corregidas.return_value = ("new CPS", "fb1")
+        mock_processor.exp_corregidos.return_value = ("new EXP", "fb2")
+
+        process_flow(profile=True)
+
+        assert mock_processor.profiler.activo is True
+        assert (tmp_path / "carga.prof").exists()
+        assert (tmp_path / "guardado.prof").exists()
+        assert "carga" in (tmp_path / "resumen.txt").read_text(encoding="utf-8")
+
+    @patch('src.redactionAssitant.main.Config')
+    @patch('src.redactionAssitant.main.Processor')
+    def test_process_flow_streaming(self, mock_processor_class, mock_config_class, tmp_path):
+        """Test that the streaming flow writes outputs batch by batch and the feedback at the end"""
+        for nombre, texto in (("hus", "HU"), ("cps", "C1\nC2"), ("exp", "E1\nE2")):
+            (tmp_path / f"{nombre}.txt").write_text(texto, encoding="utf-8")
+        mock_config = MagicMock()
+        mock_config_class.return_value = mock_config
+        mock_config.input_path.side_effect = lambda key: tmp_path / f"{key}.txt"
+        mock_config.all_output_paths.return_value = (tmp_path / "c", tmp_path / "e", tmp_path / "f")
+
+        def procesar(hu, cps, exp, escribir):
+            for cp, ex in zip(cps, exp):
+                escribir([cp + " ok"], [ex + " ok"])
+            return "fb1", "fb2"
+
+        mock_processor = mock_processor_class.return_value
+        mock_processor.procesar_streaming.side_effect = procesar
+
+        process_flow_streaming()
+
+        assert (tmp_path / "c").read_text(encoding="utf-8") == "C1 ok\nC2 ok"
+        assert (tmp_path / "e").read_text(encoding="utf-8") == "E1 ok\nE2 ok"
+        assert (tmp_path / "f").read_text(encoding="utf-8") == "fb1\n\nfb2"
+        mock_processor.exportar_metricas.assert_called_once()
+        mock_processor.iniciar_journal.assert_not_called()
@@ -0,0 +1,47 @@
+import json
+from src.redactionAssitant.manifest import Manifest
+
+
+class TestManifest:
+    """Test suite for Manifest class"""
+
+    def test_key_depends_on_hu_cp_and_exp(self):
+        """Test that any change in HU, CP or EXP changes the key"""
+        base = Manifest.clave("HU", "USRNM001 Caso", "Resultado")
+
+        assert base == Manifest.clave("HU", "USRNM001 Caso", "Resultado")
+        assert base != Manifest.clave("HU 2", "USRNM001 Caso", "Resultado")
+        assert base != Manifest.clave("HU", "USRNM001 Caso 2", "Resultado")
+        assert base != Manifest.clave("HU", "USRNM001 Caso", "Resultado 2")
+
+    def test_roundtrip_between_instances(self, tmp_path):
+        """Test that registered lines persist between instances"""
+        path = tmp_path / "manifest.json"
+        manifest = Manifest(path)
+        manifest.registrar("k1", "USRNM001 Corregido", "Resultado corregido")
+        manifest.guardar()
+
+        reloaded = Manifest(path)
+        assert len(reloaded) == 1
+        assert reloaded.obtener("k1") == {"cp": "USRNM001 Corregido", "exp": "Resultado corregido"}
+        assert reloaded.obtener("k2") is None
+
+    def test_save_prunes_stale_keys(self, tmp_path):
+        """Test that lines no longer present in the input are dropped on save"""
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.registrar("k1", "cp1", "exp1")
+        manifest.registrar("k2", "cp2", "exp2")
+
+        manifest.guardar(["k2"])
+
+        assert Manifest(tmp_path / "manifest.json").obtener("k1") is None
+        assert len(Manifest(tmp_path / "manifest.json")) == 1
+
+    def test_unreadable_file_starts_empty(self, tmp_path):
+        """Test that a corrupt or foreign manifest is ignored instead of failing"""
+        path = tmp_path / "manifest.json"
+        path.write_text("{no es json", encoding="utf-8")
+        assert len(Manifest(path)) == 0
+
+        path.write_text(json.dumps({"version": 99, "lineas": {"k": {}}}), encoding="utf-8")
+        assert len(Manifest(path)) == 0
@@ -0,0 +1,67 @@
+import pytest
+import openai
+from openai import OpenAI
+from src.redactionAssitant.builder import Builder
+from src.redactionAssitant.mock_server import Latencia, MockLLMServer, generar_respuesta
+
+
+class TestMockLLMServer:
+    """Test suite for the local OpenAI-compatible mock server"""
+
+    @pytest.fixture
+    def server(self):
+        """Fixture for a running mock server without latency"""
+        with MockLLMServer(semilla=0) as server:
+            yield server
+
+    @pytest.fixture
+    def builder(self, server):
+        """Fixture for a real Builder talking to the mock server"""
+        return Builder(OpenAI(api_key="test", base_url=server.url, max_retries=0))
+
+    def test_ortografia_follows_obs_cp_format(self, builder, server):
+        """Test that spelling requests get one OBS/CP line per test case"""
+        result = builder.corregir_ortografia("HU", ["USRNM001 Caso uno", "USRNM002 Caso dos"])
+
+        assert result.splitlines() == [
+            "OBS[1]: sin cambios, CP: USRNM001 Caso uno",
+            "OBS[2]: sin cambios, CP: USRNM002 Caso dos",
+        ]
+        assert server.estadisticas()["peticiones"] == 1
+
+    def test_expect_result_stream(self, builder):
+        """Test that streaming responses are parsed line by line with usage"""
+        usos = []
+        builder.on_usage = lambda operacion, registro: usos.append(registro)
+
+        lineas = list(builder.corregir_expect_result_stream("USRNM001 Caso | el sistema responde"))
+
+        assert lineas == ["ExpRes1: El sistema responde", "OBS: Se aplicó mayúscula inicial."]
+        assert usos[0]["completion_tokens"] > 0
+        assert usos[0]["finish_reason"] == "stop"
+
+    def test_injected_429_carries_retry_after(self):
+        """Test that 429 injection returns a rate limit error with retry-after-ms"""
+        with MockLLMServer(tasa_429=1.0, retry_after_ms=20) as server:
+            client = OpenAI(api_key="test", base_url=server.url, max_retries=0)
+            with pytest.raises(openai.RateLimitError) as exc:
+                client.chat.completions.create(model="m", messages=[{"role": "user", "content": "hola"}])
+
+        assert exc.value.response.headers["retry-after-ms"] == "20"
+        assert server.estadisticas()["errores_429"] == 1
+
+    def test_latency_distributions(self):
+        """Test that every latency distribution samples non-negative values around its mean"""
+        import random
+        rng = random.Random(0)
+        for tipo in ("fija", "uniforme", "exponencial", "lognormal"):
+            muestras = [Latencia(tipo, media=0.1).muestrear(rng) for _ in range(2000)]
+            assert min(muestras) >= 0
+            assert 0.08 < sum(muestras) / len(muestras) < 0.12
+
+        with pytest.raises(ValueError):
+            Latencia("normal")
+
+    def test_feedback_response_is_plain_text(self):
+        """Test that non-correction prompts get a plain feedback text"""
+        assert "OBS" not in generar_respuesta([{"role": "user", "content": "Aquí tienes las observaciones"}])
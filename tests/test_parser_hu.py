@@ -0,0 +1,250 @@
+import pytest
+from unittest.mock import patch
+from pathlib import Path
+from src.doc_parser.parser_hu import (
+    BasicXMLParserStrategy,
+    FiltroHU,
+    HURepository,
+    IterparseXMLParserStrategy,
+    dividir_exportacion,
+    get_clean_hu_dict,
+    get_hu_dict_from_xml_file,
+    get_hu_dicts_from_xml_file,
+)
+
+RSS_UNA_HU = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="0.92">
+  <channel>
+    <title>Jira</title>
+    <link>https://jira.example.com</link>
+    <image><title>logo</title><link>https://jira.example.com/logo.png</link></image>
+    <item>
+      <title>[USRNM-1] Iniciar sesión</title>
+      <link>https://jira.example.com/browse/USRNM-1</link>
+      <description>&lt;p&gt;Como usuario quiero iniciar sesión&lt;/p&gt;</description>
+      <key id="1">USRNM-1</key>
+      <comments><comment id="10">Comentario</comment></comments>
+    </item>
+  </channel>
+</rss>
+"""
+
+
+def _rss_con_items(n):
+    items = "".join(
+        f"<item><title>HU {i}</title><link>https://jira/browse/USRNM-{i}</link>"
+        f"<description>Descripción {i}</description></item>"
+        for i in range(n)
+    )
+    return f'<rss version="0.92"><channel><title>Jira</title>{items}</channel></rss>'
+
+
+class TestIterparseXMLParserStrategy:
+    """Test suite for IterparseXMLParserStrategy"""
+
+    def test_same_clean_result_as_basic_strategy(self, tmp_path):
+        """Test that the streaming parser yields the same HU fields as the basic parser"""
+        archivo = tmp_path / "export.xml"
+        archivo.write_text(RSS_UNA_HU, encoding="utf-8")
+
+        basico = BasicXMLParserStrategy().parse(str(archivo))
+        streaming = IterparseXMLParserStrategy().parse(str(archivo))
+
+        esperado = get_clean_hu_dict(basico["rss"]["channel"]["item"])
+        assert get_clean_hu_dict(streaming["rss"]["channel"]["item"]) == esperado
+        assert esperado["title"] == "[USRNM-1] Iniciar sesión"
+        assert esperado["description"] == "<p>Como usuario quiero iniciar sesión</p>"
+
+    def test_multiple_items_are_returned_as_list(self, tmp_path):
+        """Test that a channel with several items returns them all, in order"""
+        archivo = tmp_path / "export.xml"
+        archivo.write_text(_rss_con_items(3), encoding="utf-8")
+
+        items = IterparseXMLParserStrategy().parse(str(archivo))["rss"]["channel"]["item"]
+
+        assert [item["title"] for item in items] == ["HU 0", "HU 1", "HU 2"]
+        assert items[2] == {"title": "HU 2", "link": "https://jira/browse/USRNM-2", "description": "Descripción 2"}
+
+    def test_channel_without_items(self, tmp_path):
+        """Test that an empty channel has no item key, like xmltodict"""
+        archivo = tmp_path / "export.xml"
+        archivo.write_text(_rss_con_items(0), encoding="utf-8")
+
+        resultado = IterparseXMLParserStrategy().parse(str(archivo))
+
+        assert resultado == {"rss": {"channel": {}}}
+        with pytest.raises(KeyError):
+            resultado["rss"]["channel"]["item"]
+
+    def test_repository_with_iterparse_strategy(self, tmp_path):
+        """Test HURepository end to end with the streaming strategy"""
+        (tmp_path / "export.xml").write_text(RSS_UNA_HU, encoding="utf-8")
+
+        hu_list = HURepository(IterparseXMLParserStrategy()).get_all_hu(str(tmp_path))
+
+        assert hu_list == [{
+            "title": "[USRNM-1] Iniciar sesión",
+            "link": "https://jira.example.com/browse/USRNM-1",
+            "description": "<p>Como usuario quiero iniciar sesión</p>",
+        }]
+
+
+class TestHURepository:
+    """Test suite for HURepository"""
+
+    @pytest.fixture
+    def carpeta(self, tmp_path):
+        """Folder with several single-HU exports in nested directories"""
+        for i in range(7):
+            subcarpeta = tmp_path / f"lote{i % 2}"
+            subcarpeta.mkdir(exist_ok=True)
+            (subcarpeta / f"hu{i}.xml").write_text(_rss_con_items(1).replace("HU 0", f"HU {i}"), encoding="utf-8")
+        return tmp_path
+
+    def test_parallel_matches_sequential_order(self, carpeta):
+        """Test that the process pool returns the same HUs in the same order"""
+        repo = HURepository(IterparseXMLParserStrategy())
+
+        secuencial = repo.get_all_hu(str(carpeta))
+        paralelo = repo.get_all_hu(str(carpeta), workers=2, chunksize=2)
+
+        assert paralelo == secuencial
+        assert len(paralelo) == 7
+        assert repo.errores == []
+
+    def test_parallel_unordered_returns_all(self, carpeta):
+        """Test unordered delivery returns every HU"""
+        repo = HURepository(BasicXMLParserStrategy())
+
+        hu_list = repo.get_all_hu(str(carpeta), workers=2, chunksize=1, ordenado=False)
+
+        assert sorted(hu["title"] for hu in hu_list) == [f"HU {i}" for i in range(7)]
+
+    def test_parallel_collects_per_file_errors(self, carpeta):
+        """Test that broken files are reported without aborting the scan"""
+        (carpeta / "roto.xml").write_text("<rss><channel><item>", encoding="utf-8")
+        (carpeta / "vacio.xml").write_text(_rss_con_items(0), encoding="utf-8")
+        repo = HURepository(IterparseXMLParserStrategy())
+
+        hu_list = repo.get_all_hu(str(carpeta), workers=2)
+
+        assert len(hu_list) == 7
+        assert [Path(e["archivo"]).name for e in repo.errores] == ["roto.xml"]
+        assert repo.errores[0]["error"].startswith("XMLSyntaxError")
+
+
+class TestIterHU:
+    """Test suite for HURepository.iter_hu and FiltroHU"""
+
+    RSS_VARIAS = """<rss version="0.92"><channel><title>Jira</title>
+      <item><title>[USRNM-1] Iniciar sesión</title><link>https://jira/browse/USRNM-1</link>
+        <description>Login</description><key id="1">USRNM-1</key></item>
+      <item><title>[PAGOS-7] Pagar con tarjeta</title><link>https://jira/browse/PAGOS-7</link>
+        <description>Pago</description><key id="2">PAGOS-7</key></item>
+      <item><title>Cerrar sesión</title><link>https://jira/browse/USRNM-2</link>
+        <description>Logout</description></item>
+    </channel></rss>"""
+
+    @pytest.mark.parametrize("estrategia", [IterparseXMLParserStrategy, BasicXMLParserStrategy])
+    def test_iter_hu_yields_every_item_and_filters(self, tmp_path, estrategia):
+        """Test lazy iteration over all items with project and title filters"""
+        (tmp_path / "export.xml").write_text(self.RSS_VARIAS, encoding="utf-8")
+        repo = HURepository(estrategia())
+
+        todas = [hu["title"] for hu in repo.iter_hu(str(tmp_path))]
+        usrnm = [hu["title"] for hu in repo.iter_hu(str(tmp_path), FiltroHU(proyecto="usrnm"))]
+        tarjeta = list(repo.iter_hu(str(tmp_path), FiltroHU(titulo="TARJETA")))
+
+        assert todas == ["[USRNM-1] Iniciar sesión", "[PAGOS-7] Pagar con tarjeta", "Cerrar sesión"]
+        assert usrnm == ["[USRNM-1] Iniciar sesión", "Cerrar sesión"]
+        assert tarjeta == [{"title": "[PAGOS-7] Pagar con tarjeta", "link": "https://jira/browse/PAGOS-7", "description": "Pago"}]
+
+    def test_iter_hu_is_lazy(self, tmp_path):
+        """Test that the first HU is yielded before the rest of the tree is parsed"""
+        for i in range(3):
+            (tmp_path / f"hu{i}.xml").write_text(_rss_con_items(1), encoding="utf-8")
+        estrategia = IterparseXMLParserStrategy()
+        repo = HURepository(estrategia)
+
+        with patch.object(estrategia, "iter_hu", wraps=estrategia.iter_hu) as espia:
+            primera = next(repo.iter_hu(str(tmp_path)))
+
+        assert primera["title"] == "HU 0"
+        assert espia.call_count == 1
+
+    def test_iter_hu_skips_broken_files(self, tmp_path):
+        """Test that a broken file is recorded and iteration continues"""
+        (tmp_path / "a.xml").write_text("<rss><channel><item>", encoding="utf-8")
+        (tmp_path / "b.xml").write_text(_rss_con_items(2), encoding="utf-8")
+        repo = HURepository(IterparseXMLParserStrategy())
+
+        hu_list = list(repo.iter_hu(str(tmp_path)))
+
+        assert [hu["title"] for hu in hu_list] == ["HU 0", "HU 1"]
+        assert [Path(e["archivo"]).name for e in repo.errores] == ["a.xml"]
+
+
+class TestMultiItemExports:
+    """Test suite for exports with many items per channel"""
+
+    @pytest.mark.parametrize("estrategia", [IterparseXMLParserStrategy, BasicXMLParserStrategy])
+    def test_get_all_hu_returns_every_item_of_every_file(self, tmp_path, estrategia):
+        """Test that multi-item, single-item and empty channels are all supported"""
+        (tmp_path / "a.xml").write_text(_rss_con_items(3), encoding="utf-8")
+        (tmp_path / "b.xml").write_text(_rss_con_items(1), encoding="utf-8")
+        (tmp_path / "c.xml").write_text(_rss_con_items(0), encoding="utf-8")
+        repo = HURepository(estrategia())
+
+        secuencial = repo.get_all_hu(str(tmp_path))
+        paralelo = repo.get_all_hu(str(tmp_path), workers=2, chunksize=1)
+
+        assert sorted(hu["title"] for hu in secuencial) == ["HU 0", "HU 0", "HU 1", "HU 2"]
+        assert paralelo == secuencial
+        assert repo.errores == []
+
+    def test_get_hu_dicts_from_xml_file(self, tmp_path):
+        """Test that the raw helpers normalise one or many items"""
+        varias = tmp_path / "varias.xml"
+        varias.write_text(_rss_con_items(2), encoding="utf-8")
+        una = tmp_path / "una.xml"
+        una.write_text(_rss_con_items(1), encoding="utf-8")
+
+        assert [hu["title"] for hu in get_hu_dicts_from_xml_file(str(varias))] == ["HU 0", "HU 1"]
+        assert [hu["title"] for hu in get_hu_dicts_from_xml_file(str(una))] == ["HU 0"]
+        assert get_hu_dict_from_xml_file(str(varias))["title"] == "HU 0"
+
+    def test_dividir_exportacion_writes_one_file_per_item(self, tmp_path):
+        """Test that a bulk export is split into single-HU files named by Jira key"""
+        export = tmp_path / "export.xml"
+        export.write_text(TestIterHU.RSS_VARIAS, encoding="utf-8")
+        destino = tmp_path / "hu"
+
+        escritos = dividir_exportacion(str(export), str(destino))
+
+        assert [Path(a).name for a in escritos] == ["USRNM-1.xml", "PAGOS-7.xml", "export-3.xml"]
+        hu_list = HURepository(BasicXMLParserStrategy()).get_all_hu(str(destino))
+        assert sorted(hu["title"] for hu in hu_list) == ["Cerrar sesión", "[PAGOS-7] Pagar con tarjeta", "[USRNM-1] Iniciar sesión"]
+
+    def test_dividir_exportacion_does_not_overwrite_duplicate_keys(self, tmp_path):
+        """Test that repeated or colliding keys get a suffix instead of overwriting each other"""
+        items = "".join(
+            f"<item><title>HU {i}</title><key>{clave}</key></item>"
+            for i, clave in enumerate(["USRNM-1", "USRNM-1", "USRNM/2", "USRNM 2", "usrnm-1"])
+        )
+        export = tmp_path / "export.xml"
+        export.write_text(f'<?xml version="1.0" encoding="UTF-8"?><rss><channel>{items}</channel></rss>', encoding="utf-8")
+
+        escritos = dividir_exportacion(str(export), str(tmp_path / "hu"))
+
+        assert [Path(a).name for a in escritos] == ["USRNM-1.xml", "USRNM-1-2.xml", "USRNM_2.xml", "USRNM_2-2.xml", "usrnm-1-3.xml"]
+        titulos = [get_hu_dict_from_xml_file(a)["title"] for a in escritos]
+        assert titulos == [f"HU {i}" for i in range(5)]
+
+    def test_dividir_exportacion_with_filter(self, tmp_path):
+        """Test that only items accepted by the filter are written"""
+        export = tmp_path / "export.xml"
+        export.write_text(TestIterHU.RSS_VARIAS, encoding="utf-8")
+
+        escritos = dividir_exportacion(str(export), str(tmp_path / "hu"), FiltroHU(proyecto="PAGOS"))
+
+        assert [Path(a).name for a in escritos] == ["PAGOS-7.xml"]
@@ -1,6 +1,8 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from src.redactionAssitant.processor import Processor, cps_with_exp, preprocess_exp_or_cps
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
+from src.redactionAssitant.manifest import Manifest
+from src.redactionAssitant.processor import Processor, cps_with_exp, preprocess_exp_or_cps, _agrupar_resumenes
 
 
 class MockConfig:
@@ -47,12 +49,41 @@ class TestProcessor:
         with pytest.raises(ValueError, match="API key is required"):
             Processor(mock_config, "")
 
+    def test_clients_share_http_pool(self, mock_config):
+        """Test that every Processor builds its OpenAI client on the process-wide HTTP pool"""
+        mock_config.http_pool = {"max_conexiones": 7, "connect_timeout": 2.0}
+        with patch('src.redactionAssitant.processor.OpenAI') as mock_openai, \
+                patch('src.redactionAssitant.processor.http_pool.cliente_http') as mock_pool:
+            Processor(mock_config, "key").client.chat
+            Processor(mock_config, "key").client.chat
+
+        assert mock_pool.call_count == 2
+        mock_pool.assert_called_with(max_conexiones=7, connect_timeout=2.0)
+        for llamada in mock_openai.call_args_list:
+            assert llamada.kwargs["http_client"] is mock_pool.return_value
+            assert llamada.kwargs["max_retries"] == 0
+
     def test_init_openai_failure(self, mock_config):
-        """Test initialization failure with OpenAI client error"""
+        """Test that OpenAI client errors surface on first use (the client is created lazily)"""
         with patch('src.redactionAssitant.processor.OpenAI') as mock_openai:
             mock_openai.side_effect = Exception("Connection failed")
+            proc = Processor(mock_config, "test_key")
+            mock_openai.assert_not_called()
             with pytest.raises(Exception, match="Connection failed"):
-                Processor(mock_config, "test_key")
+                proc.client.chat
+
+    def test_init_with_cache(self, mock_config, tmp_path):
+        """Test that the response cache is created from configuration"""
+        mock_config.cache_path = tmp_path / "cache.sqlite3"
+        mock_config.cache_mode = "on"
+        mock_config.cache_max_mb = 1
+        mock_config.cache_max_age_days = 1
+        with patch('src.redactionAssitant.processor.OpenAI'):
+            proc = Processor(mock_config, "test_key")
+
+        assert proc.cache is not None
+        assert proc.builder.cache is proc.cache
+        proc.cache.close()
 
     def test_cps_corregidas_happy_path(self, processor, mock_builder):
         """Test successful correction of test cases"""
@@ -67,6 +98,669 @@ class TestProcessor:
         mock_builder.corregir_ortografia.assert_called()
         mock_builder.obtener_feedback.assert_called_once()
 
+    def test_cps_corregidas_batches_by_tokens(self, processor, mock_builder):
+        """Test that long test cases are split into more, smaller batches"""
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: "\n".join(batch)
+        processor.planners["ortografia"].token_budget = 1500
+        cps = "\n".join(f"USRNM{i:03d} caso {i}" + " paso" * 80 for i in range(20))
+
+        result, _ = processor.cps_corregidas("HU", cps)
+
+        assert result == cps
+        assert mock_builder.corregir_ortografia.call_count > 1
+        for call in mock_builder.corregir_ortografia.call_args_list:
+            assert len(call[0][1]) < 20
+
+    def test_cps_corregidas_stream_mode(self, processor, mock_builder):
+        """Test that stream mode consumes Builder lines incrementally"""
+        processor.stream = True
+        mock_builder.corregir_ortografia_stream.side_effect = lambda hu, batch: iter([
+            "OBS[1]: sin cambios, CP: USRNM001 Caso corregido",
+            "OBS[2]: tilde, CP: USRNM002 Caso corregido 2",
+        ])
+
+        result, feedback = processor.cps_corregidas("HU", "USRNM001 Caso\nUSRNM002 Caso 2")
+
+        assert result == "USRNM001 Caso corregido\nUSRNM002 Caso corregido 2"
+        assert feedback == "Feedback de corrección"
+        mock_builder.corregir_ortografia.assert_not_called()
+
+    def test_stream_delivers_results_before_batch_ends(self, processor, mock_builder):
+        """Test that each streamed case reaches al_recibir before the rest of the batch arrives"""
+        processor.stream = True
+        recibidos = []
+        processor.al_recibir = lambda etapa, resultado: recibidos.append((etapa, resultado))
+
+        def stream(hu, batch):
+            yield "OBS[1]: sin cambios, CP: USRNM001 Caso corregido"
+            assert recibidos == [("cps", "USRNM001 Caso corregido")]
+            yield "OBS[2]: tilde, CP: USRNM002 Caso corregido 2"
+
+        mock_builder.corregir_ortografia_stream.side_effect = stream
+
+        result, _ = processor.cps_corregidas("HU", "USRNM001 Caso\nUSRNM002 Caso 2")
+
+        assert result == "USRNM001 Caso corregido\nUSRNM002 Caso corregido 2"
+        assert recibidos[-1] == ("cps", "USRNM002 Caso corregido 2")
+        lote = next(s for s in processor.tracer.spans if s["nombre"] == "lote" and s["etapa"] == "cps")
+        assert lote["primer_resultado_s"] >= 0
+
+    def test_stream_aborts_off_format_batch(self, processor, mock_builder):
+        """Test that a stream going off-format is closed early"""
+        processor.stream = True
+        consumed = []
+
+        def off_format(batch):
+            try:
+                for i in range(100):
+                    consumed.append(i)
+                    yield f"texto libre {i}"
+            finally:
+                consumed.append("closed")
+
+        mock_builder.corregir_expect_result_stream.side_effect = off_format
+
+        result, _ = processor.exp_corregidos("HU", "USRNM001 Caso", "Resultado")
+
+        assert result == ""
+        assert consumed[-1] == "closed"
+        assert len(consumed) == processor.MAX_LINEAS_FUERA_DE_FORMATO + 2
+
+    def test_procesar_pipeline_happy_path(self, processor, mock_builder):
+        """Test that the pipelined mode returns the same shape as both stages"""
+        processor.batch_size = 2
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: "\n".join(
+            f"OBS[{i}]: sin cambios, CP: {cp} ok" for i, cp in enumerate(batch, 1)
+        )
+        mock_builder.corregir_expect_result.side_effect = lambda pares: "\n".join(
+            f"ExpRes{i}: {par.split(' | ')[1]} ok" for i, par in enumerate(pares.splitlines(), 1)
+        )
+        cps = "\n".join(f"USRNM00{i} Caso {i}" for i in range(1, 6))
+        exp = "\n".join(f"Resultado {i}" for i in range(1, 6))
+
+        mock_builder.combinar_feedback.return_value = "Feedback combinado"
+
+        new_cps, cps_fb, new_exp, exp_fb = processor.procesar_pipeline("HU", cps, exp)
+
+        assert new_cps.splitlines() == [f"USRNM00{i} Caso {i} ok" for i in range(1, 6)]
+        assert new_exp.splitlines() == [f"Resultado {i} ok" for i in range(1, 6)]
+        assert cps_fb == "Feedback combinado"
+        # EXP mock responses carry no OBS lines, so no EXP feedback is requested
+        assert exp_fb == ""
+        assert mock_builder.obtener_feedback.call_count == 3
+        sent_pairs = [call[0][0] for call in mock_builder.corregir_expect_result.call_args_list]
+        assert any("USRNM001 Caso 1 ok | Resultado 1" in pairs for pairs in sent_pairs)
+
+    def test_procesar_pipeline_overlaps_stages(self, processor, mock_builder):
+        """Test that an EXP batch starts before the CPS stage has finished"""
+        import threading
+
+        processor.batch_size = 1
+        exp_started = threading.Event()
+
+        def corregir(hu, batch):
+            if batch[0].startswith("USRNM002"):
+                assert exp_started.wait(timeout=5), "EXP batch was not submitted while CPS was running"
+            return f"OBS[1]: sin cambios, CP: {batch[0]}"
+
+        def corregir_exp(pares):
+            exp_started.set()
+            return "ExpRes1: ok"
+
+        mock_builder.corregir_ortografia.side_effect = corregir
+        mock_builder.corregir_expect_result.side_effect = corregir_exp
+
+        new_cps, _, new_exp, _ = processor.procesar_pipeline("HU", "USRNM001 A\nUSRNM002 B", "R1\nR2")
+
+        assert new_cps == "USRNM001 A\nUSRNM002 B"
+        assert new_exp == "ok\nok"
+
+    def test_procesar_pipeline_in_flight_follows_workers(self, processor, mock_builder):
+        """Test that the pipeline keeps as many batches in flight as the pool has workers"""
+        import threading
+        import time
+
+        processor.batch_size = 1
+        processor.workers = 6
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def corregir(hu, batch):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+            return f"OBS[1]: sin cambios, CP: {batch[0]}"
+
+        mock_builder.corregir_ortografia.side_effect = corregir
+        mock_builder.corregir_expect_result.return_value = "ExpRes1: ok"
+        cps = "\n".join(f"USRNM{i:03d} Caso {i}" for i in range(6))
+
+        new_cps, _, _, _ = processor.procesar_pipeline("HU", cps, "\n".join(["R"] * 6))
+
+        assert new_cps == cps
+        assert peak == 6
+
+    def test_procesar_pipeline_invalid_batch(self, processor, mock_builder):
+        """Test that an invalid CPS batch empties the whole result like the staged flow"""
+        mock_builder.corregir_ortografia.return_value = "USRNM001 Corrected"
+
+        result = processor.procesar_pipeline("HU", "USRNM001 Test\nUSRNM002 Test2", "R1\nR2")
+
+        assert result == ("", "", "", "")
+        mock_builder.corregir_expect_result.assert_not_called()
+
+    def test_procesar_pipeline_stops_sending_after_invalid_batch(self, processor, mock_builder):
+        """Test that CPS batches finishing after an invalid one do not trigger paid EXP or feedback calls"""
+        import time
+
+        processor.batch_size = 1
+        processor.workers = 2
+        processor.max_reparaciones = 0
+
+        def corregir(hu, batch):
+            if batch[0].startswith("USRNM002"):
+                return "OBS: sin casos"
+            time.sleep(0.2)
+            return f"OBS[1]: sin cambios, CP: {batch[0]}"
+
+        mock_builder.corregir_ortografia.side_effect = corregir
+
+        result = processor.procesar_pipeline("HU", "USRNM001 A\nUSRNM002 B\nUSRNM003 C", "R1\nR2\nR3")
+
+        assert result == ("", "", "", "")
+        assert mock_builder.corregir_ortografia.call_count == 2
+        mock_builder.corregir_expect_result.assert_not_called()
+        mock_builder.obtener_feedback.assert_not_called()
+
+    def test_procesar_pipeline_mismatched_exp(self, processor, mock_builder):
+        """Test that mismatched EXP lines still correct CPS but skip EXP"""
+        new_cps, cps_fb, new_exp, exp_fb = processor.procesar_pipeline(
+            "HU", "USRNM001 Validar login\nUSRNM002 Validar logout", "Solo uno"
+        )
+
+        assert "USRNM001 Caso corregido" in new_cps
+        assert (new_exp, exp_fb) == ("", "")
+
+    def _mock_eco(self, mock_builder):
+        """Builder that echoes every case and result with an 'ok' suffix"""
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: "\n".join(
+            f"OBS[{i}]: sin cambios, CP: {cp} ok" for i, cp in enumerate(batch, 1)
+        )
+        mock_builder.corregir_expect_result.side_effect = lambda pares: "\n".join(
+            f"ExpRes{i}: {par.split(' | ')[1]} ok" for i, par in enumerate(pares.splitlines(), 1)
+        )
+        mock_builder.combinar_feedback.return_value = "Feedback combinado"
+
+    def test_procesar_streaming_writes_batches_in_order(self, processor, mock_builder):
+        """Test that corrected lines are written in input order, batch by batch"""
+        import random
+        import time as time_mod
+
+        processor.batch_size = 2
+        self._mock_eco(mock_builder)
+        eco = mock_builder.corregir_ortografia.side_effect
+
+        def lento(hu, batch):
+            time_mod.sleep(random.uniform(0, 0.01))
+            return eco(hu, batch)
+
+        mock_builder.corregir_ortografia.side_effect = lento
+        escritos = []
+
+        cps_fb, exp_fb = processor.procesar_streaming(
+            "HU",
+            (f"USRNM{i:03d} Caso {i}" for i in range(1, 12)),
+            (f"Resultado {i}" for i in range(1, 12)),
+            lambda cps, exp: escritos.append((cps, exp)),
+        )
+
+        assert [cp for cps, _ in escritos for cp in cps] == [f"USRNM{i:03d} Caso {i} ok" for i in range(1, 12)]
+        assert [ex for _, exp in escritos for ex in exp] == [f"Resultado {i} ok" for i in range(1, 12)]
+        assert all(len(cps) <= 2 for cps, _ in escritos)
+        assert cps_fb == "Feedback combinado"
+        assert exp_fb == ""
+
+    def test_procesar_streaming_reads_lazily(self, processor, mock_builder):
+        """Test that output starts before the whole input has been read"""
+        processor.batch_size = 1
+        self._mock_eco(mock_builder)
+        leidas = []
+        leidas_al_escribir = []
+
+        def casos():
+            for i in range(100):
+                leidas.append(i)
+                yield f"USRNM{i:03d} Caso"
+
+        processor.procesar_streaming(
+            "HU", casos(), (f"R{i}" for i in range(100)),
+            lambda cps, exp: leidas_al_escribir.append(len(leidas)),
+        )
+
+        assert len(leidas_al_escribir) == 100
+        # Lotes en vuelo (2 * 4 workers) más el ítem que el planificador lee por adelantado
+        assert leidas_al_escribir[0] <= 10
+
+    def test_procesar_streaming_invalid_batch_keeps_originals(self, processor, mock_builder):
+        """Test that a batch whose response does not validate is written unchanged"""
+        mock_builder.corregir_ortografia.return_value = "USRNM001 Corrected"
+        mock_builder.corregir_expect_result.side_effect = lambda pares: "ExpRes1: R1 ok\nExpRes2: R2 ok"
+        escritos = []
+
+        processor.procesar_streaming(
+            "HU", iter(["USRNM001 Test", "USRNM002 Test2"]), iter(["R1", "R2"]),
+            lambda cps, exp: escritos.append((cps, exp)),
+        )
+
+        assert escritos == [(["USRNM001 Test", "USRNM002 Test2"], ["R1 ok", "R2 ok"])]
+
+    def test_procesar_streaming_mismatched_lengths(self, processor, mock_builder):
+        """Test that CPS and EXP with different line counts raise ValueError"""
+        self._mock_eco(mock_builder)
+
+        with pytest.raises(ValueError, match="misma longitud"):
+            processor.procesar_streaming("HU", iter(["USRNM001 A", "USRNM002 B"]), iter(["R1"]), lambda cps, exp: None)
+
+    def test_batch_error_policy_retries_failed_batch(self, processor, mock_builder):
+        """Test that with the retry policy a batch that raises once is resent and the stage completes"""
+        processor.batch_size = 1
+        processor.politica_lotes = "reintentar"
+        self._mock_eco(mock_builder)
+        eco = mock_builder.corregir_ortografia.side_effect
+        fallos = []
+
+        def inestable(hu, batch):
+            if batch == ["USRNM002 B"] and not fallos:
+                fallos.append(batch)
+                raise TimeoutError("deadline")
+            return eco(hu, batch)
+
+        mock_builder.corregir_ortografia.side_effect = inestable
+
+        result, _ = processor.cps_corregidas("HU", "USRNM001 A\nUSRNM002 B\nUSRNM003 C")
+
+        assert result == "USRNM001 A ok\nUSRNM002 B ok\nUSRNM003 C ok"
+        assert fallos == [["USRNM002 B"]]
+
+    def test_batch_error_policy_retries_api_failures(self, mock_config):
+        """Test that the retry policy resends a batch whose API call fails, then gives up"""
+        from src.redactionAssitant.builder import LLMRequestError
+        mock_config.batch_error_policy = "reintentar"
+        mock_config.batch_error_retries = 3
+        with patch('src.redactionAssitant.processor.OpenAI') as mock_openai:
+            create = mock_openai.return_value.chat.completions.create
+            create.side_effect = RuntimeError("503 Service Unavailable")
+            proc = Processor(mock_config, "key")
+
+            with pytest.raises(LLMRequestError):
+                proc.exp_corregidos("HU", "USRNM001 A", "R1")
+            assert create.call_count == 4
+
+            respuesta = MagicMock()
+            respuesta.choices[0].message.content = "ExpRes1: R1 ok"
+            create.reset_mock()
+            create.side_effect = [RuntimeError("503 Service Unavailable"), respuesta]
+            assert proc.exp_corregidos("HU", "USRNM001 A", "R1") == ("R1 ok", "")
+            assert create.call_count == 2
+
+    def test_pipeline_applies_retry_policy(self, processor, mock_builder):
+        """Test that --pipeline resends a failed batch under the retry policy and fails fast otherwise"""
+        from src.redactionAssitant.builder import LLMRequestError
+        self._mock_eco(mock_builder)
+        eco = mock_builder.corregir_expect_result.side_effect
+        fallos = iter([LLMRequestError("Error al corregir expected results: 503")])
+
+        def falla_una_vez(pares):
+            error = next(fallos, None)
+            if error is not None:
+                raise error
+            return eco(pares)
+
+        mock_builder.corregir_expect_result.side_effect = falla_una_vez
+        with pytest.raises(LLMRequestError):
+            processor.procesar_pipeline("HU", "USRNM001 A", "R1")
+
+        fallos = iter([LLMRequestError("Error al corregir expected results: 503")])
+        processor.politica_lotes = "reintentar"
+        new_cps, _, new_exp, _ = processor.procesar_pipeline("HU", "USRNM001 A", "R1")
+
+        assert (new_cps, new_exp) == ("USRNM001 A ok", "R1 ok")
+
+    def test_async_applies_retry_policy(self, processor, mock_async_builder):
+        """Test that --async resends a failed batch under the retry policy and fails fast otherwise"""
+        from src.redactionAssitant.builder import LLMRequestError
+        error = LLMRequestError("Error al corregir ortografía: 503")
+        mock_async_builder.corregir_ortografia.side_effect = [error, "OBS[1]: ok, CP: USRNM001 A ok"]
+
+        with pytest.raises(LLMRequestError):
+            asyncio.run(processor.acps_corregidas("HU", "USRNM001 A"))
+
+        processor.politica_lotes = "reintentar"
+        mock_async_builder.corregir_ortografia.side_effect = [error, "OBS[1]: ok, CP: USRNM001 A ok"]
+        mock_async_builder.corregir_expect_result.side_effect = [error, "ExpRes1: R1 ok"]
+
+        assert asyncio.run(processor.acps_corregidas("HU", "USRNM001 A"))[0] == "USRNM001 A ok"
+        assert asyncio.run(processor.aexp_corregidos("HU", "USRNM001 A", "R1"))[0] == "R1 ok"
+        assert mock_async_builder.corregir_expect_result.await_count == 2
+
+    def test_skip_policy_keeps_originals_in_streaming(self, processor, mock_builder):
+        """Test that with the skip policy a failed streaming batch is written with its original lines"""
+        from src.redactionAssitant.builder import LLMRequestError
+        processor.batch_size = 1
+        processor.politica_lotes = "omitir"
+        self._mock_eco(mock_builder)
+        eco = mock_builder.corregir_ortografia.side_effect
+
+        def falla_b(hu, batch):
+            if batch == ["USRNM002 B"]:
+                raise LLMRequestError("Error al corregir ortografía: 503")
+            return eco(hu, batch)
+
+        mock_builder.corregir_ortografia.side_effect = falla_b
+        escritos = []
+
+        processor.procesar_streaming(
+            "HU", iter(["USRNM001 A", "USRNM002 B", "USRNM003 C"]), iter(["R1", "R2", "R3"]),
+            lambda cps, exp: escritos.append((cps, exp)),
+        )
+
+        assert escritos == [
+            (["USRNM001 A ok"], ["R1 ok"]), (["USRNM002 B"], ["R2"]), (["USRNM003 C ok"], ["R3 ok"]),
+        ]
+
+    def test_skip_policy_rejected_for_in_memory_stages(self, processor, mock_builder):
+        """Test that the skip policy is refused where a failed batch cannot keep its input"""
+        processor.politica_lotes = "omitir"
+
+        with pytest.raises(ValueError, match="--stream-files"):
+            processor.cps_corregidas("HU", "USRNM001 A")
+        mock_builder.corregir_ortografia.assert_not_called()
+
+    def test_batch_error_policy_fail_fast_by_default(self, processor, mock_builder):
+        """Test that a batch exception aborts the stage with the default policy"""
+        mock_builder.corregir_ortografia.side_effect = TimeoutError("deadline")
+
+        with pytest.raises(TimeoutError):
+            processor.cps_corregidas("HU", "USRNM001 A")
+
+    def test_api_failure_fails_the_stage(self, mock_config):
+        """Test that an API error surfaces as LLMRequestError instead of an empty or misaligned result"""
+        from src.redactionAssitant.builder import LLMRequestError
+        with patch('src.redactionAssitant.processor.OpenAI') as mock_openai:
+            mock_openai.return_value.chat.completions.create.side_effect = RuntimeError("503 Service Unavailable")
+            proc = Processor(mock_config, "key")
+
+            with pytest.raises(LLMRequestError, match="503"):
+                proc.exp_corregidos("HU", "USRNM001 A\nUSRNM002 B", "R1\nR2")
+
+    def test_feedback_failure_keeps_corrections(self, processor, mock_builder):
+        """Test that a failing feedback call does not discard the corrected cases"""
+        from src.redactionAssitant.builder import LLMRequestError
+        self._mock_eco(mock_builder)
+        mock_builder.obtener_feedback.side_effect = LLMRequestError("Error al obtener feedback: 503")
+
+        result, feedback = processor.cps_corregidas("HU", "USRNM001 A\nUSRNM002 B")
+
+        assert result == "USRNM001 A ok\nUSRNM002 B ok"
+        assert feedback == ""
+
+    def test_reducir_feedback_terminates_with_tiny_cap(self, processor, mock_builder):
+        """Test that every reduce round shrinks the summaries even when the cap fits less than two"""
+        processor.feedback_max_chars = 1
+        mock_builder.combinar_feedback.side_effect = lambda resumenes: "x"
+
+        assert processor._reducir_feedback(["uno", "dos", "tres", "cuatro", "cinco"]) == "x"
+        assert all(len(c[0][0]) >= 2 for c in mock_builder.combinar_feedback.call_args_list)
+
+    def test_feedback_is_mapped_per_batch_and_reduced(self, processor, mock_builder):
+        """Test per-batch feedback followed by a single reduce call"""
+        processor.batch_size = 1
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: f"OBS[1]: tilde, CP: {batch[0]}"
+        mock_builder.obtener_feedback.side_effect = lambda obs: f"resumen de {obs[-8:]}"
+        mock_builder.combinar_feedback.return_value = "Feedback combinado"
+
+        result, feedback = processor.cps_corregidas("HU", "USRNM001 A\nUSRNM002 B\nUSRNM003 C")
+
+        assert result == "USRNM001 A\nUSRNM002 B\nUSRNM003 C"
+        assert feedback == "Feedback combinado"
+        assert mock_builder.obtener_feedback.call_count == 3
+        mock_builder.combinar_feedback.assert_called_once()
+        assert len(mock_builder.combinar_feedback.call_args[0][0]) == 3
+
+    def test_reduce_input_is_capped(self, processor, mock_builder):
+        """Test that the reduce step never receives more than feedback_max_chars"""
+        processor.feedback_max_chars = 100
+        mock_builder.combinar_feedback.side_effect = lambda grupo: "c" * 40
+
+        feedback = processor._reducir_feedback(["x" * 80 for _ in range(9)])
+
+        assert feedback == "c" * 40
+        for call in mock_builder.combinar_feedback.call_args_list:
+            assert sum(len(r) for r in call[0][0]) <= 100
+        assert mock_builder.combinar_feedback.call_count > 1
+
+    def test_reduce_skips_failed_summaries(self, processor, mock_builder):
+        """Test that failed per-batch summaries are not sent to the reduce step"""
+        assert processor._reducir_feedback(["", None, "resumen"]) == "resumen"
+        assert processor._reducir_feedback([None]) == ""
+        assert processor._reducir_feedback([]) == ""
+        mock_builder.combinar_feedback.assert_not_called()
+
+    def test_reduce_keeps_summaries_starting_with_error(self, processor, mock_builder):
+        """Test that a valid summary is not mistaken for a failure because of its wording"""
+        mock_builder.combinar_feedback.side_effect = lambda resumenes: " | ".join(resumenes)
+
+        feedback = processor._reducir_feedback(["Errores ortográficos corregidos en 3 casos.", "Se unificaron mayúsculas."])
+
+        assert feedback == "Errores ortográficos corregidos en 3 casos. | Se unificaron mayúsculas."
+
+    def test_acps_corregidas_maps_and_reduces_feedback(self, processor, mock_async_builder):
+        """Test async map-reduce feedback"""
+        processor.batch_size = 1
+        mock_async_builder.corregir_ortografia.side_effect = lambda hu, batch: f"OBS[1]: tilde, CP: {batch[0]}"
+        mock_async_builder.combinar_feedback = AsyncMock(return_value="Feedback combinado")
+
+        result, feedback = asyncio.run(processor.acps_corregidas("HU", "USRNM001 A\nUSRNM002 B"))
+
+        assert result == "USRNM001 A\nUSRNM002 B"
+        assert feedback == "Feedback combinado"
+        assert mock_async_builder.obtener_feedback.await_count == 2
+
+    def test_registrar_uso_routes_to_planner(self, processor):
+        """Test that usage is routed to the planner of the operation"""
+        planner = processor.planners["expect_result"]
+        planner.max_completion = 100
+
+        processor._registrar_uso("expect_result", {"finish_reason": "length"})
+        processor._registrar_uso("feedback", {"finish_reason": "length"})
+
+        assert planner.max_completion == 256
+
+    def test_procesar_incremental_only_sends_changed_lines(self, processor, mock_builder, tmp_path):
+        """Test that unchanged lines are spliced from the manifest and only new ones reach the LLM"""
+        hu = "HU"
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.registrar(Manifest.clave(hu, "USRNM001 Caso", "Resultado 1"), "USRNM001 Guardado", "Guardado 1")
+        manifest.registrar(Manifest.clave(hu, "USRNM003 Caso", "Resultado 3"), "USRNM003 Guardado", "Guardado 3")
+        mock_builder.corregir_ortografia.return_value = "USRNM002 Nuevo\nOBS: cambio"
+        mock_builder.corregir_expect_result.return_value = "ExpRes1: Nuevo 2"
+
+        new_cps, _, new_exp, _ = processor.procesar_incremental(
+            hu, "USRNM001 Caso\nUSRNM002 Caso\nUSRNM003 Caso", "Resultado 1\nResultado 2\nResultado 3", manifest
+        )
+
+        mock_builder.corregir_ortografia.assert_called_once_with(hu, ["USRNM002 Caso"])
+        mock_builder.corregir_expect_result.assert_called_once_with("USRNM002 Nuevo | Resultado 2")
+        assert new_cps == "USRNM001 Guardado\nUSRNM002 Nuevo\nUSRNM003 Guardado"
+        assert new_exp == "Guardado 1\nNuevo 2\nGuardado 3"
+        assert len(Manifest(tmp_path / "manifest.json")) == 3
+
+    def test_procesar_incremental_without_changes_skips_llm(self, processor, mock_builder, tmp_path):
+        """Test that a fully cached input makes no LLM calls"""
+        manifest = Manifest(tmp_path / "manifest.json")
+        manifest.registrar(Manifest.clave("HU", "USRNM001 Caso", "Resultado"), "USRNM001 Guardado", "Guardado")
+
+        new_cps, cps_fb, new_exp, exp_fb = processor.procesar_incremental("HU", "USRNM001 Caso", "Resultado", manifest)
+
+        assert (new_cps, cps_fb, new_exp, exp_fb) == ("USRNM001 Guardado", "", "Guardado", "")
+        mock_builder.corregir_ortografia.assert_not_called()
+        mock_builder.corregir_expect_result.assert_not_called()
+
+    def test_procesar_incremental_force_rebuild(self, processor, mock_builder, tmp_path):
+        """Test that forzar ignores stored lines and overwrites them"""
+        manifest = Manifest(tmp_path / "manifest.json")
+        clave = Manifest.clave("HU", "USRNM001 Caso", "Resultado")
+        manifest.registrar(clave, "USRNM001 Viejo", "Viejo")
+        mock_builder.corregir_ortografia.return_value = "USRNM001 Nuevo"
+        mock_builder.corregir_expect_result.return_value = "ExpRes1: Nuevo"
+
+        new_cps, _, new_exp, _ = processor.procesar_incremental("HU", "USRNM001 Caso", "Resultado", manifest, forzar=True)
+
+        assert (new_cps, new_exp) == ("USRNM001 Nuevo", "Nuevo")
+        assert manifest.obtener(clave) == {"cp": "USRNM001 Nuevo", "exp": "Nuevo"}
+
+    def test_procesar_incremental_failed_cps_keeps_manifest(self, processor, mock_builder, tmp_path):
+        """Test that a failed CPS correction returns empty outputs and records nothing"""
+        manifest = Manifest(tmp_path / "manifest.json")
+        mock_builder.corregir_ortografia.return_value = "OBS: sin casos"
+
+        result = processor.procesar_incremental("HU", "USRNM001 Caso", "Resultado", manifest)
+
+        assert result == ("", "", "", "")
+        assert len(manifest) == 0
+        assert not (tmp_path / "manifest.json").exists()
+
+    def test_cps_corregidas_repairs_only_missing_cases(self, processor, mock_builder):
+        """Test that a batch missing a case re-requests just that case and merges by ID"""
+        respuestas = iter([
+            "OBS[1]: ok, CP: USRNM002 Dos corregido\nOBS[2]: ok, CP: USRNM001 Uno corregido",
+            "OBS[1]: ok, CP: USRNM003 Tres corregido",
+        ])
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: next(respuestas)
+
+        result, _ = processor.cps_corregidas("HU", "USRNM001 Uno\nUSRNM002 Dos\nUSRNM003 Tres")
+
+        assert result == "USRNM001 Uno corregido\nUSRNM002 Dos corregido\nUSRNM003 Tres corregido"
+        assert mock_builder.corregir_ortografia.call_args_list[1][0][1] == ["USRNM003 Tres"]
+
+    def test_cps_corregidas_repair_splits_and_is_bounded(self, processor, mock_builder):
+        """Test that failing groups are split in halves and retries stop at the budget"""
+        processor.max_reparaciones = 2
+        mock_builder.corregir_ortografia.return_value = "OBS: sin casos"
+
+        result, _ = processor.cps_corregidas("HU", "USRNM001 Uno\nUSRNM002 Dos\nUSRNM003 Tres")
+
+        assert result == ""
+        lotes = [call[0][1] for call in mock_builder.corregir_ortografia.call_args_list]
+        assert lotes == [
+            ["USRNM001 Uno", "USRNM002 Dos", "USRNM003 Tres"],
+            ["USRNM001 Uno", "USRNM002 Dos", "USRNM003 Tres"],
+            ["USRNM001 Uno"],
+        ]
+
+    def test_procesar_pipeline_repairs_cps_batch(self, processor, mock_builder):
+        """Test that the pipeline repairs a CPS batch instead of cancelling the run"""
+        respuestas = iter(["USRNM001 Uno ok", "USRNM002 Dos ok"])
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: next(respuestas)
+        mock_builder.corregir_expect_result.return_value = "ExpRes1: R1 ok\nExpRes2: R2 ok"
+
+        new_cps, _, new_exp, _ = processor.procesar_pipeline("HU", "USRNM001 Uno\nUSRNM002 Dos", "R1\nR2")
+
+        assert new_cps == "USRNM001 Uno ok\nUSRNM002 Dos ok"
+        assert new_exp == "R1 ok\nR2 ok"
+
+    def test_resume_skips_batches_in_journal(self, processor, mock_builder, mock_config, tmp_path):
+        """Test that a resumed run only sends batches missing from the journal"""
+        mock_config.journal_path = tmp_path / "journal.jsonl"
+        processor.batch_size = 1
+        cps, exp = "USRNM001 Uno\nUSRNM002 Dos", "R1\nR2"
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: f"{batch[0]} ok"
+        mock_builder.corregir_expect_result.side_effect = lambda pares: "ExpRes1: ok"
+
+        # Primera ejecución interrumpida tras el primer lote de CPS
+        processor.iniciar_journal("HU", cps, exp)
+        processor._corregir_lote_cps_reparando("HU", ["USRNM001 Uno"])
+        mock_builder.corregir_ortografia.reset_mock()
+
+        processor.iniciar_journal("HU", cps, exp, reanudar=True)
+        new_cps, _ = processor.cps_corregidas("HU", cps)
+
+        assert new_cps == "USRNM001 Uno ok\nUSRNM002 Dos ok"
+        mock_builder.corregir_ortografia.assert_called_once_with("HU", ["USRNM002 Dos"])
+        assert processor.journal.recuperados == 1
+
+    def test_cps_corregidas_dedups_normalized_cases(self, processor, mock_builder, caplog):
+        """Test that repeated bodies are sent once and fanned back out with their own IDs"""
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: "\n".join(f"{cp} ok" for cp in batch)
+        cps = "USRNM001 Validar  login\nUSRNM002 validar LOGIN\nUSRNM003 Validar logout"
+
+        with caplog.at_level("INFO"):
+            result, _ = processor.cps_corregidas("HU", cps)
+
+        mock_builder.corregir_ortografia.assert_called_once_with("HU", ["USRNM001 Validar  login", "USRNM003 Validar logout"])
+        assert result == "USRNM001 Validar  login ok\nUSRNM002 Validar  login ok\nUSRNM003 Validar logout ok"
+        assert "ratio 0.67" in caplog.text
+
+    def test_exp_corregidos_dedups_pairs(self, processor, mock_builder):
+        """Test that identical case/result pairs are corrected once and copied to each line"""
+        mock_builder.corregir_expect_result.side_effect = lambda pares: "\n".join(
+            f"ExpRes{i}: {par.split(' | ')[1]} ok" for i, par in enumerate(pares.splitlines(), 1)
+        )
+
+        result, _ = processor.exp_corregidos("HU", "USRNM001 Login\nUSRNM002 login", "Acceso\nacceso")
+
+        mock_builder.corregir_expect_result.assert_called_once_with("USRNM001 Login | Acceso")
+        assert result == "Acceso ok\nAcceso ok"
+
+    def test_dedup_can_be_disabled(self, processor, mock_builder):
+        """Test that every line is sent when deduplication is off"""
+        processor.deduplicar = False
+        mock_builder.corregir_ortografia.side_effect = lambda hu, batch: "\n".join(batch)
+
+        result, _ = processor.cps_corregidas("HU", "USRNM001 Caso\nUSRNM002 Caso")
+
+        assert result == "USRNM001 Caso\nUSRNM002 Caso"
+        assert mock_builder.corregir_ortografia.call_args[0][1] == ["USRNM001 Caso", "USRNM002 Caso"]
+
+    def test_cps_corregidas_records_stage_and_batch_spans(self, processor, mock_builder):
+        """Test that stages and batches are traced with their case IDs"""
+        mock_builder.corregir_ortografia.return_value = "OBS[1]: ok, CP: USRNM001 Login\nOBS[2]: ok, CP: USRNM002 Logout"
+
+        processor.cps_corregidas("HU", "USRNM001 Login\nUSRNM002 Logout")
+
+        spans = {s["nombre"]: s for s in processor.tracer.spans if s["etapa"] == "cps"}
+        assert spans["lote"]["lote"] == "USRNM001-USRNM002"
+        assert spans["lote"]["items"] == 2
+        assert spans["lote"]["padre_id"] == spans["etapa"]["span_id"]
+        assert (spans["etapa"]["etapa"], spans["etapa"]["hu"]) == ("cps", "USRNM")
+
+    def test_exportar_metricas_writes_prometheus_file(self, processor, mock_config, tmp_path):
+        """Test that run metrics are exported when a metrics path is configured"""
+        mock_config.metrics_path = tmp_path / "metrics.prom"
+
+        resumen = processor.exportar_metricas()
+
+        assert resumen["peticiones"] == 0
+        assert "redactor_llm_cost_usd_total" in mock_config.metrics_path.read_text(encoding="utf-8")
+
+    def test_exportar_metricas_reports_connection_reuse(self, processor, mock_config, tmp_path):
+        """Test that HTTP requests made after the client was created are reported with their reuse rate"""
+        from src.redactionAssitant import http_pool
+        mock_config.metrics_path = tmp_path / "metrics.prom"
+        processor.client.chat
+        for nueva in (True, False, False, False):
+            http_pool.ESTADISTICAS.registrar(nueva)
+
+        resumen = processor.exportar_metricas()
+
+        assert resumen["conexiones"] == {"peticiones": 4, "nuevas": 1, "reutilizacion": 0.75}
+        assert 'redactor_http_connections_opened_total{hu="USRNM"} 1' in mock_config.metrics_path.read_text(encoding="utf-8")
+
     def test_cps_corregidas_empty_inputs(self, processor):
         """Test handling of empty inputs"""
         result, feedback = processor.cps_corregidas("", "")
@@ -145,6 +839,95 @@ class TestProcessor:
         assert "USRNM001 Validar login | Sistema permite acceso" in sent_prompt
         assert "USRNM002 Validar logout | Sistema cierra sesión" in sent_prompt
 
+    @pytest.fixture
+    def mock_async_builder(self, processor, mock_builder):
+        """Fixture for an async builder mirroring mock_builder responses"""
+        async_builder = Mock()
+        async_builder.corregir_ortografia = AsyncMock(return_value=mock_builder.corregir_ortografia.return_value)
+        async_builder.corregir_expect_result = AsyncMock(return_value=mock_builder.corregir_expect_result.return_value)
+        async_builder.obtener_feedback = AsyncMock(return_value="Feedback de corrección")
+        processor.async_builder = async_builder
+        return async_builder
+
+    def test_acps_corregidas_happy_path(self, processor, mock_async_builder):
+        """Test async correction of test cases"""
+        cps = "USRNM001 Validar login\nUSRNM002 Validar logout"
+
+        result, feedback = asyncio.run(processor.acps_corregidas("HU", cps))
+
+        assert result == "USRNM001 Caso corregido\nUSRNM002 Caso corregido 2"
+        assert feedback == "Feedback de corrección"
+        mock_async_builder.obtener_feedback.assert_awaited_once()
+
+    def test_acps_corregidas_empty_inputs(self, processor, mock_async_builder):
+        """Test async correction with empty inputs"""
+        assert asyncio.run(processor.acps_corregidas("", "")) == ("", "")
+        mock_async_builder.corregir_ortografia.assert_not_awaited()
+
+    def test_acps_corregidas_respects_max_concurrency(self, processor, mock_async_builder):
+        """Test that no more than max_concurrency batches are in flight"""
+        in_flight = 0
+        peak = 0
+
+        async def slow_correction(hu, batch):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "\n".join(batch)
+
+        mock_async_builder.corregir_ortografia.side_effect = slow_correction
+        processor.batch_size = 1
+        processor.max_concurrency = 3
+        cps = "\n".join(f"USRNM{i:03d} Caso {i}" for i in range(10))
+
+        result, _ = asyncio.run(processor.acps_corregidas("HU", cps))
+
+        assert result == cps
+        assert peak == 3
+
+    def test_acps_corregidas_repairs_only_missing_cases(self, processor, mock_async_builder):
+        """Test that an async batch missing a case re-requests just that case instead of failing the run"""
+        respuestas = iter([
+            "OBS[1]: ok, CP: USRNM002 Dos corregido\nOBS[2]: ok, CP: USRNM001 Uno corregido",
+            "OBS[1]: ok, CP: USRNM003 Tres corregido",
+        ])
+        mock_async_builder.corregir_ortografia.side_effect = lambda hu, batch: next(respuestas)
+
+        result, _ = asyncio.run(processor.acps_corregidas("HU", "USRNM001 Uno\nUSRNM002 Dos\nUSRNM003 Tres"))
+
+        assert result == "USRNM001 Uno corregido\nUSRNM002 Dos corregido\nUSRNM003 Tres corregido"
+        assert mock_async_builder.corregir_ortografia.await_args_list[1][0][1] == ["USRNM003 Tres"]
+
+    def test_aexp_corregidos_happy_path(self, processor, mock_async_builder):
+        """Test async correction of expected results"""
+        result, feedback = asyncio.run(
+            processor.aexp_corregidos("HU", "USRNM001 Validar login", "Sistema permite acceso")
+        )
+
+        assert result == "Resultado corregido"
+        assert feedback == "Feedback de corrección"
+        args, _ = mock_async_builder.corregir_expect_result.call_args
+        assert args[0] == "USRNM001 Validar login | Sistema permite acceso"
+
+    def test_aexp_corregidos_mismatch_lines(self, processor, mock_async_builder):
+        """Test async correction with different CPS/EXP line counts"""
+        assert asyncio.run(processor.aexp_corregidos("HU", "One line", "Two\nLines")) == ("", "")
+
+    def test_async_builder_is_created_lazily(self, processor):
+        """Test that AsyncOpenAI is only built on first async use and can be closed"""
+        with patch('src.redactionAssitant.processor.AsyncOpenAI') as mock_async_openai:
+            mock_async_openai.return_value.close = AsyncMock()
+            first = processor._obtener_async_builder()
+            second = processor._obtener_async_builder()
+            asyncio.run(processor.aclose())
+
+        assert first is second
+        mock_async_openai.assert_called_once()
+        mock_async_openai.return_value.close.assert_awaited_once()
+        assert processor.async_builder is None
+
 
 class TestHelperFunctions:
     """Test suite for helper functions"""
@@ -190,6 +973,13 @@ class TestHelperFunctions:
         assert preprocess_exp_or_cps("") == []
         assert preprocess_exp_or_cps("   \n\n   ") == []
 
+    def test_agrupar_resumenes(self):
+        """Test grouping of summaries under the reduce size cap"""
+        grupos = _agrupar_resumenes(["a" * 30, "b" * 30, "c" * 30, "d" * 500], 70)
+
+        assert grupos == [["a" * 30, "b" * 30], ["c" * 30, "d" * 35]]
+        assert all(len(grupo) >= 2 for grupo in grupos)
+
     def test_preprocess_exp_or_cps_single_line(self):
         """Test preprocessing with single line"""
         result = preprocess_exp_or_cps("Single line")
@@ -0,0 +1,65 @@
+import threading
+import time
+from src.redactionAssitant.profiling import StageProfiler
+
+
+class TestStageProfiler:
+    """Test suite for StageProfiler class"""
+
+    def test_stages_accumulate_and_report_wait(self):
+        """Test that repeated stages accumulate and sleeping shows up as wait, not CPU"""
+        profiler = StageProfiler()
+
+        for _ in range(2):
+            with profiler.etapa("envio_lotes"):
+                time.sleep(0.02)
+
+        tabla = profiler.tabla()
+        fila = next(l for l in tabla.splitlines() if l.startswith("envio_lotes"))
+        llamadas, pared, cpu, espera, _ = fila.split()[1:]
+        assert llamadas == "2"
+        assert float(pared) >= 0.04
+        assert float(espera) > float(cpu)
+        assert "total" in tabla
+
+    def test_nested_stages_are_exclusive(self):
+        """Test that a nested stage pauses the outer one"""
+        profiler = StageProfiler()
+
+        with profiler.etapa("preproceso"):
+            with profiler.etapa("envio_lotes"):
+                time.sleep(0.03)
+
+        assert profiler._tiempos["envio_lotes"]["pared"] >= 0.03
+        assert profiler._tiempos["preproceso"]["pared"] < 0.03
+
+    def test_other_threads_and_inactive_profiler_are_ignored(self):
+        """Test that stages from worker threads or an inactive profiler are not measured"""
+        profiler = StageProfiler()
+        hilo = threading.Thread(target=lambda: profiler.etapa("feedback").__enter__())
+        hilo.start()
+        hilo.join()
+
+        inactivo = StageProfiler(activo=False)
+        with inactivo.etapa("carga"):
+            pass
+
+        assert profiler._tiempos == {}
+        assert inactivo._tiempos == {}
+        assert inactivo.guardar("no-usado") is None
+
+    def test_guardar_writes_profiles_and_summary(self, tmp_path):
+        """Test that one .prof per stage and a summary with top functions are written"""
+        profiler = StageProfiler()
+        with profiler.etapa("parseo"):
+            sorted(range(1000), key=lambda x: -x)
+        with profiler.etapa("guardado"):
+            pass
+
+        resumen = profiler.guardar(tmp_path)
+
+        assert (tmp_path / "parseo.prof").exists()
+        assert (tmp_path / "guardado.prof").exists()
+        texto = resumen.read_text(encoding="utf-8")
+        assert "=== parseo ===" in texto
+        assert "sorted" in texto
@@ -0,0 +1,172 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from unittest.mock import Mock
+from src.redactionAssitant.scheduler import (
+    DeadlineExceeded,
+    RequestScheduler,
+    TokenBucket,
+    es_reintentable,
+    retry_after,
+)
+
+
+class FakeClock:
+    """Deterministic clock whose sleep advances time"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.deepseek.com/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers or {})
+    if status == 429:
+        return openai.RateLimitError("rate limited", response=response, body=None)
+    if status >= 500:
+        return openai.InternalServerError("server error", response=response, body=None)
+    return openai.BadRequestError("bad request", response=response, body=None)
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket class"""
+
+    def test_burst_then_wait(self):
+        """Test that a full bucket allows a burst and then spaces requests"""
+        clock = FakeClock()
+        bucket = TokenBucket(60, reloj=clock)
+
+        waits = [bucket.reservar(1) for _ in range(62)]
+
+        assert waits[:60] == [0.0] * 60
+        assert waits[60] == pytest.approx(1.0)
+        assert waits[61] == pytest.approx(2.0)
+
+    def test_refills_over_time(self):
+        """Test tokens are replenished with elapsed time"""
+        clock = FakeClock()
+        bucket = TokenBucket(60, reloj=clock)
+        bucket.reservar(60)
+
+        clock.now += 10
+        assert bucket.reservar(10) == 0.0
+        assert bucket.reservar(1) == pytest.approx(1.0)
+
+    def test_invalid_capacity(self):
+        """Test invalid capacity raises ValueError"""
+        with pytest.raises(ValueError, match="mayor que 0"):
+            TokenBucket(0)
+
+
+class TestRequestScheduler:
+    """Test suite for RequestScheduler class"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def scheduler(self, clock):
+        return RequestScheduler(rpm=600, tpm=10_000, max_reintentos=3, deadline=60, reloj=clock, dormir=clock.sleep)
+
+    def test_success_without_retries(self, scheduler):
+        """Test that a successful call is returned directly"""
+        assert scheduler.ejecutar(lambda: "ok", tokens=100) == "ok"
+        assert scheduler.reintentos == 0
+
+    def test_retries_transient_errors_with_backoff(self, scheduler, clock):
+        """Test 5xx errors are retried with bounded exponential backoff"""
+        fn = Mock(side_effect=[_status_error(500), _status_error(503), "ok"])
+        info = {}
+
+        assert scheduler.ejecutar(fn, info=info) == "ok"
+        assert fn.call_count == 3
+        assert info["reintentos"] == 2
+        assert scheduler.reintentos == 2
+        assert 0 <= clock.sleeps[0] <= 1.0
+        assert 0 <= clock.sleeps[1] <= 2.0
+
+    def test_honours_retry_after(self, scheduler, clock):
+        """Test that Retry-After is used instead of the backoff"""
+        fn = Mock(side_effect=[_status_error(429, {"retry-after": "7"}), "ok"])
+
+        assert scheduler.ejecutar(fn) == "ok"
+        assert clock.sleeps == [7.0]
+
+    def test_non_retryable_error_is_raised(self, scheduler):
+        """Test that client errors are not retried"""
+        fn = Mock(side_effect=_status_error(400))
+
+        with pytest.raises(openai.BadRequestError):
+            scheduler.ejecutar(fn)
+        fn.assert_called_once()
+
+    def test_gives_up_after_max_retries(self, scheduler):
+        """Test the retry budget is bounded"""
+        fn = Mock(side_effect=_status_error(500))
+
+        with pytest.raises(openai.InternalServerError):
+            scheduler.ejecutar(fn)
+        assert fn.call_count == 4
+
+    def test_deadline_exceeded(self, scheduler):
+        """Test that waits beyond the deadline abort the request"""
+        fn = Mock(side_effect=_status_error(429, {"retry-after": "600"}))
+
+        with pytest.raises(DeadlineExceeded):
+            scheduler.ejecutar(fn)
+        fn.assert_called_once()
+
+    def test_rate_limit_smooths_bursts(self, clock):
+        """Test that requests beyond the per-minute budget are delayed, not failed"""
+        scheduler = RequestScheduler(rpm=2, tpm=1_000_000, reloj=clock, dormir=clock.sleep)
+
+        results = [scheduler.ejecutar(lambda: "ok") for _ in range(4)]
+
+        assert results == ["ok"] * 4
+        assert clock.sleeps == [pytest.approx(30.0), pytest.approx(30.0)]
+
+    def test_aejecutar_retries(self, clock):
+        """Test the async variant retries transient errors"""
+        scheduler = RequestScheduler(backoff_base=0.001, reloj=clock)
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                raise _status_error(502)
+            return "ok"
+
+        assert asyncio.run(scheduler.aejecutar(fn)) == "ok"
+        assert len(calls) == 2
+
+
+class TestHelpers:
+    """Test suite for retry helper functions"""
+
+    def test_es_reintentable(self):
+        """Test classification of API errors"""
+        request = httpx.Request("POST", "https://api.deepseek.com")
+        assert es_reintentable(_status_error(429))
+        assert es_reintentable(_status_error(500))
+        assert es_reintentable(openai.APIConnectionError(request=request))
+        assert es_reintentable(openai.APITimeoutError(request=request))
+        assert not es_reintentable(_status_error(400))
+        assert not es_reintentable(ValueError("x"))
+
+    def test_retry_after_variants(self):
+        """Test parsing of Retry-After headers"""
+        assert retry_after(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+        assert retry_after(_status_error(429, {"retry-after": "3"})) == 3.0
+        assert retry_after(_status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+        assert retry_after(_status_error(429)) is None
+        assert retry_after(ValueError("x")) is None
@@ -0,0 +1,163 @@
+import json
+import pytest
+from src.redactionAssitant.telemetry import Tracer
+
+
+class TestTracer:
+    """Test suite for Tracer class"""
+
+    def test_child_spans_inherit_parent_attributes(self):
+        """Test that an LLM span carries the batch attributes of its parent span"""
+        tracer = Tracer(atributos={"hu": "USRNM"})
+
+        with tracer.span("lote", etapa="cps", lote="USRNM001-USRNM002", items=2):
+            with tracer.span("llm", operacion="ortografia") as span:
+                span["prompt_tokens"] = 100
+
+        llm, lote = tracer.spans
+        assert llm["nombre"] == "llm"
+        assert llm["padre_id"] == lote["span_id"]
+        assert (llm["hu"], llm["lote"], llm["items"], llm["prompt_tokens"]) == ("USRNM", "USRNM001-USRNM002", 2, 100)
+        assert llm["resultado"] == "ok"
+        assert llm["duracion_s"] >= 0
+
+    def test_error_and_cancel_outcomes(self):
+        """Test that exceptions mark the span as error and generator closes as cancelled"""
+        tracer = Tracer()
+
+        with pytest.raises(ValueError):
+            with tracer.span("llm", operacion="feedback"):
+                raise ValueError("boom")
+
+        def generador():
+            with tracer.span("llm", operacion="ortografia"):
+                yield 1
+                yield 2
+
+        gen = generador()
+        next(gen)
+        gen.close()
+
+        assert tracer.spans[0]["resultado"] == "error"
+        assert tracer.spans[0]["error"] == "ValueError"
+        assert tracer.spans[1]["resultado"] == "cancelado"
+
+    def test_spans_are_written_as_jsonl(self, tmp_path):
+        """Test that each finished span is appended to the trace file"""
+        path = tmp_path / "trace.jsonl"
+        tracer = Tracer(path, atributos={"hu": "USRNM"})
+
+        with tracer.span("etapa", etapa="cps", items=3):
+            pass
+
+        entradas = [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+        assert entradas[0]["etapa"] == "cps"
+        assert entradas[0]["run"] == tracer.run_id
+
+    def test_trace_file_is_appended_across_runs(self, tmp_path):
+        """Test that a new Tracer on the same file keeps the previous run's spans"""
+        path = tmp_path / "trace.jsonl"
+        primero = Tracer(path, atributos={"hu": "USRNM"})
+        with primero.span("etapa", etapa="cps"):
+            pass
+        segundo = Tracer(path, atributos={"hu": "OTRA"})
+        with segundo.span("etapa", etapa="cps"):
+            pass
+
+        entradas = [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines()]
+        assert [e["run"] for e in entradas] == [primero.run_id, segundo.run_id]
+        assert primero.run_id != segundo.run_id
+
+    def test_resumen_and_cost(self):
+        """Test run totals and cost estimation with cached tokens priced separately"""
+        tracer = Tracer(precios={"prompt": 1.0, "completion": 2.0, "cached": 0.1})
+        with tracer.span("llm", operacion="ortografia") as span:
+            span.update(prompt_tokens=1_000_000, completion_tokens=500_000, cached_tokens=400_000, reintentos=2)
+        with tracer.span("llm", operacion="ortografia") as span:
+            span["cache_hit"] = True
+
+        resumen = tracer.resumen()
+
+        assert resumen["peticiones"] == 1
+        assert resumen["cache_hits"] == 1
+        assert resumen["reintentos"] == 2
+        assert resumen["coste_usd"] == pytest.approx(0.6 + 0.04 + 1.0)
+
+    def test_prometheus_export(self, tmp_path):
+        """Test Prometheus text output with counters and a latency histogram"""
+        tracer = Tracer(atributos={"hu": "USRNM"})
+        with tracer.span("etapa", etapa="cps", items=20):
+            with tracer.span("llm", operacion="ortografia") as span:
+                span.update(prompt_tokens=10, completion_tokens=5, reintentos=1)
+
+        path = tmp_path / "metrics.prom"
+        tracer.exportar_prometheus(path)
+        texto = path.read_text(encoding="utf-8")
+
+        assert 'redactor_llm_requests_total{hu="USRNM",operacion="ortografia",resultado="ok",origen="api"} 1' in texto
+        assert 'redactor_llm_tokens_total{hu="USRNM",operacion="ortografia",tipo="prompt"} 10' in texto
+        assert 'redactor_llm_retries_total{hu="USRNM",operacion="ortografia"} 1' in texto
+        assert 'redactor_llm_request_duration_seconds_bucket{hu="USRNM",operacion="ortografia",le="+Inf"} 1' in texto
+        assert 'redactor_test_cases_total{hu="USRNM",etapa="cps"} 20' in texto
+
+    def test_spans_are_bounded_but_totals_are_not(self, monkeypatch):
+        """Test that only the last MAX_SPANS spans are kept while summary and metrics count all of them"""
+        monkeypatch.setattr(Tracer, "MAX_SPANS", 3)
+        tracer = Tracer(atributos={"hu": "USRNM"})
+        for _ in range(10):
+            with tracer.span("llm", operacion="ortografia") as span:
+                span.update(prompt_tokens=10, completion_tokens=5)
+
+        assert len(tracer.spans) == 3
+        assert tracer.resumen()["peticiones"] == 10
+        assert tracer.resumen()["tokens"]["prompt"] == 100
+        assert 'redactor_llm_request_duration_seconds_count{hu="USRNM",operacion="ortografia"} 10' in tracer.prometheus()
+
+    def test_connection_reuse_metrics(self):
+        """Test that HTTP connection counts appear in the summary and the Prometheus output"""
+        tracer = Tracer(atributos={"hu": "USRNM"})
+        assert tracer.resumen()["conexiones"] == {"peticiones": 0, "nuevas": 0, "reutilizacion": 0.0}
+
+        tracer.registrar_conexiones(peticiones=10, nuevas=2)
+
+        assert tracer.resumen()["conexiones"]["reutilizacion"] == pytest.approx(0.8)
+        texto = tracer.prometheus()
+        assert 'redactor_http_requests_total{hu="USRNM"} 10' in texto
+        assert 'redactor_http_connections_opened_total{hu="USRNM"} 2' in texto
+
+    def test_en_contexto_keeps_parent_across_threads(self):
+        """Test that spans opened in a thread pool keep the caller's span as parent"""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.redactionAssitant.telemetry import en_contexto
+
+        tracer = Tracer()
+
+        def lote(i):
+            with tracer.span("lote", lote=i):
+                pass
+
+        with tracer.span("etapa", etapa="cps"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(en_contexto(lote), range(3)))
+
+        etapa = tracer.spans[-1]
+        lotes = [s for s in tracer.spans if s["nombre"] == "lote"]
+        assert len(lotes) == 3
+        assert all(s["padre_id"] == etapa["span_id"] and s["etapa"] == "cps" for s in lotes)
+
+    def test_repeated_stage_is_one_series(self):
+        """Test that a stage recorded twice is exported as a single sum/count series"""
+        tracer = Tracer(atributos={"hu": "USRNM"})
+        for items in (3, 4):
+            with tracer.span("etapa", etapa="feedback", items=items):
+                pass
+            with tracer.span("etapa", etapa="cps", items=items):
+                pass
+
+        lineas = tracer.prometheus().splitlines()
+        series = [l.rsplit(" ", 1)[0] for l in lineas if not l.startswith("#")]
+
+        assert len(series) == len(set(series))
+        assert 'redactor_stage_duration_seconds_count{hu="USRNM",etapa="feedback"} 2' in lineas
+        assert 'redactor_test_cases_total{hu="USRNM",etapa="cps"} 7' in lineas
+        assert not any('etapa="feedback"' in l for l in lineas if l.startswith("redactor_test_cases_total"))
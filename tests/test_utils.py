@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import patch, mock_open, MagicMock
 from pathlib import Path
-from src.redactionAssitant.utils import get_data, save_data, procesar_en_batches
+from src.redactionAssitant.utils import (
+    get_data, get_data_streaming, iter_lineas, mapear_lotes, procesar_en_batches, salida_por_lineas, save_data,
+)
 
 
 class TestUtils:
@@ -120,4 +122,119 @@ class TestUtils:
         items = ["item1", "item2"]
 
         with pytest.raises(ValueError, match="Processor failed"):
-            procesar_en_batches(items, failing_processor, batch_size=2)
\ No newline at end of file
+            procesar_en_batches(items, failing_processor, batch_size=2)
+
+    def test_procesar_en_batches_accepts_generators(self):
+        """Test that any iterable is accepted, not only sequences"""
+        result = procesar_en_batches((f"item{i}" for i in range(5)), lambda batch: "\n".join(batch), batch_size=2)
+
+        assert result == ["item0", "item1", "item2", "item3", "item4"]
+
+    def test_mapear_lotes_keeps_input_order(self):
+        """Test that results come back in input order even when later batches finish first"""
+        import time
+
+        def procesador(lote):
+            time.sleep(0.02 if lote == 0 else 0)
+            return lote * 10
+
+        assert list(mapear_lotes(range(6), procesador, max_en_vuelo=3)) == [0, 10, 20, 30, 40, 50]
+
+    def test_mapear_lotes_bounds_batches_in_flight(self):
+        """Test backpressure: no more than max_en_vuelo batches are pulled ahead of the consumer"""
+        pedidos = []
+
+        def lotes():
+            for i in range(100):
+                pedidos.append(i)
+                yield i
+
+        resultados = mapear_lotes(lotes(), lambda lote: lote, max_en_vuelo=2)
+        assert next(resultados) == 0
+        assert len(pedidos) == 2
+        resultados.close()
+
+    def test_mapear_lotes_skip_policy(self):
+        """Test that failed batches are dropped with the skip policy"""
+        def procesador(lote):
+            if lote == 1:
+                raise RuntimeError("fallo")
+            return lote
+
+        assert list(mapear_lotes(range(4), procesador, politica="omitir")) == [0, 2, 3]
+
+    def test_mapear_lotes_retry_policy(self):
+        """Test that a failed batch is resent up to reintentos times before giving up"""
+        intentos = []
+
+        def procesador(lote):
+            intentos.append(lote)
+            if lote == 1 and intentos.count(1) < 3:
+                raise RuntimeError("fallo")
+            return lote
+
+        assert list(mapear_lotes(range(3), procesador, politica="reintentar", reintentos=2)) == [0, 1, 2]
+        assert intentos.count(1) == 3
+
+        with pytest.raises(RuntimeError, match="siempre"):
+            list(mapear_lotes([0], MagicMock(side_effect=RuntimeError("siempre")), politica="reintentar", reintentos=1))
+
+    def test_mapear_lotes_invalid_arguments(self):
+        """Test unknown policies and non-positive max_en_vuelo"""
+        with pytest.raises(ValueError, match="Política"):
+            list(mapear_lotes([1], lambda lote: lote, politica="ignorar"))
+        with pytest.raises(ValueError, match="max_en_vuelo"):
+            list(mapear_lotes([1], lambda lote: lote, max_en_vuelo=0))
+
+    def test_iter_lineas_strips_and_skips_blank_lines(self, tmp_path):
+        """Test lazy line reading with the same cleanup as preprocess_exp_or_cps"""
+        archivo = tmp_path / "cps.txt"
+        archivo.write_text("  USRNM001 Caso 1  \n\n   \nUSRNM002 Caso 2", encoding="utf-8")
+
+        assert list(iter_lineas(archivo)) == ["USRNM001 Caso 1", "USRNM002 Caso 2"]
+
+    def test_get_data_streaming(self, tmp_path):
+        """Test that HU is read fully and CPS/EXP are returned as iterators"""
+        for nombre, texto in (("hus", "Historia"), ("cps", "C1\nC2"), ("exp", "E1\nE2")):
+            (tmp_path / f"{nombre}.txt").write_text(texto, encoding="utf-8")
+        cfg = MagicMock()
+        cfg.input_path.side_effect = lambda key: tmp_path / f"{key}.txt"
+
+        hus, cps, exp = get_data_streaming(cfg)
+
+        assert hus == "Historia"
+        assert not isinstance(cps, list)
+        assert (list(cps), list(exp)) == (["C1", "C2"], ["E1", "E2"])
+
+    def test_get_data_streaming_file_not_found(self, tmp_path):
+        """Test that missing inputs raise before any line is read"""
+        cfg = MagicMock()
+        cfg.input_path.side_effect = lambda key: tmp_path / f"{key}.txt"
+
+        with pytest.raises(FileNotFoundError):
+            get_data_streaming(cfg)
+
+    def test_salida_por_lineas_matches_save_data_format(self, tmp_path):
+        """Test incremental writes produce the same text as save_data (no trailing newline)"""
+        destino = tmp_path / "out.txt"
+
+        with salida_por_lineas(destino) as escribir:
+            escribir(["a", "b"])
+            escribir([])
+            escribir(["c"])
+
+        assert destino.read_text(encoding="utf-8") == "a\nb\nc"
+        assert not (tmp_path / "out.txt.tmp").exists()
+
+    def test_salida_por_lineas_error_keeps_previous_file(self, tmp_path):
+        """Test that a failure discards the partial output and keeps the old file"""
+        destino = tmp_path / "out.txt"
+        destino.write_text("anterior", encoding="utf-8")
+
+        with pytest.raises(RuntimeError):
+            with salida_por_lineas(destino) as escribir:
+                escribir(["nuevo"])
+                raise RuntimeError("fallo")
+
+        assert destino.read_text(encoding="utf-8") == "anterior"
+        assert not (tmp_path / "out.txt.tmp").exists()